@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from flask import Blueprint, jsonify, request
 
-from services.learning_service import LearningService
+from services.learning_service import DEFAULT_SEARCH_LIMIT, LearningService
 
 learning_routes = Blueprint("learning_routes", __name__)
 
@@ -14,6 +14,16 @@ def design_faqs(design_id: str):
         "topic": request.args.get("topic"),
         "difficulty": request.args.get("difficulty"),
         "search": request.args.get("search"),
+        "component": request.args.get("component"),
+        "limit": request.args.get("limit"),
+        "offset": request.args.get("offset"),
     }
     payload, status = LearningService().get_faqs(design_id, query)
     return jsonify(payload), status
+
+
+@learning_routes.route("/api/faqs/search", methods=["GET"])
+def search_faqs():
+    limit = request.args.get("limit", DEFAULT_SEARCH_LIMIT, type=int)
+    payload, status = LearningService().search_faqs(request.args.get("q"), limit, request.args.get("design"))
+    return jsonify(payload), status
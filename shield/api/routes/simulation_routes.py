@@ -1,8 +1,11 @@
 from __future__ import annotations
 
-from flask import Blueprint, jsonify, request
+import json
+
+from flask import Blueprint, Response, jsonify, request, stream_with_context
 
 from services.simulation_service import SimulationService
+from services.workspace_service import WorkspaceService
 
 simulation_routes = Blueprint("simulation_routes", __name__)
 
@@ -10,8 +13,98 @@ simulation_routes = Blueprint("simulation_routes", __name__)
 @simulation_routes.route("/simulate", methods=["POST"])
 def simulate_route():
     payload = request.get_json(silent=True) or {}
-    result = SimulationService().run_simulation(payload)
-    return jsonify(result)
+    result, status = SimulationService().run_simulation(payload)
+    if status == 200 and isinstance(payload, dict) and payload.get("workspace_id"):
+        WorkspaceService().record_simulation(payload["workspace_id"], payload, result)
+    return jsonify(result), status
+
+
+@simulation_routes.route("/simulate/cache", methods=["GET"])
+def simulate_cache_route():
+    return jsonify(SimulationService().cache_stats())
+
+
+@simulation_routes.route("/simulate/sweep", methods=["POST"])
+def simulate_sweep_route():
+    payload = request.get_json(silent=True) or {}
+    result, status = SimulationService().run_sweep(payload)
+    return jsonify(result), status
+
+
+@simulation_routes.route("/simulate/timeseries", methods=["POST"])
+def simulate_timeseries_route():
+    payload = request.get_json(silent=True) or {}
+    accepts_sse = request.accept_mimetypes.best == "text/event-stream"
+    stream_format = request.args.get("format") or ("sse" if accepts_sse else "ndjson")
+    result, status = SimulationService().stream_timeseries(payload, stream_format)
+    if status != 200:
+        return jsonify(result), status
+    mimetype = "text/event-stream" if stream_format == "sse" else "application/x-ndjson"
+    return Response(stream_with_context(result), mimetype=mimetype)
+
+
+@simulation_routes.route("/simulate/incremental", methods=["POST"])
+def simulate_incremental_route():
+    payload = request.get_json(silent=True) or {}
+    result, status = SimulationService().run_incremental(payload)
+    return jsonify(result), status
+
+
+@simulation_routes.route("/api/validate/online", methods=["POST"])
+def validate_online_route():
+    payload = request.get_json(silent=True) or {}
+    result, status = SimulationService().validate_online(payload)
+    return jsonify(result), status
+
+
+def _ndjson_items(stream):
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None
+
+
+@simulation_routes.route("/api/validate/batch", methods=["POST"])
+def validate_batch_route():
+    if request.mimetype == "application/x-ndjson":
+        graphs = _ndjson_items(request.stream)
+    else:
+        payload = request.get_json(silent=True)
+        graphs = payload.get("graphs") if isinstance(payload, dict) else payload
+        if not isinstance(graphs, list):
+            return jsonify({"error": "Expected a list of graphs or an NDJSON stream."}), 400
+    lines = SimulationService().validate_batch(graphs)
+    return Response(stream_with_context(lines), mimetype="application/x-ndjson")
+
+
+@simulation_routes.route("/api/graph-sessions", methods=["POST"])
+def open_graph_session_route():
+    payload = request.get_json(silent=True) or {}
+    result, status = SimulationService().open_graph_session(payload)
+    return jsonify(result), status
+
+
+@simulation_routes.route("/api/graph-sessions/<session_id>", methods=["GET"])
+def get_graph_session_route(session_id: str):
+    result, status = SimulationService().get_graph_session(session_id)
+    return jsonify(result), status
+
+
+@simulation_routes.route("/api/graph-sessions/<session_id>", methods=["PATCH"])
+def patch_graph_session_route(session_id: str):
+    payload = request.get_json(silent=True) or {}
+    result, status = SimulationService().patch_graph_session(session_id, payload)
+    return jsonify(result), status
+
+
+@simulation_routes.route("/api/optimize", methods=["POST"])
+def optimize_route():
+    payload = request.get_json(silent=True) or {}
+    result, status = SimulationService().run_optimize(payload)
+    return jsonify(result), status
 
 
 @simulation_routes.route("/api/validate", methods=["POST"])
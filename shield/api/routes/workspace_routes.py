@@ -1,7 +1,8 @@
 from __future__ import annotations
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request, stream_with_context
 
+from core.graph.delta import PatchError, StaleVersionError
 from services.workspace_service import WorkspaceService
 
 workspace_routes = Blueprint("workspace_routes", __name__)
@@ -10,9 +11,33 @@ workspace_routes = Blueprint("workspace_routes", __name__)
 @workspace_routes.route("/api/workspaces", methods=["GET"])
 def list_workspaces():
     user_id = request.args.get("user_id", "local")
-    workspaces = WorkspaceService().list_workspaces(user_id)
-    payload = [WorkspaceService.serialize(ws) for ws in workspaces]
-    return jsonify({"workspaces": payload})
+    limit = request.args.get("limit", 50, type=int)
+    try:
+        workspaces, next_cursor = WorkspaceService().list_workspaces(user_id, limit, request.args.get("cursor"))
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    return jsonify({"workspaces": workspaces, "next_cursor": next_cursor})
+
+
+@workspace_routes.route("/api/workspaces/autosave", methods=["GET"])
+def autosave_stats():
+    return jsonify(WorkspaceService.autosave_stats())
+
+
+@workspace_routes.route("/api/workspaces/export", methods=["GET"])
+def export_workspaces():
+    lines = WorkspaceService().export_workspaces(request.args.get("user_id"))
+    return Response(
+        stream_with_context(lines),
+        mimetype="application/x-ndjson",
+        headers={"Content-Disposition": "attachment; filename=workspaces.ndjson"},
+    )
+
+
+@workspace_routes.route("/api/workspaces/import", methods=["POST"])
+def import_workspaces():
+    result = WorkspaceService().import_workspaces(request.stream, request.args.get("user_id"))
+    return jsonify(result)
 
 
 @workspace_routes.route("/api/workspaces", methods=["POST"])
@@ -25,7 +50,8 @@ def create_workspace():
     graph_json = payload.get("graph_json")
     metadata_json = payload.get("metadata_json")
 
-    workspace = WorkspaceService().create_workspace(
+    service = WorkspaceService()
+    workspace = service.create_workspace(
         user_id=user_id,
         workspace_type=workspace_type,
         name=name,
@@ -33,39 +59,72 @@ def create_workspace():
         graph_json=graph_json,
         metadata_json=metadata_json,
     )
-    return jsonify(WorkspaceService.serialize(workspace)), 201
+    return jsonify(service.serialize(workspace)), 201
 
 
 @workspace_routes.route("/api/workspaces/<workspace_id>", methods=["GET"])
 def get_workspace(workspace_id: str):
-    workspace = WorkspaceService().get_workspace(workspace_id)
+    include = request.args.get("include", "").split(",")
+    workspace = WorkspaceService().get_workspace_detail(workspace_id, include_simulation="simulation" in include)
     if not workspace:
         return jsonify({"error": "Workspace not found."}), 404
-    return jsonify(WorkspaceService.serialize(workspace))
+    return jsonify(workspace)
+
+
+@workspace_routes.route("/api/workspaces/<workspace_id>/versions/<int:version>", methods=["GET"])
+def get_workspace_version(workspace_id: str, version: int):
+    loaded = WorkspaceService().load_graph(workspace_id, version)
+    if loaded is None:
+        return jsonify({"error": "Workspace version not found."}), 404
+    return jsonify({"id": workspace_id, "version": loaded[0], "graph_json": loaded[1]})
+
+
+@workspace_routes.route("/api/workspaces/<workspace_id>/diff", methods=["GET"])
+def diff_workspace_versions(workspace_id: str):
+    from_version = request.args.get("from", type=int)
+    to_version = request.args.get("to", type=int)
+    if from_version is None or to_version is None:
+        return jsonify({"error": "from and to versions are required."}), 400
+    patch = WorkspaceService().diff_versions(workspace_id, from_version, to_version)
+    if patch is None:
+        return jsonify({"error": "Workspace version not found."}), 404
+    return jsonify({"id": workspace_id, "from": from_version, "to": to_version, "patch": patch})
 
 
 @workspace_routes.route("/api/workspaces/<workspace_id>", methods=["PATCH"])
 def update_workspace(workspace_id: str):
     payload = request.get_json(silent=True) or {}
-    service = WorkspaceService()
-    workspace = None
-    if "name" in payload:
-        workspace = service.rename_workspace(workspace_id, payload.get("name"))
-    if "graph_json" in payload:
-        workspace = service.update_graph(workspace_id, payload.get("graph_json"))
+    if "graph_json" in payload and not isinstance(payload.get("graph_json"), dict):
+        return jsonify({"error": "graph_json must be an object."}), 400
+    if "graph_patch" in payload and not isinstance(payload.get("graph_patch"), list):
+        return jsonify({"error": "graph_patch must be a list of operations."}), 400
+
+    try:
+        workspace = WorkspaceService().update_workspace(
+            workspace_id,
+            name=payload.get("name"),
+            graph_json=payload.get("graph_json"),
+            graph_patch=payload.get("graph_patch"),
+            version=payload.get("version"),
+        )
+    except StaleVersionError as exc:
+        return jsonify({"error": str(exc), "version": exc.current}), 409
+    except PatchError as exc:
+        return jsonify({"error": str(exc)}), 422
 
     if not workspace:
         return jsonify({"error": "Workspace not found."}), 404
-    return jsonify(WorkspaceService.serialize(workspace))
+    return jsonify(workspace)
 
 
 @workspace_routes.route("/api/workspaces/<workspace_id>/duplicate", methods=["POST"])
 def duplicate_workspace(workspace_id: str):
     payload = request.get_json(silent=True) or {}
-    workspace = WorkspaceService().duplicate_workspace(workspace_id, payload.get("name"))
+    service = WorkspaceService()
+    workspace = service.duplicate_workspace(workspace_id, payload.get("name"))
     if not workspace:
         return jsonify({"error": "Workspace not found."}), 404
-    return jsonify(WorkspaceService.serialize(workspace)), 201
+    return jsonify(service.serialize(workspace)), 201
 
 
 @workspace_routes.route("/api/workspaces/<workspace_id>", methods=["DELETE"])
@@ -9,11 +9,11 @@ if __package__ is None or __package__ == "":
     sys.path.append(str(Path(__file__).resolve().parent))
     from api import register_routes
     from config import Config
-    from db.session import init_db
+    from db.session import init_app, init_db
 else:
     from .api import register_routes
     from .config import Config
-    from .db.session import init_db
+    from .db.session import init_app, init_db
 
 
 def create_app() -> Flask:
@@ -22,6 +22,7 @@ def create_app() -> Flask:
 
     register_routes(app)
     init_db()
+    init_app(app)
 
     @app.route("/")
     def index():
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import time
+from collections import deque
+from concurrent.futures import Executor
+from itertools import islice
+from typing import Deque, Dict, Iterable, Iterator, List, Optional
+
+from .compiled import compile_graph
+from .validator import topological_order, validate_and_order
+
+CHUNK_SIZE = 16
+
+
+def validate_item(graph: object) -> Dict[str, object]:
+    started = time.perf_counter()
+    if not isinstance(graph, dict):
+        return {"valid": False, "error": "Each item must be a graph object.", "elapsed_ms": 0.0}
+    try:
+        compiled = compile_graph(graph)
+        result, ordered = validate_and_order(graph, compiled=compiled)
+        order, ordering_errors = topological_order(graph, compiled=compiled, order=ordered)
+    except Exception as exc:
+        # A malformed item gets its own error record; raised from a pool
+        # worker it would lose the whole chunk and end the stream.
+        elapsed = round((time.perf_counter() - started) * 1000.0, 3)
+        return {"valid": False, "error": f"Invalid graph: {exc}", "elapsed_ms": elapsed}
+    result["order"] = order
+    result["ordering_errors"] = ordering_errors
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000.0, 3)
+    return result
+
+
+def _validate_chunk(graphs: List[object]) -> List[Dict[str, object]]:
+    return [validate_item(graph) for graph in graphs]
+
+
+def validate_stream(
+    graphs: Iterable[object],
+    executor: Optional[Executor] = None,
+    chunk_size: int = CHUNK_SIZE,
+    window: int = 4,
+) -> Iterator[Dict[str, object]]:
+    # Graphs are pulled lazily and sent to the executor in chunks. At most
+    # ``window`` chunks are in flight, and results come back in input order.
+    items = iter(graphs)
+    index = 0
+    if executor is None:
+        for graph in items:
+            yield dict(validate_item(graph), index=index)
+            index += 1
+        return
+
+    pending: Deque = deque()
+    while True:
+        while len(pending) < window:
+            chunk = list(islice(items, chunk_size))
+            if not chunk:
+                break
+            pending.append(executor.submit(_validate_chunk, chunk))
+        if not pending:
+            return
+        for result in pending.popleft().result():
+            yield dict(result, index=index)
+            index += 1
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import Dict, List
+
+Graph = Dict[str, object]
+
+
+def _entry_node_id(nodes: List[Dict[str, object]], edges: List[Dict[str, object]]) -> object:
+    # The simulator feeds traffic into the first root node in input order, so
+    # that choice is part of the key even though the rest of the order is not.
+    targets = {edge.get("target") for edge in edges}
+    for node in nodes:
+        node_id = node.get("id")
+        if node_id and node_id not in targets:
+            return node_id
+    return None
+
+
+def _row_hash(row: tuple) -> int:
+    try:
+        return hash(row)
+    except TypeError:
+        return hash(json.dumps(row, sort_keys=True, default=str))
+
+
+def graph_fingerprint(graph: Graph, *context: object) -> str:
+    # Only ids, types, configs and the edge multiset affect validation and
+    # simulation, so UI-only fields such as node positions are ignored. Rows
+    # are combined with order-independent sums instead of being sorted.
+    # Python randomizes string hashes per process, so the fingerprint is only
+    # valid for in-memory caches and must never be persisted.
+    graph = graph if isinstance(graph, dict) else {}
+    nodes = [node for node in graph.get("nodes", []) or [] if isinstance(node, dict)]
+    edges = [edge for edge in graph.get("edges", []) or [] if isinstance(edge, dict)]
+
+    edge_rows = [(edge.get("source"), edge.get("target")) for edge in edges]
+    try:
+        hashes = [hash(row) for row in edge_rows]
+    except TypeError:
+        hashes = [_row_hash(row) for row in edge_rows]
+    for node in nodes:
+        config = node.get("config")
+        if isinstance(config, dict):
+            try:
+                config = frozenset(config.items())
+            except TypeError:
+                config = json.dumps(config, sort_keys=True, default=str)
+        hashes.append(_row_hash((node.get("id"), node.get("type"), config)))
+
+    payload = json.dumps(
+        [
+            len(nodes),
+            len(edges),
+            sum(hashes),
+            sum(value * value for value in hashes),
+            _entry_node_id(nodes, edges),
+            list(context),
+        ],
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=20).hexdigest()
+
+
+def stable_graph_hash(graph: Graph, *context: object) -> str:
+    # Persistable counterpart of ``graph_fingerprint``: the same fields, but
+    # serialized in sorted order and hashed with SHA-256, so an unchanged graph
+    # keeps its hash across processes and restarts.
+    graph = graph if isinstance(graph, dict) else {}
+    nodes = [node for node in graph.get("nodes", []) or [] if isinstance(node, dict)]
+    edges = [edge for edge in graph.get("edges", []) or [] if isinstance(edge, dict)]
+    node_rows = sorted(
+        json.dumps([node.get("id"), node.get("type"), node.get("config")], sort_keys=True, default=str)
+        for node in nodes
+    )
+    edge_rows = sorted(json.dumps([edge.get("source"), edge.get("target")], default=str) for edge in edges)
+    payload = json.dumps(
+        [node_rows, edge_rows, _entry_node_id(nodes, edges), list(context)],
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
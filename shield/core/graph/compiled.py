@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+from collections import deque
+from functools import cached_property
+from typing import Dict, List
+
+from .layers import LAYER_MAP, normalize_type
+
+Node = Dict[str, object]
+Graph = Dict[str, object]
+
+
+def _node_config(node: Node) -> Dict[str, object]:
+    return node.get("config", {}) or {}
+
+
+class CompiledGraph:
+    # Node ids are interned to positions in ``ids``. Children of node ``i`` are
+    # ``adj_targets[adj_offsets[i]:adj_offsets[i + 1]]`` in edge order, parents
+    # are stored the same way, with ``parent_slots`` pointing back at the
+    # adjacency slot of each parent edge. Numeric columns are parsed on first
+    # access.
+
+    def __init__(self, graph: Graph) -> None:
+        nodes = graph.get("nodes", []) or []
+        edges = graph.get("edges", []) or []
+
+        node_map = {node.get("id"): node for node in nodes if node.get("id")}
+        self.input_node_count = len(nodes)
+        self.input_edge_count = len(edges)
+        self.ids: List[str] = list(node_map)
+        self.nodes: List[Node] = list(node_map.values())
+        self.index: Dict[str, int] = {node_id: position for position, node_id in enumerate(self.ids)}
+        self.node_count = len(self.ids)
+
+        self.raw_types: List[str] = [str(node.get("type", "Unknown")) for node in self.nodes]
+        self.types: List[str] = _normalized_types(self.nodes)
+        self.layers: List[str] = [LAYER_MAP.get(node_type, "Compute") for node_type in self.types]
+
+        index = self.index
+        sources: List[int] = []
+        targets: List[int] = []
+        edge_ids: List[int] = []
+        self.invalid_edges: List[int] = []
+        self.self_loops: List[int] = []
+        for position, edge in enumerate(edges):
+            source = index.get(edge.get("source"))
+            target = index.get(edge.get("target"))
+            if source is None or target is None:
+                self.invalid_edges.append(position)
+                continue
+            if source == target:
+                self.self_loops.append(position)
+                continue
+            sources.append(source)
+            targets.append(target)
+            edge_ids.append(position)
+        self.edge_count = len(sources)
+
+        count = self.node_count
+        self.outdegree: List[int] = [0] * count
+        self.indegree: List[int] = [0] * count
+        for source in sources:
+            self.outdegree[source] += 1
+        for target in targets:
+            self.indegree[target] += 1
+
+        self.adj_offsets = _offsets(self.outdegree)
+        self.parent_offsets = _offsets(self.indegree)
+        self.adj_targets: List[int] = [0] * self.edge_count
+        self.adj_edges: List[int] = [0] * self.edge_count
+        self.parent_sources: List[int] = [0] * self.edge_count
+        self.parent_slots: List[int] = [0] * self.edge_count
+        adj_cursor = self.adj_offsets[:-1]
+        parent_cursor = self.parent_offsets[:-1]
+        for source, target, edge_id in zip(sources, targets, edge_ids):
+            slot = adj_cursor[source]
+            self.adj_targets[slot] = target
+            self.adj_edges[slot] = edge_id
+            adj_cursor[source] = slot + 1
+            parent_slot = parent_cursor[target]
+            self.parent_sources[parent_slot] = source
+            self.parent_slots[parent_slot] = slot
+            parent_cursor[target] = parent_slot + 1
+
+    @property
+    def has_missing_ids(self) -> bool:
+        return self.node_count != self.input_node_count
+
+    def children(self, node: int) -> List[int]:
+        return self.adj_targets[self.adj_offsets[node] : self.adj_offsets[node + 1]]
+
+    def parents(self, node: int) -> List[int]:
+        return self.parent_sources[self.parent_offsets[node] : self.parent_offsets[node + 1]]
+
+    @cached_property
+    def order(self) -> List[int]:
+        indegree = list(self.indegree)
+        offsets = self.adj_offsets
+        targets = self.adj_targets
+        queue = deque(node for node in range(self.node_count) if indegree[node] == 0)
+        ordered: List[int] = []
+        while queue:
+            node = queue.popleft()
+            ordered.append(node)
+            for slot in range(offsets[node], offsets[node + 1]):
+                neighbor = targets[slot]
+                indegree[neighbor] -= 1
+                if indegree[neighbor] == 0:
+                    queue.append(neighbor)
+        return ordered
+
+    @property
+    def is_acyclic(self) -> bool:
+        return len(self.order) == self.node_count
+
+    @cached_property
+    def levels(self) -> List[int]:
+        levels = [0] * self.node_count
+        offsets = self.parent_offsets
+        parents = self.parent_sources
+        for node in self.order:
+            level = -1
+            for slot in range(offsets[node], offsets[node + 1]):
+                if levels[parents[slot]] > level:
+                    level = levels[parents[slot]]
+            levels[node] = level + 1
+        return levels
+
+    @cached_property
+    def is_user(self) -> List[bool]:
+        return [node_type == "User" for node_type in self.raw_types]
+
+    @cached_property
+    def capacity(self) -> List[float]:
+        return [float(_node_config(node).get("capacity", 0)) for node in self.nodes]
+
+    @cached_property
+    def base_latency(self) -> List[float]:
+        return [float(_node_config(node).get("base_latency", 0)) for node in self.nodes]
+
+    @cached_property
+    def load_balancers(self) -> List[bool]:
+        return [raw_type.lower().replace("_", "").replace(" ", "") == "loadbalancer" for raw_type in self.raw_types]
+
+    @cached_property
+    def algorithms(self) -> List[str]:
+        return [
+            str(_node_config(node).get("algorithm", "round_robin")).lower() if is_load_balancer else "round_robin"
+            for node, is_load_balancer in zip(self.nodes, self.load_balancers)
+        ]
+
+    @cached_property
+    def edge_fractions(self) -> List[float]:
+        fractions: List[float] = [0.0] * self.edge_count
+        offsets = self.adj_offsets
+        for node in range(self.node_count):
+            start, end = offsets[node], offsets[node + 1]
+            if start != end:
+                fractions[start:end] = self.split_fractions(node)
+        return fractions
+
+    def split_fractions(self, node: int) -> List[float]:
+        targets = self.children(node)
+        if not targets:
+            return []
+        algorithm = self.algorithms[node]
+        if algorithm == "least_capacity":
+            weights = [max(self.capacity[target], 0.0) for target in targets]
+        elif algorithm == "weighted_round_robin":
+            weights = [max(float(_node_config(self.nodes[target]).get("weight", 1)), 0.0) for target in targets]
+        else:
+            weights = [1.0] * len(targets)
+        total_weight = sum(weights)
+        if total_weight == 0:
+            return [1.0 / len(targets)] * len(targets)
+        return [weight / total_weight for weight in weights]
+
+    def entry_node(self, order: List[int]) -> int:
+        for node in order:
+            if self.indegree[node] == 0:
+                return node
+        return order[0]
+
+
+def _normalized_types(nodes: List[Node]) -> List[str]:
+    # Graphs reuse a handful of type strings, so each is normalized once.
+    seen: Dict[object, str] = {}
+    types: List[str] = []
+    for node in nodes:
+        raw = node.get("type")
+        try:
+            normalized = seen.get(raw)
+        except TypeError:
+            types.append(normalize_type(raw))
+            continue
+        if normalized is None:
+            normalized = seen[raw] = normalize_type(raw)
+        types.append(normalized)
+    return types
+
+
+def _offsets(degrees: List[int]) -> List[int]:
+    offsets = [0] * (len(degrees) + 1)
+    running = 0
+    for position, degree in enumerate(degrees):
+        running += degree
+        offsets[position + 1] = running
+    return offsets
+
+
+def compile_graph(graph: Graph) -> CompiledGraph:
+    return CompiledGraph(graph if isinstance(graph, dict) else {})
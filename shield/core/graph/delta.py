@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+import copy
+import json
+import threading
+from collections import Counter
+from typing import Dict, List, Tuple
+
+Document = Dict[str, object]
+Operation = Dict[str, object]
+
+
+class PatchError(ValueError):
+    pass
+
+
+class StaleVersionError(Exception):
+    def __init__(self, expected: object, current: int) -> None:
+        super().__init__(f"Version {expected} is stale; the session is at version {current}.")
+        self.current = current
+
+
+def _pointer(path: object) -> List[str]:
+    if not isinstance(path, str) or (path and not path.startswith("/")):
+        raise PatchError(f"Invalid JSON pointer: {path!r}")
+    if not path:
+        return []
+    return [token.replace("~1", "/").replace("~0", "~") for token in path[1:].split("/")]
+
+
+def _index(container: list, token: str, path: object, allow_end: bool) -> int:
+    if token == "-" and allow_end:
+        return len(container)
+    if not token.isdigit() or (token != "0" and token.startswith("0")):
+        raise PatchError(f"Invalid array index in {path}")
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise PatchError(f"Array index out of range in {path}")
+    return index
+
+
+def _resolve(document: object, tokens: List[str], path: object) -> object:
+    target = document
+    for token in tokens:
+        if isinstance(target, dict):
+            if token not in target:
+                raise PatchError(f"Path not found: {path}")
+            target = target[token]
+        elif isinstance(target, list):
+            target = target[_index(target, token, path, False)]
+        else:
+            raise PatchError(f"Path not found: {path}")
+    return target
+
+
+def _parent(document: object, path: object) -> Tuple[object, str]:
+    tokens = _pointer(path)
+    if not tokens:
+        raise PatchError("Patches cannot replace the whole document.")
+    return _resolve(document, tokens[:-1], path), tokens[-1]
+
+
+def _add(document: object, path: object, value: object) -> Operation:
+    parent, token = _parent(document, path)
+    if isinstance(parent, dict):
+        if token in parent:
+            return _replace(document, path, value)
+        parent[token] = value
+        return {"op": "remove", "path": path}
+    if isinstance(parent, list):
+        index = _index(parent, token, path, True)
+        parent.insert(index, value)
+        return {"op": "remove", "path": _sibling(path, index)}
+    raise PatchError(f"Path not found: {path}")
+
+
+def _replace(document: object, path: object, value: object) -> Operation:
+    parent, token = _parent(document, path)
+    if isinstance(parent, dict):
+        if token not in parent:
+            raise PatchError(f"Path not found: {path}")
+    elif isinstance(parent, list):
+        token = _index(parent, token, path, False)
+    else:
+        raise PatchError(f"Path not found: {path}")
+    previous = parent[token]
+    parent[token] = value
+    return {"op": "replace", "path": path, "value": previous}
+
+
+def _remove(document: object, path: object) -> Tuple[object, Operation]:
+    parent, token = _parent(document, path)
+    if isinstance(parent, dict):
+        if token not in parent:
+            raise PatchError(f"Path not found: {path}")
+        return parent.pop(token), {"op": "add", "path": path}
+    if isinstance(parent, list):
+        index = _index(parent, token, path, False)
+        return parent.pop(index), {"op": "add", "path": path}
+    raise PatchError(f"Path not found: {path}")
+
+
+def _sibling(path: str, index: int) -> str:
+    return f"{path.rsplit('/', 1)[0]}/{index}"
+
+
+def _apply(document: object, operation: Operation, undo: List[Operation]) -> None:
+    if not isinstance(operation, dict):
+        raise PatchError("Each patch operation must be an object.")
+    kind = operation.get("op")
+    path = operation.get("path")
+    if not isinstance(kind, str):
+        raise PatchError("Each patch operation needs an op string.")
+    if not isinstance(path, str) or (kind in {"move", "copy"} and not isinstance(operation.get("from"), str)):
+        raise PatchError(f"Operation {kind} needs path and from pointers as strings.")
+    if kind in {"add", "replace", "test"} and "value" not in operation:
+        raise PatchError(f"Operation {kind} needs a value.")
+
+    if kind == "add":
+        undo.append(_add(document, path, copy.deepcopy(operation["value"])))
+    elif kind == "remove":
+        value, inverse = _remove(document, path)
+        undo.append(dict(inverse, value=value))
+    elif kind == "replace":
+        undo.append(_replace(document, path, copy.deepcopy(operation["value"])))
+    elif kind in {"move", "copy"}:
+        source = operation.get("from")
+        source_tokens = _pointer(source)
+        value = _resolve(document, source_tokens, source)
+        if kind == "move":
+            if isinstance(path, str) and path.startswith(f"{source}/"):
+                raise PatchError("A value cannot be moved into one of its children.")
+            value, inverse = _remove(document, source)
+            undo.append(dict(inverse, value=value))
+        else:
+            value = copy.deepcopy(value)
+        undo.append(_add(document, path, value))
+    elif kind == "test":
+        if _resolve(document, _pointer(path), path) != operation["value"]:
+            raise PatchError(f"Test failed at {path}")
+    else:
+        raise PatchError(f"Unknown patch operation: {kind}")
+
+
+def apply_patch(document: Document, operations: List[Operation]) -> None:
+    # Applies JSON Patch (RFC 6902) operations in place. Each operation
+    # records its inverse, so a failing patch is rolled back without copying
+    # the document. Any failure, not only a PatchError, rolls back and is
+    # raised as a PatchError.
+    undo: List[Operation] = []
+    try:
+        for operation in operations:
+            _apply(document, operation, undo)
+    except Exception as exc:
+        for inverse in reversed(undo):
+            if inverse["op"] == "remove":
+                _remove(document, inverse["path"])
+            elif inverse["op"] == "replace":
+                _replace(document, inverse["path"], inverse["value"])
+            else:
+                _add(document, inverse["path"], inverse["value"])
+        if isinstance(exc, PatchError):
+            raise
+        raise PatchError(f"Invalid patch operation: {exc}") from exc
+
+
+def _escape(token: object) -> str:
+    return str(token).replace("~", "~0").replace("/", "~1")
+
+
+def _same(before: object, after: object) -> bool:
+    # JSON equality that keeps 1, 1.0 and true apart.
+    if type(before) is not type(after):
+        return False
+    if isinstance(before, dict):
+        return before.keys() == after.keys() and all(_same(value, after[key]) for key, value in before.items())
+    if isinstance(before, list):
+        return len(before) == len(after) and all(_same(left, right) for left, right in zip(before, after))
+    return before == after
+
+
+def _element_key(item: object) -> object:
+    if isinstance(item, dict) and isinstance(item.get("id"), (str, int)):
+        return ("id", item["id"])
+    return json.dumps(item, sort_keys=True)
+
+
+def _diff_list(before: list, after: list, start: int, before_end: int, after_end: int, path: str) -> List[Operation]:
+    # Walks both lists once. Elements are matched by ``id`` when they have one
+    # and by value otherwise; matched elements are diffed in place, the rest
+    # become single adds and removes at the current position.
+    pending_before = Counter(_element_key(item) for item in before[start:before_end])
+    pending_after = Counter(_element_key(item) for item in after[start:after_end])
+    operations: List[Operation] = []
+    old, new = start, start
+    while old < before_end and new < after_end:
+        old_key, new_key = _element_key(before[old]), _element_key(after[new])
+        if old_key == new_key:
+            operations.extend(diff_documents(before[old], after[new], f"{path}/{new}"))
+        elif not pending_after[old_key]:
+            operations.append({"op": "remove", "path": f"{path}/{new}"})
+            pending_before[old_key] -= 1
+            old += 1
+            continue
+        elif not pending_before[new_key]:
+            operations.append({"op": "add", "path": f"{path}/{new}", "value": after[new]})
+            pending_after[new_key] -= 1
+            new += 1
+            continue
+        else:
+            operations.append({"op": "replace", "path": f"{path}/{new}", "value": after[new]})
+        pending_before[old_key] -= 1
+        pending_after[new_key] -= 1
+        old += 1
+        new += 1
+    for _ in range(old, before_end):
+        operations.append({"op": "remove", "path": f"{path}/{new}"})
+    for index in range(new, after_end):
+        operations.append({"op": "add", "path": f"{path}/{index}", "value": after[index]})
+    return operations
+
+
+def diff_documents(before: object, after: object, path: str = "") -> List[Operation]:
+    # Produces a patch that turns ``before`` into ``after``. Objects are
+    # compared key by key; lists skip their common prefix and suffix before
+    # the remaining elements are aligned.
+    if _same(before, after):
+        return []
+    if isinstance(before, dict) and isinstance(after, dict):
+        operations: List[Operation] = []
+        for key in before:
+            if key not in after:
+                operations.append({"op": "remove", "path": f"{path}/{_escape(key)}"})
+        for key, value in after.items():
+            child = f"{path}/{_escape(key)}"
+            if key in before:
+                operations.extend(diff_documents(before[key], value, child))
+            else:
+                operations.append({"op": "add", "path": child, "value": value})
+        return operations
+    if isinstance(before, list) and isinstance(after, list):
+        start = 0
+        while start < len(before) and start < len(after) and _same(before[start], after[start]):
+            start += 1
+        before_end, after_end = len(before), len(after)
+        while before_end > start and after_end > start and _same(before[before_end - 1], after[after_end - 1]):
+            before_end -= 1
+            after_end -= 1
+        return _diff_list(before, after, start, before_end, after_end, path)
+    if not path:
+        raise PatchError("Patches cannot replace the whole document.")
+    return [{"op": "replace", "path": path, "value": after}]
+
+
+class GraphSession:
+    # A simulation payload (``graph``, ``traffic_profile``, ...) kept in
+    # memory and edited by versioned patches. The lock serializes patches and
+    # the runs that read the document.
+
+    def __init__(self, document: Document) -> None:
+        self.document = document
+        self.version = 0
+        self.lock = threading.Lock()
+
+    def apply(self, version: object, operations: List[Operation]) -> int:
+        if version != self.version:
+            raise StaleVersionError(version, self.version)
+        apply_patch(self.document, operations)
+        self.version += 1
+        return self.version
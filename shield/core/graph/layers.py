@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+
+TYPE_ALIASES = {
+    "user": "User",
+    "cdn": "CDN",
+    "apigateway": "APIGateway",
+    "api_gateway": "APIGateway",
+    "loadbalancer": "LoadBalancer",
+    "load_balancer": "LoadBalancer",
+    "edge": "Edge",
+    "ratelimiter": "RateLimiter",
+    "rate_limiter": "RateLimiter",
+    "server": "Server",
+    "appserver": "Server",
+    "matchingengine": "MatchingEngine",
+    "locationservice": "LocationService",
+    "tripservice": "TripService",
+    "transactionservice": "TransactionService",
+    "mlinferenceservice": "MLInferenceService",
+    "mlservice": "MLInferenceService",
+    "ruleengine": "RuleEngine",
+    "idgenerator": "IDGenerator",
+    "inventoryservice": "InventoryService",
+    "paymentgateway": "PaymentGateway",
+    "inventorylocking": "InventoryLocking",
+    "inventorylockinglayer": "InventoryLocking",
+    "cache": "Cache",
+    "redis": "Cache",
+    "featurestore": "FeatureStore",
+    "database": "Database",
+    "messagestore": "MessageStore",
+    "mediastore": "MediaStore",
+    "services": "Services",
+    "searchindex": "SearchIndex",
+    "queue": "Queue",
+    "eventstream": "EventStream",
+    "eventqueue": "EventStream",
+    "worker": "Worker",
+    "notificationservice": "NotificationService",
+    "gateway": "Gateway",
+    "chatserver": "ChatServer",
+    "tokenbucket": "TokenBucket",
+    "distributedsync": "DistributedSync",
+}
+
+LAYER_MAP = {
+    "User": "External",
+    "CDN": "Edge",
+    "APIGateway": "Edge",
+    "LoadBalancer": "Edge",
+    "Edge": "Edge",
+    "RateLimiter": "Edge",
+    "Gateway": "Edge",
+    "Server": "Compute",
+    "MatchingEngine": "Compute",
+    "LocationService": "Compute",
+    "TripService": "Compute",
+    "TransactionService": "Compute",
+    "MLInferenceService": "Compute",
+    "RuleEngine": "Compute",
+    "IDGenerator": "Compute",
+    "InventoryService": "Compute",
+    "PaymentGateway": "Compute",
+    "InventoryLocking": "Compute",
+    "ChatServer": "Compute",
+    "Services": "Compute",
+    "Cache": "DataAccess",
+    "Database": "Storage",
+    "FeatureStore": "Storage",
+    "MessageStore": "Storage",
+    "MediaStore": "Storage",
+    "SearchIndex": "Storage",
+    "Queue": "Async",
+    "EventStream": "Async",
+    "Worker": "Async",
+    "TokenBucket": "DataAccess",
+    "DistributedSync": "Async",
+    "NotificationService": "Notification",
+}
+
+ALLOWED_TRANSITIONS = {
+    "External": {"Edge"},
+    "Edge": {"Edge", "Compute"},
+    "Compute": {"Compute", "DataAccess", "Storage", "Async", "Notification"},
+    "DataAccess": {"Storage"},
+    "Storage": {"Async"},
+    "Async": {"Async", "Storage"},
+    "Notification": set(),
+}
+
+
+def normalize_type(node_type: object) -> str:
+    if not node_type:
+        return "Server"
+    raw = str(node_type).strip()
+    key = raw.lower().replace(" ", "").replace("-", "_")
+    return TYPE_ALIASES.get(key, raw)
@@ -0,0 +1,347 @@
+from __future__ import annotations
+
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+
+from .compiled import CompiledGraph, compile_graph
+from .layers import LAYER_MAP, normalize_type
+from .rules import edge_rule_registry
+from .validator import MAX_ERROR_DETAILS
+
+Graph = Dict[str, object]
+Edge = Tuple[str, str]
+
+# Positions are spaced out so a reordered region can usually be moved into
+# the free slots next to one endpoint without touching the rest.
+SLOT_GAP = 1 << 16
+
+
+class OnlineValidator:
+    # Keeps a validated DAG up to date under single edits. The topological
+    # order is maintained with the Pearce-Kelly algorithm: an edge x -> y that
+    # contradicts the order only searches the nodes between y and x, rejects
+    # the edge if that search reaches x, and otherwise reorders just those
+    # nodes. Reachability from User nodes, terminal storage and per-edge layer
+    # violations are updated from the same local information.
+
+    def __init__(
+        self, graph: Graph, compiled: Optional[CompiledGraph] = None, max_errors: int = MAX_ERROR_DETAILS
+    ) -> None:
+        compiled = compiled or compile_graph(graph)
+        if compiled.has_missing_ids or compiled.invalid_edges or compiled.self_loops or not compiled.is_acyclic:
+            raise ValueError("Online validation needs a DAG with valid node ids and edges.")
+
+        self.max_errors = max_errors
+        self.rules = edge_rule_registry.table()
+        self.types: Dict[str, str] = {}
+        self.codes: Dict[str, int] = {}
+        self.layers: Dict[str, str] = {}
+        self.children: Dict[str, Counter] = {}
+        self.parents: Dict[str, Counter] = {}
+        self.position: Dict[str, int] = {}
+        self.slots: Dict[int, str] = {}
+        self.first_slot = 0
+        self.next_slot = 0
+        self.edges: Dict[str, Edge] = {}
+        self.incident: Dict[str, Set[str]] = {}
+        self.pair_edges: Dict[Edge, List[str]] = {}
+        self.edge_violations: Dict[str, Tuple[str, ...]] = {}
+        self.violation_counts: Counter = Counter()
+        self.reachable: Set[str] = set()
+        self.unreachable: Set[str] = set()
+        self.users: Set[str] = set()
+        self.terminal_storage = 0
+        self.version = 0
+
+        for node in compiled.order:
+            self._insert_node(compiled.ids[node], compiled.nodes[node].get("type"))
+        for edge in graph.get("edges", []) or []:
+            self._link(edge.get("source"), edge.get("target"), edge.get("id"))
+        for user in self.users:
+            for child in self.children[user]:
+                self._mark_reachable(child)
+
+    # Structure ------------------------------------------------------------
+
+    def _insert_node(self, node_id: str, node_type: object) -> None:
+        normalized = normalize_type(node_type)
+        self.types[node_id] = normalized
+        self.layers[node_id] = LAYER_MAP.get(normalized, "Compute")
+        self.codes[node_id] = self.rules.code(normalized)
+        self.children[node_id] = Counter()
+        self.parents[node_id] = Counter()
+        self.incident[node_id] = set()
+        self.position[node_id] = self.next_slot
+        self.slots[self.next_slot] = node_id
+        self.next_slot += SLOT_GAP
+        if self.layers[node_id] == "Storage":
+            self.terminal_storage += 1
+        if normalized == "User":
+            self.users.add(node_id)
+            self.reachable.add(node_id)
+        else:
+            self.unreachable.add(node_id)
+
+    def _mark_reachable(self, node_id: str) -> None:
+        stack = [node_id]
+        while stack:
+            node = stack.pop()
+            if node in self.reachable:
+                continue
+            self.reachable.add(node)
+            self.unreachable.discard(node)
+            stack.extend(child for child in self.children[node] if child not in self.reachable)
+
+    def _link(self, source: str, target: str, edge_id: object) -> str:
+        key = str(edge_id) if edge_id else f"{source}->{target}"
+        if key in self.edges:
+            suffix = 2
+            while f"{key}#{suffix}" in self.edges:
+                suffix += 1
+            key = f"{key}#{suffix}"
+        self.edges[key] = (source, target)
+        self.incident[source].add(key)
+        self.incident[target].add(key)
+        self.pair_edges.setdefault((source, target), []).append(key)
+        if not self.children[source] and self.layers[source] == "Storage":
+            self.terminal_storage -= 1
+        self.children[source][target] += 1
+        self.parents[target][source] += 1
+        violations = self.rules.decode(self.rules.mask(self.codes[source], self.codes[target]))
+        if violations:
+            self.edge_violations[key] = violations
+            self.violation_counts.update(violations)
+        return key
+
+    def _unlink(self, key: str) -> None:
+        source, target = self.edges.pop(key)
+        self.incident[source].discard(key)
+        self.incident[target].discard(key)
+        keys = self.pair_edges[(source, target)]
+        keys.remove(key)
+        if not keys:
+            del self.pair_edges[(source, target)]
+        for message in self.edge_violations.pop(key, ()):
+            self.violation_counts[message] -= 1
+            if not self.violation_counts[message]:
+                del self.violation_counts[message]
+        self.children[source][target] -= 1
+        if not self.children[source][target]:
+            del self.children[source][target]
+        self.parents[target][source] -= 1
+        if not self.parents[target][source]:
+            del self.parents[target][source]
+            self._refresh_reachability(target)
+        if not self.children[source] and self.layers[source] == "Storage":
+            self.terminal_storage += 1
+
+    def _refresh_reachability(self, node_id: str) -> None:
+        # Removing an edge can only change nodes downstream of its target, and
+        # none of their parents outside that region are affected, so the region
+        # is re-derived in topological order from its remaining parents.
+        if node_id not in self.reachable or node_id in self.users:
+            return
+        if any(parent in self.reachable for parent in self.parents[node_id]):
+            return
+        region: List[str] = []
+        stack = [node_id]
+        seen = {node_id}
+        while stack:
+            node = stack.pop()
+            region.append(node)
+            for child in self.children[node]:
+                if child not in seen and child in self.reachable and child not in self.users:
+                    seen.add(child)
+                    stack.append(child)
+        for node in region:
+            self.reachable.discard(node)
+            self.unreachable.add(node)
+        for node in sorted(region, key=self.position.__getitem__):
+            if any(parent in self.reachable for parent in self.parents[node]):
+                self.reachable.add(node)
+                self.unreachable.discard(node)
+
+    def _reorder(self, source: str, target: str) -> None:
+        # Searches forward from the target and backward from the source in
+        # lockstep, so the cost follows the smaller side. When one side is
+        # complete and the gap next to the other endpoint has room, only that
+        # side moves; otherwise both sides are pooled as in Pearce-Kelly.
+        position = self.position
+        children = self.children
+        parents = self.parents
+        lower, upper = position[target], position[source]
+        if lower > upper:
+            return
+        forward_seen = {target}
+        backward_seen = {source}
+        forward_stack = [target]
+        backward_stack = [source]
+        while forward_stack and backward_stack:
+            for child in children[forward_stack.pop()]:
+                if child in backward_seen:
+                    raise ValueError(f"Edge {source}->{target} would create a cycle.")
+                if child not in forward_seen and position[child] < upper:
+                    forward_seen.add(child)
+                    forward_stack.append(child)
+            for parent in parents[backward_stack.pop()]:
+                if parent in forward_seen:
+                    raise ValueError(f"Edge {source}->{target} would create a cycle.")
+                if parent not in backward_seen and position[parent] > lower:
+                    backward_seen.add(parent)
+                    backward_stack.append(parent)
+
+        if not backward_stack:
+            # Outside parents of the backward set bound how far down it may go.
+            floor = max(
+                (position[parent] for node in backward_seen for parent in parents[node] if parent not in backward_seen),
+                default=self.first_slot - (len(backward_seen) + 1) * SLOT_GAP,
+            )
+            if self._place(backward_seen, floor, lower, True):
+                return
+        if not forward_stack:
+            ceiling = min(
+                (position[child] for node in forward_seen for child in children[node] if child not in forward_seen),
+                default=self.next_slot + len(forward_seen) * SLOT_GAP,
+            )
+            if self._place(forward_seen, upper, ceiling, False):
+                return
+        while forward_stack:
+            for child in children[forward_stack.pop()]:
+                if child not in forward_seen and position[child] < upper:
+                    forward_seen.add(child)
+                    forward_stack.append(child)
+        while backward_stack:
+            for parent in parents[backward_stack.pop()]:
+                if parent not in backward_seen and position[parent] > lower:
+                    backward_seen.add(parent)
+                    backward_stack.append(parent)
+        moved = sorted(backward_seen, key=position.__getitem__) + sorted(forward_seen, key=position.__getitem__)
+        slots = sorted(position[node] for node in moved)
+        for node, slot in zip(moved, slots):
+            position[node] = slot
+            self.slots[slot] = node
+
+    def _place(self, nodes: Set[str], low: int, high: int, below_high: bool) -> bool:
+        # Moves ``nodes`` into free slots of the open interval (low, high),
+        # keeping their relative order. Slots are packed against ``high`` when
+        # placing before a node and against ``low`` when placing after one, with
+        # the spacing halved until a free run is found.
+        count = len(nodes)
+        spacing = min((high - low) // (count + 1), SLOT_GAP // 2)
+        while spacing >= 1:
+            if below_high:
+                free = [high - spacing * (count - index) for index in range(count)]
+            else:
+                free = [low + spacing * (index + 1) for index in range(count)]
+            if not any(slot in self.slots for slot in free):
+                break
+            spacing //= 2
+        else:
+            return False
+        for node, slot in zip(sorted(nodes, key=self.position.__getitem__), free):
+            del self.slots[self.position[node]]
+            self.position[node] = slot
+            self.slots[slot] = node
+        self.first_slot = min(self.first_slot, free[0])
+        self.next_slot = max(self.next_slot, free[-1] + SLOT_GAP)
+        return True
+
+    # Operations -----------------------------------------------------------
+
+    def add_node(self, node_id: str, node_type: object) -> None:
+        if not node_id:
+            raise ValueError("Each node must include a non-empty id.")
+        if node_id in self.types:
+            raise ValueError(f"Node {node_id} already exists.")
+        self._insert_node(node_id, node_type)
+        self.version += 1
+
+    def remove_node(self, node_id: str) -> None:
+        if node_id not in self.types:
+            raise KeyError(node_id)
+        for key in list(self.incident[node_id]):
+            self._unlink(key)
+        if self.layers[node_id] == "Storage":
+            self.terminal_storage -= 1
+        del self.slots[self.position.pop(node_id)]
+        for table in (self.types, self.layers, self.codes, self.children, self.parents, self.incident):
+            del table[node_id]
+        self.users.discard(node_id)
+        self.reachable.discard(node_id)
+        self.unreachable.discard(node_id)
+        self.version += 1
+
+    def add_edge(self, source: str, target: str, edge_id: object = None) -> str:
+        if source not in self.types or target not in self.types:
+            raise ValueError("Edges must reference valid node ids.")
+        if source == target:
+            raise ValueError("Self-referential edges are not allowed.")
+        self._reorder(source, target)
+        key = self._link(source, target, edge_id)
+        if source in self.reachable:
+            self._mark_reachable(target)
+        self.version += 1
+        return key
+
+    def remove_edge(self, edge_id: object = None, source: object = None, target: object = None) -> None:
+        key = str(edge_id) if edge_id else None
+        if key is None:
+            matches = self.pair_edges.get((source, target))
+            key = matches[-1] if matches else None
+        if key is None or key not in self.edges:
+            raise KeyError(edge_id or f"{source}->{target}")
+        self._unlink(key)
+        self.version += 1
+
+    # Results --------------------------------------------------------------
+
+    def order(self) -> List[str]:
+        return [self.slots[slot] for slot in sorted(self.slots)]
+
+    def result(self) -> Dict[str, object]:
+        messages: List[str] = []
+        details: List[Dict[str, object]] = []
+        count = 0
+        limit = self.max_errors
+
+        if not self.types:
+            # Like validate_graph, an empty graph reports nothing else.
+            message = "Graph must contain at least one node."
+            details = [{"message": message, "node_ids": [], "edge_ids": []}] if limit > 0 else []
+            return {
+                "valid": False,
+                "errors": [message],
+                "details": details,
+                "error_count": 1,
+                "truncated": not details,
+                "version": self.version,
+            }
+        if not self.users:
+            messages.append("Graph must contain at least one User node.")
+            count += 1
+        if self.users and self.unreachable:
+            message = "All nodes must be reachable from a User node."
+            messages.append(message)
+            count += 1
+            node_ids = sorted(self.unreachable, key=self.position.__getitem__)[:limit]
+            details.append({"message": message, "node_ids": node_ids, "edge_ids": []})
+        if not self.terminal_storage:
+            messages.append("Graph must contain at least one terminal storage node.")
+            count += 1
+        messages.extend(self.violation_counts)
+        count += sum(self.violation_counts.values())
+        for key, violations in self.edge_violations.items():
+            if len(details) >= limit:
+                break
+            source, target = self.edges[key]
+            for message in violations[: limit - len(details)]:
+                details.append({"message": message, "node_ids": [source, target], "edge_ids": [key]})
+
+        return {
+            "valid": not messages,
+            "errors": sorted(messages),
+            "details": details,
+            "error_count": count,
+            "truncated": count > len(details),
+            "version": self.version,
+        }
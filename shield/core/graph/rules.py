@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .layers import ALLOWED_TRANSITIONS, LAYER_MAP
+
+LAYERS = tuple(dict.fromkeys(list(ALLOWED_TRANSITIONS) + list(LAYER_MAP.values()) + ["Compute"]))
+DEFAULT_LAYER = "Compute"
+
+
+@dataclass(frozen=True)
+class EdgeRule:
+    # An edge violates the rule when every non-empty field matches its
+    # endpoints. Rules sharing a message report it once per edge.
+    message: str
+    source_types: FrozenSet[str] = frozenset()
+    source_layers: FrozenSet[str] = frozenset()
+    target_types: FrozenSet[str] = frozenset()
+    target_layers: FrozenSet[str] = frozenset()
+
+    def matches(self, source_type: str, source_layer: str, target_type: str, target_layer: str) -> bool:
+        return (
+            (not self.source_types or source_type in self.source_types)
+            and (not self.source_layers or source_layer in self.source_layers)
+            and (not self.target_types or target_type in self.target_types)
+            and (not self.target_layers or target_layer in self.target_layers)
+        )
+
+
+class RuleTable:
+    # Node types are folded into codes: types named by a rule keep their own
+    # code, every other type shares the code of its layer. ``masks`` holds one
+    # bitmask per (source code, target code) pair, with bit ``i`` set when the
+    # pair violates ``messages[i]``.
+
+    def __init__(self, rules: Iterable[EdgeRule]) -> None:
+        rules = list(rules)
+        self.messages: List[str] = list(dict.fromkeys(rule.message for rule in rules))
+        bits = {message: 1 << position for position, message in enumerate(self.messages)}
+        named_types = set()
+        for rule in rules:
+            named_types.update(rule.source_types, rule.target_types)
+
+        classes: Dict[Tuple[str, str], int] = {}
+        for layer in LAYERS:
+            classes.setdefault(("", layer), len(classes))
+        self.type_codes: Dict[str, int] = {}
+        for node_type in sorted(set(LAYER_MAP) | named_types):
+            layer = LAYER_MAP.get(node_type, DEFAULT_LAYER)
+            key = (node_type if node_type in named_types else "", layer)
+            self.type_codes[node_type] = classes.setdefault(key, len(classes))
+        self.default_code = classes[("", DEFAULT_LAYER)]
+        self.layer_codes: Dict[str, int] = {layer: classes[("", layer)] for layer in LAYERS}
+
+        width = len(classes)
+        self.width = width
+        self.masks: List[int] = [0] * (width * width)
+        for (source_type, source_layer), source_code in classes.items():
+            for (target_type, target_layer), target_code in classes.items():
+                mask = 0
+                for rule in rules:
+                    if rule.matches(source_type, source_layer, target_type, target_layer):
+                        mask |= bits[rule.message]
+                self.masks[source_code * width + target_code] = mask
+        self.matrix = np.array(self.masks, dtype=np.uint64).reshape(width, width)
+        self._decoded: Dict[int, Tuple[str, ...]] = {0: ()}
+
+    def code(self, node_type: str) -> int:
+        return self.type_codes.get(node_type, self.default_code)
+
+    def codes(self, node_types: Iterable[str]) -> List[int]:
+        type_codes = self.type_codes
+        default = self.default_code
+        return [type_codes.get(node_type, default) for node_type in node_types]
+
+    def mask(self, source_code: int, target_code: int) -> int:
+        return self.masks[source_code * self.width + target_code]
+
+    def decode(self, mask: int) -> Tuple[str, ...]:
+        messages = self._decoded.get(mask)
+        if messages is None:
+            messages = tuple(message for bit, message in enumerate(self.messages) if mask >> bit & 1)
+            self._decoded[mask] = messages
+        return messages
+
+    def edge_masks(self, source_codes: object, target_codes: object) -> np.ndarray:
+        # Vectorized form of ``mask`` over arrays of endpoint codes.
+        return self.matrix[np.asarray(source_codes, dtype=np.intp), np.asarray(target_codes, dtype=np.intp)]
+
+
+class RuleRegistry:
+    def __init__(self, rules: Iterable[EdgeRule] = ()) -> None:
+        self._rules: List[EdgeRule] = list(rules)
+        self._table: Optional[RuleTable] = None
+        self._lock = threading.Lock()
+
+    def register(
+        self,
+        message: str,
+        source_types: Iterable[str] = (),
+        source_layers: Iterable[str] = (),
+        target_types: Iterable[str] = (),
+        target_layers: Iterable[str] = (),
+    ) -> EdgeRule:
+        rule = EdgeRule(
+            message,
+            frozenset(source_types),
+            frozenset(source_layers),
+            frozenset(target_types),
+            frozenset(target_layers),
+        )
+        with self._lock:
+            self._rules.append(rule)
+            self._table = None
+        return rule
+
+    def unregister(self, rule: EdgeRule) -> None:
+        with self._lock:
+            self._rules.remove(rule)
+            self._table = None
+
+    @property
+    def rules(self) -> Tuple[EdgeRule, ...]:
+        return tuple(self._rules)
+
+    def table(self) -> RuleTable:
+        table = self._table
+        if table is None:
+            with self._lock:
+                if self._table is None:
+                    self._table = RuleTable(self._rules)
+                table = self._table
+        return table
+
+
+def _default_rules() -> List[EdgeRule]:
+    storage_exits = frozenset(layer for layer in LAYERS if layer != "Async")
+    rules = [
+        EdgeRule(
+            "User cannot directly access storage or cache layers.",
+            source_types=frozenset({"User"}),
+            target_types=frozenset({"Database", "Cache"}),
+        ),
+        EdgeRule(
+            "Cache cannot send traffic to compute layers.",
+            source_types=frozenset({"Cache"}),
+            target_layers=frozenset({"Compute"}),
+        ),
+        EdgeRule(
+            "Database cannot send traffic to compute layers.",
+            source_types=frozenset({"Database"}),
+            target_layers=frozenset({"Compute"}),
+        ),
+        EdgeRule(
+            "Storage nodes must be terminal unless sending to async processing.",
+            source_layers=frozenset({"Storage"}),
+            target_layers=storage_exits,
+        ),
+    ]
+    # Layer ordering is one rule per source layer, matching every layer that
+    # ALLOWED_TRANSITIONS does not list for it.
+    for layer in LAYERS:
+        allowed = ALLOWED_TRANSITIONS.get(layer, set())
+        illegal = frozenset(target for target in LAYERS if target not in allowed)
+        if illegal:
+            rules.append(
+                EdgeRule("Illegal layer ordering detected.", source_layers=frozenset({layer}), target_layers=illegal)
+            )
+    return rules
+
+
+edge_rule_registry = RuleRegistry(_default_rules())
+
+
+def register_edge_rule(
+    message: str,
+    source_types: Iterable[str] = (),
+    source_layers: Iterable[str] = (),
+    target_types: Iterable[str] = (),
+    target_layers: Iterable[str] = (),
+) -> EdgeRule:
+    return edge_rule_registry.register(message, source_types, source_layers, target_types, target_layers)
@@ -1,243 +1,220 @@
 from __future__ import annotations
 
-from collections import defaultdict, deque
-from typing import Dict, List, Set, Tuple
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .compiled import CompiledGraph, compile_graph
+from .rules import RuleTable, edge_rule_registry
 
 Node = Dict[str, object]
 Graph = Dict[str, object]
 
+MAX_ERROR_DETAILS = 100
+VECTORIZED_EDGES = 50_000
+
+
+class _Report:
+    # Every distinct message is kept for ``errors``; per-occurrence details with
+    # the offending node and edge ids stop being collected after ``limit``.
+
+    def __init__(self, compiled: CompiledGraph, graph: Graph, limit: int) -> None:
+        self.compiled = compiled
+        self.edges = graph.get("edges", []) or []
+        self.limit = limit
+        self.messages: Dict[str, None] = {}
+        self.details: List[Dict[str, object]] = []
+        self.count = 0
+
+    def add(
+        self, message: str, node_ids: Optional[List[object]] = None, edge_ids: Optional[List[object]] = None
+    ) -> None:
+        self.messages[message] = None
+        self.count += 1
+        if len(self.details) < self.limit:
+            self.details.append({"message": message, "node_ids": node_ids or [], "edge_ids": edge_ids or []})
+
+    def has_room(self) -> bool:
+        return len(self.details) < self.limit
+
+    def add_count(self, message: str, count: int) -> None:
+        self.messages[message] = None
+        self.count += count
+
+    def add_edge(self, message: str, source: int, target: int, position: int) -> None:
+        if len(self.details) >= self.limit:
+            self.add_count(message, 1)
+            return
+        ids = self.compiled.ids
+        self.add(message, node_ids=[ids[source], ids[target]], edge_ids=[self.edge_id(position)])
+
+    def add_nodes(self, message: str, nodes: List[int]) -> None:
+        ids = self.compiled.ids
+        self.add(message, node_ids=[ids[node] for node in nodes[: self.limit]])
+
+    def edge_id(self, position: int) -> object:
+        edge = self.edges[position]
+        return edge.get("id") or f"{edge.get('source')}->{edge.get('target')}"
+
+    def result(self) -> Dict[str, object]:
+        return {
+            "valid": not self.messages,
+            "errors": sorted(self.messages),
+            "details": self.details,
+            "error_count": self.count,
+            "truncated": self.count > len(self.details),
+        }
+
+
+def validate_graph(
+    graph: Graph,
+    compiled: Optional[CompiledGraph] = None,
+    max_errors: int = MAX_ERROR_DETAILS,
+    rules: Optional[RuleTable] = None,
+) -> Dict[str, object]:
+    return validate_and_order(graph, compiled, max_errors, rules)[0]
+
+
+def validate_and_order(
+    graph: Graph,
+    compiled: Optional[CompiledGraph] = None,
+    max_errors: int = MAX_ERROR_DETAILS,
+    rules: Optional[RuleTable] = None,
+) -> Tuple[Dict[str, object], List[int]]:
+    # The validation result plus the topological order found on the way, for
+    # callers that need both. Nodes on a cycle are left out of the order.
+    if compiled is None:
+        compiled = compile_graph(graph)
+    report = _Report(compiled, graph if isinstance(graph, dict) else {}, max_errors)
+
+    if not compiled.input_node_count:
+        report.add("Graph must contain at least one node.")
+        return report.result(), []
+
+    if compiled.has_missing_ids:
+        report.add("Each node must include a non-empty id.")
+    for position in compiled.invalid_edges:
+        edge = report.edges[position]
+        missing = [node_id for node_id in (edge.get("source"), edge.get("target")) if node_id not in compiled.index]
+        report.add("Edges must reference valid node ids.", node_ids=missing, edge_ids=[report.edge_id(position)])
+    for position in compiled.self_loops:
+        edge = report.edges[position]
+        report.add(
+            "Self-referential edges are not allowed.",
+            node_ids=[edge.get("source")],
+            edge_ids=[report.edge_id(position)],
+        )
+
+    count = compiled.node_count
+    offsets = compiled.adj_offsets
+    targets = compiled.adj_targets
+    types = compiled.types
+    layers = compiled.layers
+    outdegree = compiled.outdegree
+
+    table = rules or edge_rule_registry.table()
+    node_codes = table.codes(types)
+    user_nodes = [node for node in range(count) if types[node] == "User"]
+    has_terminal_storage = any(layers[node] == "Storage" and not outdegree[node] for node in range(count))
 
-TYPE_ALIASES = {
-    "user": "User",
-    "cdn": "CDN",
-    "apigateway": "APIGateway",
-    "api_gateway": "APIGateway",
-    "loadbalancer": "LoadBalancer",
-    "load_balancer": "LoadBalancer",
-    "edge": "Edge",
-    "ratelimiter": "RateLimiter",
-    "rate_limiter": "RateLimiter",
-    "server": "Server",
-    "appserver": "Server",
-    "matchingengine": "MatchingEngine",
-    "locationservice": "LocationService",
-    "tripservice": "TripService",
-    "transactionservice": "TransactionService",
-    "mlinferenceservice": "MLInferenceService",
-    "mlservice": "MLInferenceService",
-    "ruleengine": "RuleEngine",
-    "idgenerator": "IDGenerator",
-    "inventoryservice": "InventoryService",
-    "paymentgateway": "PaymentGateway",
-    "inventorylocking": "InventoryLocking",
-    "inventorylockinglayer": "InventoryLocking",
-    "cache": "Cache",
-    "redis": "Cache",
-    "featurestore": "FeatureStore",
-    "database": "Database",
-    "messagestore": "MessageStore",
-    "mediastore": "MediaStore",
-    "services": "Services",
-    "searchindex": "SearchIndex",
-    "queue": "Queue",
-    "eventstream": "EventStream",
-    "eventqueue": "EventStream",
-    "worker": "Worker",
-    "notificationservice": "NotificationService",
-    "gateway": "Gateway",
-    "chatserver": "ChatServer",
-    "tokenbucket": "TokenBucket",
-    "distributedsync": "DistributedSync",
-}
-
-LAYER_MAP = {
-    "User": "External",
-    "CDN": "Edge",
-    "APIGateway": "Edge",
-    "LoadBalancer": "Edge",
-    "Edge": "Edge",
-    "RateLimiter": "Edge",
-    "Gateway": "Edge",
-    "Server": "Compute",
-    "MatchingEngine": "Compute",
-    "LocationService": "Compute",
-    "TripService": "Compute",
-    "TransactionService": "Compute",
-    "MLInferenceService": "Compute",
-    "RuleEngine": "Compute",
-    "IDGenerator": "Compute",
-    "InventoryService": "Compute",
-    "PaymentGateway": "Compute",
-    "InventoryLocking": "Compute",
-    "ChatServer": "Compute",
-    "Services": "Compute",
-    "Cache": "DataAccess",
-    "Database": "Storage",
-    "FeatureStore": "Storage",
-    "MessageStore": "Storage",
-    "MediaStore": "Storage",
-    "SearchIndex": "Storage",
-    "Queue": "Async",
-    "EventStream": "Async",
-    "Worker": "Async",
-    "TokenBucket": "DataAccess",
-    "DistributedSync": "Async",
-    "NotificationService": "Notification",
-}
-
-ALLOWED_TRANSITIONS = {
-    "External": {"Edge"},
-    "Edge": {"Edge", "Compute"},
-    "Compute": {"Compute", "DataAccess", "Storage", "Async", "Notification"},
-    "DataAccess": {"Storage"},
-    "Storage": {"Async"},
-    "Async": {"Async", "Storage"},
-    "Notification": set(),
-}
-
-
-def normalize_type(node_type: object) -> str:
-    if not node_type:
-        return "Server"
-    raw = str(node_type).strip()
-    key = raw.lower().replace(" ", "").replace("-", "_")
-    return TYPE_ALIASES.get(key, raw)
-
-
-def _detect_cycle(node_id: str, adjacency: Dict[str, List[str]], visiting: Set[str], visited: Set[str]) -> bool:
-    visiting.add(node_id)
-    for neighbor in adjacency.get(node_id, []):
-        if neighbor in visiting:
-            return True
-        if neighbor not in visited:
-            if _detect_cycle(neighbor, adjacency, visiting, visited):
-                return True
-    visiting.remove(node_id)
-    visited.add(node_id)
-    return False
-
-
-def validate_graph(graph: Graph) -> Dict[str, object]:
-    errors: List[str] = []
-    nodes = graph.get("nodes", []) or []
-    edges = graph.get("edges", []) or []
-
-    if not nodes:
-        return {"valid": False, "errors": ["Graph must contain at least one node."]}
-
-    node_map = {node.get("id"): node for node in nodes if node.get("id")}
-    if len(node_map) != len(nodes):
-        errors.append("Each node must include a non-empty id.")
-
-    adjacency: Dict[str, List[str]] = defaultdict(list)
-    indegree: Dict[str, int] = defaultdict(int)
-    outdegree: Dict[str, int] = defaultdict(int)
-
-    for edge in edges:
-        source = edge.get("source")
-        target = edge.get("target")
-        if source not in node_map or target not in node_map:
-            errors.append("Edges must reference valid node ids.")
-            continue
-        if source == target:
-            errors.append("Self-referential edges are not allowed.")
-            continue
-        adjacency[source].append(target)
-        indegree[target] += 1
-        outdegree[source] += 1
-
-    for node_id in node_map:
-        indegree.setdefault(node_id, 0)
-        outdegree.setdefault(node_id, 0)
-
-    user_nodes = [node_id for node_id, node in node_map.items() if normalize_type(node.get("type")) == "User"]
     if not user_nodes:
-        errors.append("Graph must contain at least one User node.")
-
-    visited = set()
-    for node_id in node_map:
-        if node_id not in visited:
-            if _detect_cycle(node_id, adjacency, set(), visited):
-                errors.append("Graph must be a DAG.")
-                break
-
-    if user_nodes:
-        reachable: Set[str] = set()
-        queue = deque(user_nodes)
-        while queue:
-            node_id = queue.popleft()
-            if node_id in reachable:
-                continue
-            reachable.add(node_id)
-            for neighbor in adjacency.get(node_id, []):
-                if neighbor not in reachable:
-                    queue.append(neighbor)
-        unreachable = [node_id for node_id in node_map if node_id not in reachable]
-        if unreachable:
-            errors.append("All nodes must be reachable from a User node.")
-
-    storage_nodes = [node_id for node_id, node in node_map.items() if LAYER_MAP.get(normalize_type(node.get("type"))) == "Storage"]
-    if not any(outdegree[node_id] == 0 for node_id in storage_nodes):
-        errors.append("Graph must contain at least one terminal storage node.")
-
-    for source, targets in adjacency.items():
-        source_type = normalize_type(node_map[source].get("type"))
-        source_layer = LAYER_MAP.get(source_type, "Compute")
-        for target in targets:
-            target_type = normalize_type(node_map[target].get("type"))
-            target_layer = LAYER_MAP.get(target_type, "Compute")
-
-            if source_type == "User" and target_type in {"Database", "Cache"}:
-                errors.append("User cannot directly access storage or cache layers.")
-
-            if source_type == "Cache" and target_layer == "Compute":
-                errors.append("Cache cannot send traffic to compute layers.")
-
-            if source_type == "Database" and target_layer == "Compute":
-                errors.append("Database cannot send traffic to compute layers.")
-
-            if source_layer == "Storage" and target_layer not in {"Async"}:
-                errors.append("Storage nodes must be terminal unless sending to async processing.")
-
-            if target_layer not in ALLOWED_TRANSITIONS.get(source_layer, set()):
-                errors.append("Illegal layer ordering detected.")
-
-    return {"valid": len(errors) == 0, "errors": sorted(set(errors))}
-
-
-def topological_order(graph: Graph) -> Tuple[List[str], List[str]]:
-    nodes = graph.get("nodes", []) or []
-    edges = graph.get("edges", []) or []
-    node_map = {node.get("id"): node for node in nodes if node.get("id")}
-
-    adjacency = defaultdict(list)
-    indegree = defaultdict(int)
-
-    for edge in edges:
-        source = edge.get("source")
-        target = edge.get("target")
-        if source not in node_map or target not in node_map:
-            continue
-        if source == target:
-            continue
-        adjacency[source].append(target)
-        indegree[target] += 1
-
-    for node_id in node_map:
-        indegree.setdefault(node_id, 0)
-
-    queue = deque([node_id for node_id, deg in indegree.items() if deg == 0])
-    ordered = []
-
+        report.add("Graph must contain at least one User node.")
+
+    _check_edges(report, compiled, table, node_codes)
+
+    # One Kahn traversal orders the graph and propagates reachability from
+    # User nodes.
+    reachable = bytearray(count)
+    for node in user_nodes:
+        reachable[node] = 1
+    indegree = list(compiled.indegree)
+    queue = deque(node for node in range(count) if indegree[node] == 0)
+    ordered: List[int] = []
+    checked = bytearray(count)
     while queue:
-        node_id = queue.popleft()
-        ordered.append(node_id)
-        for neighbor in adjacency.get(node_id, []):
+        node = queue.popleft()
+        ordered.append(node)
+        checked[node] = 1
+        is_reachable = reachable[node]
+        for slot in range(offsets[node], offsets[node + 1]):
+            neighbor = targets[slot]
+            if is_reachable:
+                reachable[neighbor] = 1
             indegree[neighbor] -= 1
             if indegree[neighbor] == 0:
                 queue.append(neighbor)
 
-    if len(ordered) != len(node_map):
+    if len(ordered) != count:
+        remaining = [node for node in range(count) if not checked[node]]
+        report.add_nodes("Graph must be a DAG.", remaining)
+        # Cycles are never released by Kahn, so finish reachability with a
+        # plain search from everything reached so far.
+        stack = [node for node in range(count) if reachable[node]]
+        while stack:
+            node = stack.pop()
+            for slot in range(offsets[node], offsets[node + 1]):
+                neighbor = targets[slot]
+                if not reachable[neighbor]:
+                    reachable[neighbor] = 1
+                    stack.append(neighbor)
+
+    if user_nodes and reachable.count(1) != count:
+        report.add_nodes("All nodes must be reachable from a User node.", [n for n in range(count) if not reachable[n]])
+
+    if not has_terminal_storage:
+        report.add("Graph must contain at least one terminal storage node.")
+
+    return report.result(), ordered
+
+
+def _check_edges(report: _Report, compiled: CompiledGraph, table: RuleTable, node_codes: List[int]) -> None:
+    # Edges are checked in adjacency order. Large graphs look up all edge
+    # masks in one vectorized step and only visit the offending edges.
+    offsets = compiled.adj_offsets
+    targets = compiled.adj_targets
+    adj_edges = compiled.adj_edges
+    if compiled.edge_count >= VECTORIZED_EDGES:
+        codes = np.asarray(node_codes, dtype=np.intp)
+        sources = np.repeat(np.arange(compiled.node_count), np.diff(np.asarray(offsets)))
+        destinations = np.asarray(targets, dtype=np.intp)
+        masks = table.edge_masks(codes[sources], codes[destinations])
+        offending = np.flatnonzero(masks)
+        listed = 0
+        while listed < len(offending) and report.has_room():
+            slot = int(offending[listed])
+            for message in table.decode(int(masks[slot])):
+                report.add_edge(message, int(sources[slot]), targets[slot], adj_edges[slot])
+            listed += 1
+        values, counts = np.unique(masks[offending[listed:]], return_counts=True)
+        for value, repeats in zip(values.tolist(), counts.tolist()):
+            for message in table.decode(value):
+                report.add_count(message, repeats)
+        return
+
+    masks = table.masks
+    width = table.width
+    for node in range(compiled.node_count):
+        row = node_codes[node] * width
+        for slot in range(offsets[node], offsets[node + 1]):
+            neighbor = targets[slot]
+            mask = masks[row + node_codes[neighbor]]
+            if mask:
+                for message in table.decode(mask):
+                    report.add_edge(message, node, neighbor, adj_edges[slot])
+
+
+def topological_order(
+    graph: Graph, compiled: Optional[CompiledGraph] = None, order: Optional[List[int]] = None
+) -> Tuple[List[str], List[str]]:
+    # ``order`` is one already found, for example by validate_and_order.
+    if compiled is None:
+        compiled = compile_graph(graph)
+    if order is None:
+        order = compiled.order
+
+    if len(order) != compiled.node_count:
         return [], ["Graph must not contain disconnected nodes."]
 
-    return ordered, []
+    ids = compiled.ids
+    return [ids[node] for node in order], []
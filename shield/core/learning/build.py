@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+
+from .bundle import BUNDLE_NAME, build_bundle
+from .registry import PRESETS_DIR, preset_registry
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Validate all presets and write them to one bundle file.")
+    parser.add_argument("--output", type=Path, default=PRESETS_DIR / BUNDLE_NAME)
+    args = parser.parse_args()
+    count = build_bundle(preset_registry._preset_paths(), args.output)
+    print(f"Wrote {count} presets to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
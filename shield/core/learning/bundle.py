@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import hashlib
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+from .loader import load_manifest_entry, load_preset
+from .models import SystemDesign
+
+BUNDLE_MAGIC = b"SHPB"
+BUNDLE_VERSION = 1
+BUNDLE_NAME = "presets.bundle"
+# magic, format version, length of the pickled index that follows
+_HEADER = struct.Struct("<4sHI")
+
+
+def file_digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def build_bundle(paths: Iterable[Path], output: Path) -> int:
+    # Parses and validates every preset, then writes one file: the header, an
+    # index with each preset's manifest, file signature and blob position, and
+    # one pickled SystemDesign per preset. Invalid presets raise
+    # PresetLoadError and nothing is written.
+    index: Dict[str, Dict[str, object]] = {}
+    blobs = []
+    offset = 0
+    for path in paths:
+        raw = path.read_bytes()
+        stat = path.stat()
+        design = load_preset(path)
+        blob = pickle.dumps(design, protocol=pickle.HIGHEST_PROTOCOL)
+        index[path.stem] = {
+            "manifest": load_manifest_entry(path),
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "digest": file_digest(raw),
+            "offset": offset,
+            "length": len(blob),
+        }
+        blobs.append(blob)
+        offset += len(blob)
+
+    index_blob = pickle.dumps(index, protocol=pickle.HIGHEST_PROTOCOL)
+    handle, temporary = tempfile.mkstemp(dir=output.parent, suffix=".tmp")
+    try:
+        with os.fdopen(handle, "wb") as stream:
+            stream.write(_HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, len(index_blob)))
+            stream.write(index_blob)
+            for blob in blobs:
+                stream.write(blob)
+        os.chmod(temporary, 0o644)
+        os.replace(temporary, output)
+    except BaseException:
+        Path(temporary).unlink(missing_ok=True)
+        raise
+    return len(index)
+
+
+class PresetBundle:
+    # A memory-mapped bundle. Opening it reads only the header and the index;
+    # a design is unpickled from its own slice of the mapping when asked for.
+
+    def __init__(self, path: Path) -> None:
+        with path.open("rb") as handle:
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, index_length = _HEADER.unpack_from(self._map, 0)
+        if magic != BUNDLE_MAGIC or version != BUNDLE_VERSION:
+            raise ValueError(f"Unsupported preset bundle: {path.name}")
+        start = _HEADER.size
+        self.entries: Dict[str, Dict[str, object]] = pickle.loads(self._map[start : start + index_length])
+        self._data_start = start + index_length
+
+    def is_fresh(self, design_id: str, path: Path, signature: Tuple[int, int]) -> bool:
+        # A matching mtime and size is trusted. Otherwise a file of the same
+        # size is compared by content, since checkouts and copies change the
+        # mtime without changing the preset.
+        entry = self.entries.get(design_id)
+        if entry is None:
+            return False
+        if (entry["mtime_ns"], entry["size"]) == signature:
+            return True
+        if entry["size"] != signature[1]:
+            return False
+        try:
+            return file_digest(path.read_bytes()) == entry["digest"]
+        except OSError:
+            return False
+
+    def manifest(self, design_id: str) -> Dict[str, str]:
+        return dict(self.entries[design_id]["manifest"])
+
+    def design(self, design_id: str) -> SystemDesign:
+        entry = self.entries[design_id]
+        start = self._data_start + entry["offset"]
+        return pickle.loads(self._map[start : start + entry["length"]])
+
+
+def open_bundle(path: Path) -> Optional[PresetBundle]:
+    try:
+        return PresetBundle(path)
+    except (OSError, ValueError, EOFError, struct.error, pickle.UnpicklingError):
+        return None
+
@@ -1,29 +1,17 @@
 from __future__ import annotations
 
-from pathlib import Path
 from typing import Dict, List
 
-from .models import SystemDesign
-from .registry import DesignRegistry
+from .registry import DesignRegistry, preset_registry
 
 
 def _default_registry() -> DesignRegistry:
-    presets_dir = Path(__file__).resolve().parents[2] / "presets"
-    return DesignRegistry(presets_dir=presets_dir)
+    return preset_registry
 
 
 def get_available_designs() -> List[Dict[str, object]]:
     registry = _default_registry()
-    designs = registry.list_designs()
-    return [
-        {
-            "id": design.id,
-            "name": design.name,
-            "difficulty": design.difficulty,
-            "description": design.description,
-        }
-        for design in designs
-    ]
+    return registry.list_manifest()
 
 
 def load_design(design_id: str) -> Dict[str, object]:
@@ -3,70 +3,162 @@ from __future__ import annotations
 import hashlib
 import random
 from dataclasses import dataclass, field
-from typing import Dict, Iterable, List, Optional
+from typing import Dict, List, Optional, Tuple
 
+import numpy as np
+
+from .loader import PresetLoadError
 from .models import FAQ, SystemDesign
-from .registry import DesignRegistry
+from .registry import DesignRegistry, preset_registry
+from .search import FAQIndex
+
+_EMPTY = np.zeros(0, dtype=np.int64)
+
+
+@dataclass(frozen=True)
+class _Postings:
+    # Sorted FAQ positions per stage, topic, difficulty and component of one
+    # design. FAQs without a stage apply to every stage, so each stage list
+    # already includes them.
+    design: SystemDesign
+    faqs: List[FAQ]
+    positions: Dict[str, int]
+    stages: Dict[int, np.ndarray]
+    general: np.ndarray
+    topics: Dict[str, np.ndarray]
+    difficulties: Dict[str, np.ndarray]
+    components: Dict[str, np.ndarray]
+
+    @classmethod
+    def build(cls, design: SystemDesign) -> "_Postings":
+        faqs = list(design.faqs)
+        stages: Dict[Optional[int], List[int]] = {}
+        topics: Dict[str, List[int]] = {}
+        difficulties: Dict[str, List[int]] = {}
+        components: Dict[str, List[int]] = {}
+        for position, faq in enumerate(faqs):
+            stages.setdefault(faq.stage, []).append(position)
+            difficulties.setdefault(faq.difficulty, []).append(position)
+            for topic in {topic.lower() for topic in faq.topics}:
+                topics.setdefault(topic, []).append(position)
+            for component in {component.lower() for component in faq.related_components}:
+                components.setdefault(component, []).append(position)
+
+        general = _array(stages.pop(None, []))
+        return cls(
+            design=design,
+            faqs=faqs,
+            positions={faq.id: position for position, faq in enumerate(faqs)},
+            stages={stage: np.union1d(_array(items), general) for stage, items in stages.items()},
+            general=general,
+            topics={key: _array(items) for key, items in topics.items()},
+            difficulties={key: _array(items) for key, items in difficulties.items()},
+            components={key: _array(items) for key, items in components.items()},
+        )
+
+    def match(
+        self,
+        stage: Optional[int] = None,
+        topic: Optional[str] = None,
+        difficulty: Optional[str] = None,
+        component: Optional[str] = None,
+    ) -> List[int]:
+        # Intersects the posting list of every given filter, shortest first,
+        # and stops as soon as the running result is empty.
+        lists = []
+        if stage is not None:
+            lists.append(self.stages.get(stage, self.general))
+        if topic:
+            lists.append(self.topics.get(topic.strip().lower(), _EMPTY))
+        if difficulty:
+            lists.append(self.difficulties.get(difficulty.strip(), _EMPTY))
+        if component:
+            lists.append(self.components.get(component.strip().lower(), _EMPTY))
+        if not lists:
+            return list(range(len(self.faqs)))
+        lists.sort(key=len)
+        result = lists[0]
+        for items in lists[1:]:
+            if not len(result):
+                break
+            result = np.intersect1d(result, items, assume_unique=True)
+        return result.tolist()
+
+
+def _array(items: List[int]) -> np.ndarray:
+    return np.asarray(items, dtype=np.int64)
 
 
 @dataclass
 class FAQEngine:
     registry: DesignRegistry
-    _topic_index: Dict[str, Dict[str, List[str]]] = field(default_factory=dict, init=False)
-    _faq_index: Dict[str, Dict[str, FAQ]] = field(default_factory=dict, init=False)
+    _postings_by_design: Dict[str, _Postings] = field(default_factory=dict, init=False)
+    _search_index: Optional[FAQIndex] = field(default=None, init=False)
+    _design_indexes: Dict[str, FAQIndex] = field(default_factory=dict, init=False)
 
     def get_all_faqs(self, design_id: str) -> List[Dict[str, object]]:
-        design = self._load_design(design_id)
-        return [faq.to_dict() for faq in design.faqs]
+        return self.query(design_id)[0]
 
     def get_faqs_by_stage(self, design_id: str, stage_number: int) -> List[Dict[str, object]]:
-        design = self._load_design(design_id)
-        return [faq.to_dict() for faq in design.faqs]
+        return self.query(design_id, stage=stage_number)[0]
 
     def filter_by_topic(self, design_id: str, topic: str) -> List[Dict[str, object]]:
-        topic_key = topic.strip().lower()
-        self._ensure_index(design_id)
-        ids = self._topic_index[design_id].get(topic_key, [])
-        return [self._faq_index[design_id][faq_id].to_dict() for faq_id in ids]
+        return self.query(design_id, topic=topic)[0]
 
     def filter_by_difficulty(self, design_id: str, difficulty: str) -> List[Dict[str, object]]:
-        target = difficulty.strip()
-        design = self._load_design(design_id)
-        return [faq.to_dict() for faq in design.faqs if faq.difficulty == target]
+        return self.query(design_id, difficulty=difficulty)[0]
+
+    def query(
+        self,
+        design_id: str,
+        stage: Optional[int] = None,
+        topic: Optional[str] = None,
+        difficulty: Optional[str] = None,
+        component: Optional[str] = None,
+        search: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> Tuple[List[Dict[str, object]], int]:
+        # Returns one page of matching FAQs and the total number of matches.
+        # Filters are answered from posting lists; only the FAQs on the page
+        # are turned into dicts. With ``search`` the matches keep their
+        # relevance order, otherwise file order.
+        postings = self._postings(design_id)
+        positions = postings.match(stage=stage, topic=topic, difficulty=difficulty, component=component)
+        if search is not None:
+            allowed = set(positions)
+            positions = [
+                position
+                for position in self._design_index(design_id, postings.design).rank(search, postings.design.id)
+                if position in allowed
+            ]
+        offset = max(offset, 0)
+        end = None if limit is None else offset + max(limit, 0)
+        page = [postings.faqs[position].to_dict() for position in positions[offset:end]]
+        return page, len(positions)
 
     def search_questions(self, design_id: str, keyword: str) -> List[Dict[str, object]]:
-        term = keyword.strip().lower()
-        if not term:
-            return []
-        scored = []
-        design = self._load_design(design_id)
-        for faq in design.faqs:
-            content = " ".join(
-                [faq.question, faq.answer, " ".join(faq.topics), " ".join(faq.related_components)]
-            ).lower()
-            score = content.count(term)
-            if score:
-                scored.append((score, faq))
-        scored.sort(key=lambda item: (-item[0], item[1].id))
-        return [faq.to_dict() for _, faq in scored]
+        return self.query(design_id, search=keyword)[0]
+
+    def search(self, query: str, limit: int = 20, design_id: Optional[str] = None) -> List[Dict[str, object]]:
+        hits = self._index().search(query, limit, design_id)
+        return [
+            {"design_id": hit_design, "score": round(score, 4), "faq": faq.to_dict()}
+            for score, hit_design, faq in hits
+        ]
 
     def get_related_faqs(self, design_id: str, faq_id: str) -> List[Dict[str, object]]:
-        self._ensure_index(design_id)
-        faq = self._faq_index[design_id].get(faq_id)
-        if not faq:
+        postings = self._postings(design_id)
+        position = postings.positions.get(faq_id)
+        if position is None:
             return []
-        related = []
-        target_topics = set(topic.lower() for topic in faq.topics)
-        target_components = set(component.lower() for component in faq.related_components)
-        design = self._load_design(design_id)
-        for candidate in design.faqs:
-            if candidate.id == faq.id:
-                continue
-            candidate_topics = set(topic.lower() for topic in candidate.topics)
-            candidate_components = set(component.lower() for component in candidate.related_components)
-            if target_topics & candidate_topics or target_components & candidate_components:
-                related.append(candidate)
-        return [item.to_dict() for item in related]
+        faq = postings.faqs[position]
+        related = _EMPTY
+        for topic in {topic.lower() for topic in faq.topics}:
+            related = np.union1d(related, postings.topics[topic])
+        for component in {component.lower() for component in faq.related_components}:
+            related = np.union1d(related, postings.components[component])
+        return [postings.faqs[item].to_dict() for item in related.tolist() if item != position]
 
     def generate_interview_round(
         self,
@@ -75,13 +167,8 @@ class FAQEngine:
         topic: Optional[str] = None,
         limit: int = 5,
     ) -> List[Dict[str, object]]:
-        design = self._load_design(design_id)
-        faqs = list(design.faqs)
-        if difficulty:
-            faqs = [faq for faq in faqs if faq.difficulty == difficulty]
-        if topic:
-            topic_key = topic.strip().lower()
-            faqs = [faq for faq in faqs if topic_key in {t.lower() for t in faq.topics}]
+        postings = self._postings(design_id)
+        faqs = [postings.faqs[position] for position in postings.match(topic=topic, difficulty=difficulty)]
 
         if not faqs:
             return []
@@ -94,26 +181,41 @@ class FAQEngine:
         selected = rng.sample(faqs, limit)
         return [faq.to_dict() for faq in selected]
 
-    def _iter_faqs(self, design_id: str) -> Iterable[FAQ]:
-        design = self._load_design(design_id)
-        return list(design.faqs)
-
-    def _ensure_index(self, design_id: str) -> None:
-        if design_id in self._topic_index:
-            return
-        self._build_index(design_id)
-
-    def _build_index(self, design_id: str) -> None:
-        topic_index: Dict[str, List[str]] = {}
-        faq_index: Dict[str, FAQ] = {}
+    def _postings(self, design_id: str) -> _Postings:
+        # Rebuilt when the registry hands out a different design object,
+        # which happens only after its preset reloads.
         design = self._load_design(design_id)
-        for faq in design.faqs:
-            faq_index[faq.id] = faq
-            for topic in faq.topics:
-                key = topic.lower()
-                topic_index.setdefault(key, []).append(faq.id)
-        self._topic_index[design_id] = topic_index
-        self._faq_index[design_id] = faq_index
+        postings = self._postings_by_design.get(design_id)
+        if postings is None or postings.design is not design:
+            postings = _Postings.build(design)
+            self._postings_by_design[design_id] = postings
+        return postings
+
+    def _design_index(self, design_id: str, design: SystemDesign) -> FAQIndex:
+        # Searches within one design use an index of that design alone, so
+        # they never load the other presets. Its segment is shared with the
+        # cross-design index when that one is already built.
+        index = self._design_indexes.get(design_id)
+        if index is None or not index.covers([design]):
+            index = FAQIndex.build([design], self._search_index)
+            self._design_indexes[design_id] = index
+        return index
+
+    def _index(self) -> FAQIndex:
+        # Rebuilt, for the changed designs only, whenever the registry hands
+        # out a different design object after a preset reload. A preset that
+        # fails to load is left out of search instead of failing it.
+        designs = []
+        for design_id in self.registry.design_ids():
+            try:
+                designs.append(self.registry.get_design(design_id))
+            except (FileNotFoundError, PresetLoadError):
+                continue
+        index = self._search_index
+        if index is None or not index.covers(designs):
+            index = FAQIndex.build(designs, index)
+            self._search_index = index
+        return index
 
     def _load_design(self, design_id: str) -> SystemDesign:
         return self.registry.get_design(design_id)
@@ -128,3 +230,8 @@ class FAQEngine:
         seed_key = f"{design_id}:{difficulty or ''}:{topic or ''}:{limit}"
         digest = hashlib.sha256(seed_key.encode("utf-8")).hexdigest()
         return int(digest[:8], 16)
+
+
+# Shared by every request, so the search index is built once per process and
+# then only refreshed for presets that reload.
+faq_engine = FAQEngine(preset_registry)
@@ -7,6 +7,9 @@ from typing import Dict
 from .models import SystemDesign
 
 
+MANIFEST_FIELDS = ("id", "name", "difficulty", "description")
+
+
 class PresetLoadError(RuntimeError):
     pass
 
@@ -31,5 +34,24 @@ def load_preset(path: Path) -> SystemDesign:
         raise PresetLoadError(f"Preset {path.name} is invalid: {exc}") from exc
 
 
+def load_manifest_entry(path: Path) -> Dict[str, str]:
+    # The fields the preset list needs, without building stages and FAQs.
+    try:
+        with path.open("r", encoding="utf-8") as handle:
+            data = json.load(handle)
+    except (OSError, json.JSONDecodeError) as exc:
+        raise PresetLoadError(f"Unable to load preset: {path.name}") from exc
+
+    if not isinstance(data, dict):
+        raise PresetLoadError(f"Preset {path.name} must contain a JSON object.")
+
+    entry = {field: str(data.get(field) or "").strip() for field in MANIFEST_FIELDS}
+    entry["id"] = entry["id"] or path.stem
+    missing = [field for field in MANIFEST_FIELDS if not entry[field]]
+    if missing:
+        raise PresetLoadError(f"Preset {path.name} is invalid: Design preset missing fields: {', '.join(missing)}")
+    return entry
+
+
 def load_raw(path: Path) -> Dict[str, object]:
     return load_preset(path).to_dict()
@@ -1,17 +1,45 @@
 from __future__ import annotations
 
+import json
+import os
+import pickle
+import tempfile
+import threading
+import time
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, Iterable, List
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
 
-from .loader import load_preset
+from .bundle import BUNDLE_NAME, PresetBundle, open_bundle
+from .loader import MANIFEST_FIELDS, PresetLoadError, load_manifest_entry, load_preset
 from .models import SystemDesign
 
+PRESETS_DIR = Path(__file__).resolve().parents[2] / "presets"
+MANIFEST_CACHE_NAME = ".manifest.json"
+RELOAD_CHECK_INTERVAL = 2.0
+
+Signature = Tuple[int, int]
+
+
+@dataclass(frozen=True)
+class _Snapshot:
+    # The presets directory at one point in time: the manifest of every
+    # preset, plus designs parsed so far. Reloads build a new snapshot and
+    # swap it in, so readers never see a partially reloaded registry and need
+    # no lock. ``designs`` and ``errors`` only grow as designs are requested.
+    # ``bundled`` lists the presets whose bundle entry matches the file.
+    signatures: Dict[str, Signature]
+    manifest: Dict[str, Dict[str, str]]
+    designs: Dict[str, SystemDesign]
+    errors: Dict[str, PresetLoadError]
+    bundle: Optional[PresetBundle] = None
+    bundle_signature: Optional[Signature] = None
+    bundled: FrozenSet[str] = frozenset()
+
 
 @dataclass
 class DesignRegistry:
     presets_dir: Path
-    _cache: Dict[str, SystemDesign] = field(default_factory=dict, init=False)
     allowed_ids: List[str] = field(
         default_factory=lambda: [
             "booking_system",
@@ -26,13 +54,94 @@ class DesignRegistry:
             "video_streaming",
         ]
     )
+    check_interval: float = RELOAD_CHECK_INTERVAL
+    manifest_cache: Optional[Path] = None
+    bundle_path: Optional[Path] = None
+    _snapshot: Optional[_Snapshot] = field(default=None, init=False, repr=False)
+    _checked_at: float = field(default=0.0, init=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+    _parse_lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def list_manifest(self) -> List[Dict[str, str]]:
+        # id, name, difficulty and description of every preset, without
+        # parsing stages or FAQs.
+        snapshot = self._current()
+        broken = [error for design_id, error in snapshot.errors.items() if design_id not in snapshot.manifest]
+        if broken:
+            raise PresetLoadError(str(broken[0]))
+        return [dict(snapshot.manifest[design_id]) for design_id in sorted(snapshot.manifest)]
+
+    def design_ids(self) -> List[str]:
+        return sorted(self._current().signatures)
 
     def list_designs(self) -> List[SystemDesign]:
-        return [self._load(path) for path in self._preset_paths()]
+        snapshot = self._current()
+        return [self._design(snapshot, design_id) for design_id in sorted(snapshot.signatures)]
 
     def get_design(self, design_id: str) -> SystemDesign:
-        path = self._resolve_path(design_id)
-        return self._load(path)
+        if design_id not in self.allowed_ids:
+            raise FileNotFoundError(f"Preset {design_id} not found.")
+        snapshot = self._current()
+        if design_id not in snapshot.signatures:
+            raise FileNotFoundError(f"Preset {design_id} not found.")
+        return self._design(snapshot, design_id)
+
+    def _design(self, snapshot: _Snapshot, design_id: str) -> SystemDesign:
+        # Full designs are parsed on first use and kept in the snapshot, so a
+        # reload drops them together with the manifest entry they belong to.
+        design = snapshot.designs.get(design_id)
+        if design is None:
+            with self._parse_lock:
+                design = snapshot.designs.get(design_id)
+                if design is None and design_id not in snapshot.errors:
+                    design = self._bundled_design(snapshot, design_id)
+                if design is None and design_id not in snapshot.errors:
+                    try:
+                        design = load_preset(self.presets_dir / f"{design_id}.json")
+                    except PresetLoadError as exc:
+                        snapshot.errors[design_id] = exc
+                if design is not None:
+                    snapshot.designs[design_id] = design
+        if design is None:
+            raise PresetLoadError(str(snapshot.errors[design_id]))
+        return design
+
+    @staticmethod
+    def _bundled_design(snapshot: _Snapshot, design_id: str) -> Optional[SystemDesign]:
+        # A bundle written by an older version of the models may not unpickle;
+        # the JSON file is the fallback.
+        if snapshot.bundle is None or design_id not in snapshot.bundled:
+            return None
+        try:
+            return snapshot.bundle.design(design_id)
+        except (pickle.UnpicklingError, AttributeError, EOFError, ImportError, IndexError, TypeError, ValueError):
+            return None
+
+    def reload(self) -> None:
+        with self._lock:
+            self._snapshot = self._scan(self._snapshot)
+            self._checked_at = time.monotonic()
+
+    def _current(self) -> _Snapshot:
+        # Between checks the registry touches no files. After the interval
+        # one caller stats the directory and re-parses only changed files;
+        # callers arriving meanwhile keep using the previous snapshot.
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._snapshot = self._scan(None)
+                    self._checked_at = time.monotonic()
+                return self._snapshot
+        if self._lock.acquire(blocking=False):
+            try:
+                self._snapshot = self._scan(snapshot)
+                self._checked_at = time.monotonic()
+            finally:
+                self._lock.release()
+        return self._snapshot
 
     def _preset_paths(self) -> Iterable[Path]:
         if not self.presets_dir.exists():
@@ -40,16 +149,113 @@ class DesignRegistry:
         paths = [path for path in self.presets_dir.glob("*.json") if path.stem in self.allowed_ids]
         return sorted(paths)
 
-    def _resolve_path(self, design_id: str) -> Path:
-        if design_id not in self.allowed_ids:
-            raise FileNotFoundError(f"Preset {design_id} not found.")
-        path = self.presets_dir / f"{design_id}.json"
-        if not path.exists():
-            raise FileNotFoundError(f"Preset {design_id} not found.")
-        return path
+    def _scan(self, previous: Optional[_Snapshot]) -> _Snapshot:
+        paths: Dict[str, Path] = {}
+        signatures: Dict[str, Signature] = {}
+        for path in self._preset_paths():
+            signature = _signature(path)
+            if signature is not None:
+                paths[path.stem] = path
+                signatures[path.stem] = signature
+        bundle_signature = _signature(self.bundle_path) if self.bundle_path is not None else None
+        if previous is not None and bundle_signature == previous.bundle_signature:
+            if signatures == previous.signatures:
+                return previous
+            bundle = previous.bundle
+        else:
+            bundle = open_bundle(self.bundle_path) if bundle_signature is not None else None
+        same_bundle = previous is not None and bundle is previous.bundle
+
+        # Unchanged presets keep everything from the previous snapshot. Others
+        # take their manifest from a fresh bundle entry, then from the
+        # manifest cache, and only then from the JSON file.
+        known = self._read_manifest_cache() if previous is None else {}
+        manifest: Dict[str, Dict[str, str]] = {}
+        designs: Dict[str, SystemDesign] = {}
+        errors: Dict[str, PresetLoadError] = {}
+        bundled: Set[str] = set()
+        parsed = False
+        for design_id, path in paths.items():
+            signature = signatures[design_id]
+            if same_bundle and previous.signatures.get(design_id) == signature:
+                for source, target in (
+                    (previous.manifest, manifest),
+                    (previous.designs, designs),
+                    (previous.errors, errors),
+                ):
+                    if design_id in source:
+                        target[design_id] = source[design_id]
+                if design_id in previous.bundled:
+                    bundled.add(design_id)
+            elif bundle is not None and bundle.is_fresh(design_id, path, signature):
+                manifest[design_id] = bundle.manifest(design_id)
+                bundled.add(design_id)
+            elif design_id in known and known[design_id][0] == signature:
+                manifest[design_id] = known[design_id][1]
+            else:
+                parsed = True
+                try:
+                    manifest[design_id] = load_manifest_entry(path)
+                except PresetLoadError as exc:
+                    errors[design_id] = exc
+
+        if parsed:
+            self._write_manifest_cache(signatures, manifest)
+        return _Snapshot(
+            signatures,
+            manifest,
+            designs,
+            errors,
+            bundle=bundle,
+            bundle_signature=bundle_signature,
+            bundled=frozenset(bundled),
+        )
+
+    def _read_manifest_cache(self) -> Dict[str, Tuple[Signature, Dict[str, str]]]:
+        if self.manifest_cache is None:
+            return {}
+        try:
+            with self.manifest_cache.open("r", encoding="utf-8") as handle:
+                cached = json.load(handle)
+            return {
+                design_id: ((item["mtime_ns"], item["size"]), {key: str(item[key]) for key in MANIFEST_FIELDS})
+                for design_id, item in cached.items()
+            }
+        except (OSError, ValueError, TypeError, KeyError, AttributeError):
+            return {}
+
+    def _write_manifest_cache(self, signatures: Dict[str, Signature], manifest: Dict[str, Dict[str, str]]) -> None:
+        # Best effort: a read-only presets directory just means every cold
+        # start reads the preset files again.
+        if self.manifest_cache is None:
+            return
+        cached = {
+            design_id: dict(entry, mtime_ns=signatures[design_id][0], size=signatures[design_id][1])
+            for design_id, entry in manifest.items()
+        }
+        try:
+            handle, temporary = tempfile.mkstemp(dir=self.manifest_cache.parent, suffix=".tmp")
+        except OSError:
+            return
+        try:
+            with os.fdopen(handle, "w", encoding="utf-8") as output:
+                json.dump(cached, output, sort_keys=True)
+            os.chmod(temporary, 0o644)
+            os.replace(temporary, self.manifest_cache)
+        except OSError:
+            Path(temporary).unlink(missing_ok=True)
+
+
+def _signature(path: Path) -> Optional[Signature]:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
 
-    def _load(self, path: Path) -> SystemDesign:
-        design_id = path.stem
-        if design_id not in self._cache:
-            self._cache[design_id] = load_preset(path)
-        return self._cache[design_id]
+preset_registry = DesignRegistry(
+    presets_dir=PRESETS_DIR,
+    manifest_cache=PRESETS_DIR / MANIFEST_CACHE_NAME,
+    bundle_path=PRESETS_DIR / BUNDLE_NAME,
+)
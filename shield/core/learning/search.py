@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import bisect
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .models import FAQ, SystemDesign
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+# A query token also matches longer terms it is a prefix of, at a lower
+# weight than an exact match.
+PREFIX_WEIGHT = 0.5
+MIN_PREFIX_LENGTH = 2
+MAX_PREFIX_TERMS = 32
+
+STOP_WORDS = frozenset(
+    "a an and are as at be but by can do does for from has have how i if in into is it its not of on or should so "
+    "than that the their them then there these they this to was we were what when where which while who why will "
+    "with would you your".split()
+)
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+Hit = Tuple[float, str, FAQ]
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN.findall(text.lower()) if token not in STOP_WORDS]
+
+
+def _faq_text(faq: FAQ) -> str:
+    return " ".join([faq.question, faq.answer, *faq.topics, *faq.related_components])
+
+
+@dataclass(frozen=True)
+class _Segment:
+    # The postings of one design: term -> (FAQ positions, term frequencies),
+    # plus the token count of every FAQ. A segment depends only on its
+    # design, so a reload re-tokenizes the changed presets only.
+    design: SystemDesign
+    postings: Dict[str, Tuple[np.ndarray, np.ndarray]]
+    lengths: np.ndarray
+
+    @classmethod
+    def build(cls, design: SystemDesign) -> "_Segment":
+        positions: Dict[str, List[int]] = {}
+        frequencies: Dict[str, List[int]] = {}
+        lengths: List[int] = []
+        for position, faq in enumerate(design.faqs):
+            tokens = tokenize(_faq_text(faq))
+            for term, frequency in Counter(tokens).items():
+                positions.setdefault(term, []).append(position)
+                frequencies.setdefault(term, []).append(frequency)
+            lengths.append(len(tokens))
+        postings = {
+            term: (np.asarray(positions[term], dtype=np.int64), np.asarray(frequencies[term], dtype=np.float64))
+            for term in positions
+        }
+        return cls(design, postings, np.asarray(lengths, dtype=np.float64))
+
+
+@dataclass(frozen=True)
+class FAQIndex:
+    # An inverted index over the FAQs of every design, scored with BM25.
+    # FAQs are numbered across designs in design order, and each posting
+    # list holds those numbers with the BM25 term-frequency factor already
+    # computed, so a query is one vectorized add per matched term. Document
+    # frequencies and the average length are corpus-wide, so a score means
+    # the same thing whichever design a hit comes from.
+    segments: Dict[str, _Segment]
+    ranges: Dict[str, Tuple[int, int]]
+    faqs: List[Tuple[str, FAQ]]
+    postings: Dict[str, Tuple[np.ndarray, np.ndarray]]
+    idf: Dict[str, float]
+    vocabulary: List[str]
+
+    @classmethod
+    def build(cls, designs: Iterable[SystemDesign], previous: Optional["FAQIndex"] = None) -> "FAQIndex":
+        segments: Dict[str, _Segment] = {}
+        for design in designs:
+            segment = previous.segments.get(design.id) if previous is not None else None
+            if segment is None or segment.design is not design:
+                segment = _Segment.build(design)
+            segments[design.id] = segment
+
+        ranges: Dict[str, Tuple[int, int]] = {}
+        faqs: List[Tuple[str, FAQ]] = []
+        for design_id, segment in segments.items():
+            ranges[design_id] = (len(faqs), len(faqs) + len(segment.lengths))
+            faqs.extend((design_id, faq) for faq in segment.design.faqs)
+        lengths = np.concatenate([segment.lengths for segment in segments.values()] or [np.zeros(0)])
+        average = float(lengths.mean()) if len(lengths) else 1.0
+        norms = BM25_K1 * (1.0 - BM25_B + BM25_B * lengths / average)
+
+        parts: Dict[str, List[Tuple[np.ndarray, np.ndarray]]] = {}
+        for design_id, segment in segments.items():
+            offset = ranges[design_id][0]
+            for term, (positions, frequencies) in segment.postings.items():
+                parts.setdefault(term, []).append((positions + offset, frequencies))
+        postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        idf: Dict[str, float] = {}
+        for term, chunks in parts.items():
+            documents = np.concatenate([chunk[0] for chunk in chunks])
+            frequencies = np.concatenate([chunk[1] for chunk in chunks])
+            postings[term] = (documents, frequencies * (BM25_K1 + 1.0) / (frequencies + norms[documents]))
+            idf[term] = math.log(1.0 + (len(faqs) - len(documents) + 0.5) / (len(documents) + 0.5))
+        return cls(segments, ranges, faqs, postings, idf, sorted(idf))
+
+    def covers(self, designs: List[SystemDesign]) -> bool:
+        return len(designs) == len(self.segments) and all(
+            design.id in self.segments and self.segments[design.id].design is design for design in designs
+        )
+
+    def search(self, query: str, limit: int = 20, design_id: Optional[str] = None) -> List[Hit]:
+        scores, ranked = self._rank(query, limit, design_id)
+        return [(float(scores[document]), *self.faqs[document]) for document in ranked]
+
+    def rank(self, query: str, design_id: str) -> List[int]:
+        # Positions within the design's FAQ list of every match, best first.
+        if design_id not in self.ranges:
+            return []
+        low, high = self.ranges[design_id]
+        _, ranked = self._rank(query, high - low, design_id)
+        return [document - low for document in ranked]
+
+    def _rank(self, query: str, limit: int, design_id: Optional[str]) -> Tuple[np.ndarray, List[int]]:
+        weights = self._expand(query)
+        scores = np.zeros(len(self.faqs))
+        if not weights or limit <= 0:
+            return scores, []
+        if design_id is None:
+            low, high = 0, len(self.faqs)
+        elif design_id in self.ranges:
+            low, high = self.ranges[design_id]
+        else:
+            return scores, []
+
+        for term, weight in weights.items():
+            documents, factors = self.postings[term]
+            if design_id is not None:
+                window = slice(np.searchsorted(documents, low), np.searchsorted(documents, high))
+                documents, factors = documents[window], factors[window]
+            scores[documents] += self.idf[term] * weight * factors
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > limit:
+            # Keep everything tied with the limit-th score so ties are broken
+            # by position below, not by the partition.
+            cutoff = -np.partition(-scores[matched], limit - 1)[limit - 1]
+            matched = matched[scores[matched] >= cutoff]
+        # Highest score first; ties keep design and file order.
+        ranked = sorted(matched.tolist(), key=lambda document: (-scores[document], document))[:limit]
+        return scores, ranked
+
+    def _expand(self, query: str) -> Dict[str, float]:
+        weights: Dict[str, float] = {}
+        for token in tokenize(query):
+            if token in self.idf:
+                weights[token] = 1.0
+            if len(token) < MIN_PREFIX_LENGTH:
+                continue
+            start = bisect.bisect_left(self.vocabulary, token)
+            for term in self.vocabulary[start : start + MAX_PREFIX_TERMS + 1]:
+                if not term.startswith(token):
+                    break
+                if term != token:
+                    weights[term] = max(weights.get(term, 0.0), PREFIX_WEIGHT)
+        return weights
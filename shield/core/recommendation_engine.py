@@ -1,10 +1,11 @@
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 
 def generate_recommendations(
     performance: Dict[str, object],
     node_metrics: List[Dict[str, object]],
     warnings: List[str],
+    sensitivity: Optional[List[Dict[str, object]]] = None,
 ) -> List[str]:
     recommendations: List[str] = []
 
@@ -25,9 +26,25 @@ def generate_recommendations(
     if performance.get("total_latency", 0) and performance.get("total_latency", 0) > 500:
         recommendations.append("Optimize latency hotspots by tuning base latency or caching.")
 
-    for metric in node_metrics:
-        if metric.get("status") == "overloaded":
-            component_type = metric.get("component_type")
+    impact = {entry.get("component_id"): entry for entry in sensitivity or []}
+    overloaded = [metric for metric in node_metrics if metric.get("status") == "overloaded"]
+    if impact:
+        overloaded.sort(
+            key=lambda metric: -float(impact.get(metric.get("component_id"), {}).get("throughput_gain", 0))
+        )
+
+    for metric in overloaded:
+        component_type = metric.get("component_type")
+        entry = impact.get(metric.get("component_id"))
+        if entry and (entry["throughput_gain"] > 0 or (entry["latency_change"] or 0) < 0):
+            increase = round((entry["new_capacity"] / entry["capacity"] - 1) * 100) if entry["capacity"] else 0
+            effect = f"{entry['throughput_gain']:+g} RPS throughput"
+            if entry["latency_change"] is not None:
+                effect += f", {entry['latency_change']:+g} ms latency"
+            recommendations.append(
+                f"Scale {component_type} {metric.get('component_id')} capacity by {increase}%: {effect}."
+            )
+        else:
             recommendations.append(
                 f"Scale {component_type} capacity or add replicas to reduce utilization."
             )
@@ -0,0 +1,21 @@
+from .batch import BatchModel, BatchResult, simulate_sweep
+from .discrete_event import simulate_discrete_event
+from .incremental import IncrementalSimulation
+from .monte_carlo import latency_distribution
+from .optimizer import CapacityOptimizer, optimize_capacity
+from .sensitivity import capacity_sensitivity
+from .timeseries import is_timeseries_profile, simulate_timeseries
+
+__all__ = [
+    "BatchModel",
+    "BatchResult",
+    "CapacityOptimizer",
+    "IncrementalSimulation",
+    "capacity_sensitivity",
+    "is_timeseries_profile",
+    "latency_distribution",
+    "optimize_capacity",
+    "simulate_discrete_event",
+    "simulate_sweep",
+    "simulate_timeseries",
+]
@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from ..graph.compiled import CompiledGraph
+
+
+def _round3(values: np.ndarray) -> np.ndarray:
+    # np.round scales by 1000 and rounds half to even, so values within a
+    # rounding error of a half step can land on the other side of Python's
+    # round(value, 3), which the scalar engine uses. Those few values are
+    # re-rounded with Python so both engines agree exactly.
+    rounded = np.round(values, 3)
+    scaled = values * 1000.0
+    with np.errstate(invalid="ignore"):
+        near_half = np.abs(scaled - np.floor(scaled) - 0.5) <= 16 * np.spacing(np.abs(scaled))
+    if near_half.any():
+        # Unloaded nodes repeat their base latency on every row.
+        unique, inverse = np.unique(values[near_half], return_inverse=True)
+        rounded[near_half] = np.array([round(float(value), 3) for value in unique])[inverse]
+    return rounded
+
+
+@dataclass
+class BatchResult:
+    node_ids: List[str]
+    root_rps: np.ndarray
+    incoming_rps: np.ndarray
+    effective_rps: np.ndarray
+    utilization: np.ndarray
+    overflow: np.ndarray
+    latency: np.ndarray
+    throughput: np.ndarray
+    total_latency: np.ndarray
+    error_rate: np.ndarray
+    bottleneck: np.ndarray
+
+    def performance(self, row: int, component_types: Sequence[str]) -> Dict[str, object]:
+        root_rps = float(self.root_rps[row])
+        error_rate = round(float(self.error_rate[row]), 3)
+        bottleneck = int(self.bottleneck[row])
+        return {
+            "incoming_rps": int(root_rps),
+            "throughput": int(self.throughput[row]),
+            "total_latency": round(float(self.total_latency[row]), 3),
+            "total_error_rate": error_rate,
+            "error_rate": error_rate,
+            "bottleneck_node_id": self.node_ids[bottleneck] if bottleneck >= 0 else None,
+            "bottleneck_component": component_types[bottleneck] if bottleneck >= 0 else "",
+        }
+
+
+class BatchModel:
+    # Array form of ``simulate``: columns follow the topological order so that
+    # argmax tie-breaking matches the scalar engine, and nodes are grouped by
+    # level so one level of load can be propagated with a single scatter-add.
+
+    def __init__(self, compiled: CompiledGraph, order: Optional[List[int]] = None) -> None:
+        order = list(compiled.order if order is None else order)
+        count = len(order)
+        position = np.full(compiled.node_count, -1, dtype=np.int64)
+        position[order] = np.arange(count)
+
+        self.compiled = compiled
+        self.order = order
+        self.node_ids = [compiled.ids[node] for node in order]
+        self.component_types = [compiled.raw_types[node] for node in order]
+        self.size = count
+        self.entry = int(position[compiled.entry_node(order)]) if count else -1
+        self.is_user = np.array([compiled.is_user[node] for node in order], dtype=bool)
+        self.capacity = np.array([compiled.capacity[node] for node in order], dtype=np.float64)
+        self.base_latency = np.array([compiled.base_latency[node] for node in order], dtype=np.float64)
+        self.is_sink = np.array(
+            [compiled.outdegree[node] == 0 and not compiled.is_user[node] for node in order], dtype=bool
+        )
+
+        offsets = compiled.adj_offsets
+        sources = np.repeat(np.arange(compiled.node_count), np.diff(offsets))
+        self.edge_source = position[sources]
+        self.edge_target = position[np.asarray(compiled.adj_targets, dtype=np.int64)]
+        self.edge_fraction = np.asarray(compiled.edge_fractions, dtype=np.float64)
+        algorithms = compiled.algorithms
+        self.edge_least_capacity = np.array(
+            [algorithms[node] == "least_capacity" for node in sources.tolist()], dtype=bool
+        )
+        self.outdegree = np.diff(offsets)[order].astype(np.float64) if count else np.zeros(0)
+
+        levels = np.array([compiled.levels[node] for node in order], dtype=np.int64)
+        self.level_count = int(levels.max()) + 1 if count else 0
+        self.level_nodes = [np.flatnonzero(levels == level) for level in range(self.level_count)]
+        self.level_timed = [nodes[~self.is_user[nodes]] for nodes in self.level_nodes]
+        edge_levels = levels[self.edge_source] if len(self.edge_source) else np.zeros(0, dtype=np.int64)
+        self.level_edges = [np.flatnonzero(edge_levels == level) for level in range(self.level_count)]
+
+    def edge_fractions_for(self, capacity: np.ndarray) -> np.ndarray:
+        if capacity.ndim == 1 or not self.edge_least_capacity.any():
+            return self.edge_fraction
+        fractions = np.broadcast_to(self.edge_fraction, (capacity.shape[0], len(self.edge_fraction))).copy()
+        selected = np.flatnonzero(self.edge_least_capacity)
+        weights = np.maximum(capacity[:, self.edge_target[selected]], 0.0)
+        totals = np.zeros((capacity.shape[0], self.size))
+        np.add.at(totals, (slice(None), self.edge_source[selected]), weights)
+        source_totals = totals[:, self.edge_source[selected]]
+        even = 1.0 / self.outdegree[self.edge_source[selected]]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            fractions[:, selected] = np.where(source_totals == 0, even, weights / source_totals)
+        return fractions
+
+    def evaluate(self, root_rps: Sequence[float], capacity: Optional[np.ndarray] = None) -> BatchResult:
+        root = np.asarray(root_rps, dtype=np.float64).reshape(-1)
+        rows = root.shape[0]
+        if capacity is None:
+            capacity = self.capacity
+        capacity = np.asarray(capacity, dtype=np.float64)
+        capacity_rows = np.broadcast_to(capacity, (rows, self.size))
+        fractions = self.edge_fractions_for(capacity)
+        fraction_rows = np.broadcast_to(fractions, (rows, len(self.edge_fraction)))
+
+        incoming = np.zeros((rows, self.size))
+        effective = np.zeros((rows, self.size))
+        if self.size:
+            incoming[:, self.entry] = root
+
+        for nodes, edges in zip(self.level_nodes, self.level_edges):
+            level_incoming = incoming[:, nodes]
+            level_capacity = capacity_rows[:, nodes]
+            clamped = np.where(level_capacity > 0, np.minimum(level_incoming, level_capacity), 0.0)
+            effective[:, nodes] = np.where(self.is_user[nodes], level_incoming, clamped)
+            if len(edges):
+                shares = effective[:, self.edge_source[edges]] * fraction_rows[:, edges]
+                np.add.at(incoming, (slice(None), self.edge_target[edges]), shares)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            utilization = np.where(
+                capacity_rows > 0,
+                incoming / np.where(capacity_rows > 0, capacity_rows, 1.0),
+                np.where(incoming > 0, np.inf, 0.0),
+            )
+            utilization[:, self.is_user] = 0.0
+            latency = np.where(utilization <= 1, self.base_latency, self.base_latency * utilization**2)
+            latency[:, self.is_user] = 0.0
+        overflow = np.maximum(0.0, incoming - capacity_rows)
+        overflow[:, self.is_user] = 0.0
+
+        rounded_latency = _round3(latency)
+        total_latency = np.zeros(rows)
+        for nodes in self.level_timed:
+            if len(nodes):
+                total_latency += np.fmax(np.fmax.reduce(rounded_latency[:, nodes], axis=1), 0.0)
+
+        throughput = effective[:, self.is_sink].sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            error_rate = np.where(root > 0, (root - throughput) / np.where(root > 0, root, 1.0), 0.0)
+
+        if (~self.is_user).any():
+            ranked = np.where(self.is_user, -1.0, utilization)
+            bottleneck = ranked.argmax(axis=1)
+        else:
+            bottleneck = np.full(rows, -1, dtype=np.int64)
+
+        return BatchResult(
+            node_ids=self.node_ids,
+            root_rps=root,
+            incoming_rps=incoming,
+            effective_rps=effective,
+            utilization=utilization,
+            overflow=overflow,
+            latency=latency,
+            throughput=throughput,
+            total_latency=total_latency,
+            error_rate=error_rate,
+            bottleneck=bottleneck,
+        )
+
+
+def _matrix(values: np.ndarray) -> List[List[Optional[float]]]:
+    finite = np.isfinite(values)
+    return [
+        [round(value, 3) if ok else None for value, ok in zip(row, mask)]
+        for row, mask in zip(values.tolist(), finite.tolist())
+    ]
+
+
+def simulate_sweep(compiled: CompiledGraph, root_rps: Sequence[float]) -> Dict[str, object]:
+    model = BatchModel(compiled)
+    result = model.evaluate(root_rps)
+    return {
+        "node_ids": model.node_ids,
+        "load_points": [result.performance(row, model.component_types) for row in range(len(result.root_rps))],
+        "utilization": _matrix(result.utilization),
+        "latency": _matrix(result.latency),
+    }
@@ -0,0 +1,357 @@
+from __future__ import annotations
+
+import heapq
+import math
+import random
+from array import array
+from bisect import bisect_right
+from collections import deque
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from ..graph.compiled import CompiledGraph
+
+SERVICE_DISTRIBUTIONS = {"exponential", "deterministic", "uniform"}
+ARRIVAL_PROCESSES = {"poisson", "deterministic"}
+# One run is bounded in CPU and, since every event records at most one
+# latency sample, in memory too.
+MAX_EVENTS = 5_000_000
+MAX_DURATION_S = 3600.0
+
+_EXTERNAL_ARRIVAL = -1
+
+
+def _percentile(ordered: Sequence[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    rank = max(0, math.ceil(q / 100.0 * len(ordered)) - 1)
+    return float(ordered[rank])
+
+
+def _servers(config: Dict[str, object], capacity: float, base_latency: float, default: object) -> int:
+    servers = config.get("servers", default)
+    if servers is not None:
+        return max(1, int(servers))
+    return max(1, math.ceil(capacity * base_latency / 1000.0))
+
+
+def check_environment(compiled: CompiledGraph, environment_config: Optional[Dict[str, object]] = None) -> Optional[str]:
+    # The first problem with the settings simulate_discrete_event reads, so
+    # callers can reject bad input before running anything.
+    env = environment_config or {}
+    configs = [node.get("config", {}) or {} for node in compiled.nodes]
+    try:
+        duration_s = float(env.get("duration_s", 10))
+        if "warmup_s" in env:
+            float(env["warmup_s"])
+        if env.get("timeout_ms"):
+            float(env["timeout_ms"])
+        max_events = int(env.get("max_events", MAX_EVENTS))
+        for servers in [env.get("servers")] + [config.get("servers") for config in configs]:
+            if servers is not None:
+                int(servers)
+    except (AttributeError, TypeError, ValueError, OverflowError):
+        return "duration_s, warmup_s, timeout_ms, max_events and servers must be numeric."
+    if not 0 < duration_s <= MAX_DURATION_S:
+        return f"duration_s must be positive and at most {MAX_DURATION_S:g} seconds."
+    if not 0 < max_events <= MAX_EVENTS:
+        return f"Discrete-event runs are limited to {MAX_EVENTS} events."
+    seed = env.get("seed", 0)
+    if isinstance(seed, bool) or not isinstance(seed, int):
+        return "seed must be an integer."
+
+    arrival_process = str(env.get("arrival_process", "poisson")).lower()
+    if arrival_process not in ARRIVAL_PROCESSES:
+        return f"Unknown arrival_process: {arrival_process}. Use one of: {', '.join(sorted(ARRIVAL_PROCESSES))}."
+    default_distribution = env.get("service_distribution", "exponential")
+    for name in [default_distribution] + [config.get("service_distribution") for config in configs]:
+        if name is not None and str(name).lower() not in SERVICE_DISTRIBUTIONS:
+            options = ", ".join(sorted(SERVICE_DISTRIBUTIONS))
+            return f"Unknown service_distribution: {str(name).lower()}. Use one of: {options}."
+    return None
+
+
+def simulate_discrete_event(
+    compiled: CompiledGraph,
+    root_rps: float,
+    environment_config: Optional[Dict[str, object]] = None,
+    order: Optional[List[int]] = None,
+) -> Tuple[Dict[str, object], List[Dict[str, object]]]:
+    env = environment_config or {}
+    order = compiled.order if order is None else order
+    duration = float(env.get("duration_s", 10)) * 1000.0
+    warmup = float(env["warmup_s"]) * 1000.0 if "warmup_s" in env else duration * 0.1
+    timeout = float(env["timeout_ms"]) if env.get("timeout_ms") else math.inf
+    max_events = min(int(env.get("max_events", MAX_EVENTS)), MAX_EVENTS)
+    arrival_process = str(env.get("arrival_process", "poisson")).lower()
+    default_distribution = str(env.get("service_distribution", "exponential")).lower()
+    if arrival_process not in ARRIVAL_PROCESSES:
+        raise ValueError(f"Unknown arrival_process: {arrival_process}")
+
+    count = compiled.node_count
+    nodes = compiled.nodes
+    capacities = compiled.capacity
+    base_latencies = compiled.base_latency
+    is_user = compiled.is_user
+
+    # 0 = pass-through, 1 = rejects everything, 2 = queued service.
+    kind = [0] * count
+    servers = [0] * count
+    distribution = [0] * count
+    for node in range(count):
+        config = nodes[node].get("config", {}) or {}
+        if is_user[node] or base_latencies[node] <= 0:
+            continue
+        if capacities[node] <= 0:
+            kind[node] = 1
+            continue
+        kind[node] = 2
+        servers[node] = _servers(config, capacities[node], base_latencies[node], env.get("servers"))
+        name = str(config.get("service_distribution", default_distribution)).lower()
+        if name not in SERVICE_DISTRIBUTIONS:
+            raise ValueError(f"Unknown service_distribution: {name}")
+        distribution[node] = ("exponential", "deterministic", "uniform").index(name)
+
+    offsets = compiled.adj_offsets
+    targets = compiled.adj_targets
+    fractions = compiled.edge_fractions
+    routes: List[Optional[List[int]]] = [None] * count
+    cumulative: List[Optional[List[float]]] = [None] * count
+    for node in range(count):
+        start, end = offsets[node], offsets[node + 1]
+        routes[node] = targets[start:end]
+        running = 0.0
+        weights = []
+        for slot in range(start, end):
+            running += fractions[slot]
+            weights.append(running)
+        cumulative[node] = weights
+
+    rng = random.Random(int(env.get("seed", 0)))
+    random_value = rng.random
+    expovariate = rng.expovariate
+    heappush = heapq.heappush
+    heappop = heapq.heappop
+
+    queues = [deque() for _ in range(count)]
+    busy = [0] * count
+    arrivals = [0] * count
+    served = [0] * count
+    timed_out = [0] * count
+    rejected = [0] * count
+    busy_time = [0.0] * count
+    queue_area = [0.0] * count
+    queue_last = [0.0] * count
+    queue_peak = [0] * count
+    sojourns = [array("d") for _ in range(count)]
+
+    request_start: List[float] = []
+    request_node: List[int] = []
+    request_enqueued: List[float] = []
+    free_slots: List[int] = []
+    end_to_end = array("d")
+
+    generated = 0
+    window_arrivals = 0
+    window_completions = 0
+    window_drops = 0
+    completed = 0
+    dropped_timeout = 0
+    dropped_rejected = 0
+    events = 0
+
+    entry = compiled.entry_node(order) if order else -1
+    interarrival = 1000.0 / root_rps if root_rps > 0 else math.inf
+    events_heap: List[Tuple[float, int]] = []
+    if entry >= 0 and interarrival != math.inf:
+        first = expovariate(1.0 / interarrival) if arrival_process == "poisson" else interarrival
+        heappush(events_heap, (first, _EXTERNAL_ARRIVAL))
+
+    def service_time(node: int) -> float:
+        mean = base_latencies[node]
+        shape = distribution[node]
+        if shape == 0:
+            return expovariate(1.0 / mean)
+        if shape == 1:
+            return mean
+        return mean * (0.5 + random_value())
+
+    def advance(slot: int, node: int, now: float) -> None:
+        # Walks pass-through nodes until the request queues, starts service,
+        # is dropped, or leaves the graph at a sink.
+        nonlocal dropped_rejected, window_drops
+        while True:
+            arrivals[node] += 1
+            node_kind = kind[node]
+            if node_kind == 2:
+                request_node[slot] = node
+                request_enqueued[slot] = now
+                if busy[node] < servers[node]:
+                    busy[node] += 1
+                    service = service_time(node)
+                    busy_time[node] += service
+                    heappush(events_heap, (now + service, slot))
+                else:
+                    queue = queues[node]
+                    queue_area[node] += len(queue) * (now - queue_last[node])
+                    queue_last[node] = now
+                    queue.append(slot)
+                    if len(queue) > queue_peak[node]:
+                        queue_peak[node] = len(queue)
+                return
+            if node_kind == 1:
+                rejected[node] += 1
+                dropped_rejected += 1
+                if now >= warmup:
+                    window_drops += 1
+                free_slots.append(slot)
+                return
+            served[node] += 1
+            node = next_hop(node)
+            if node < 0:
+                finish(slot, now)
+                return
+
+    def finish(slot: int, now: float) -> None:
+        nonlocal completed, dropped_timeout, window_completions, window_drops
+        latency = now - request_start[slot]
+        if latency > timeout:
+            dropped_timeout += 1
+            if now >= warmup:
+                window_drops += 1
+        else:
+            completed += 1
+            if now >= warmup:
+                window_completions += 1
+                end_to_end.append(latency)
+        free_slots.append(slot)
+
+    def next_hop(node: int) -> int:
+        children = routes[node]
+        if not children:
+            return -1
+        if len(children) == 1:
+            return children[0]
+        weights = cumulative[node]
+        position = bisect_right(weights, random_value() * weights[-1])
+        return children[min(position, len(children) - 1)]
+
+    while events_heap and events < max_events:
+        now, slot = heappop(events_heap)
+        if now > duration:
+            break
+        events += 1
+
+        if slot == _EXTERNAL_ARRIVAL:
+            generated += 1
+            if now >= warmup:
+                window_arrivals += 1
+            if free_slots:
+                slot = free_slots.pop()
+                request_start[slot] = now
+            else:
+                slot = len(request_start)
+                request_start.append(now)
+                request_node.append(entry)
+                request_enqueued.append(now)
+            gap = expovariate(1.0 / interarrival) if arrival_process == "poisson" else interarrival
+            heappush(events_heap, (now + gap, _EXTERNAL_ARRIVAL))
+            advance(slot, entry, now)
+            continue
+
+        node = request_node[slot]
+        busy[node] -= 1
+        served[node] += 1
+        sojourns[node].append(now - request_enqueued[slot])
+
+        queue = queues[node]
+        while queue:
+            queue_area[node] += len(queue) * (now - queue_last[node])
+            queue_last[node] = now
+            waiting = queue.popleft()
+            if now - request_start[waiting] > timeout:
+                timed_out[node] += 1
+                dropped_timeout += 1
+                if now >= warmup:
+                    window_drops += 1
+                free_slots.append(waiting)
+                continue
+            busy[node] += 1
+            service = service_time(node)
+            busy_time[node] += service
+            heappush(events_heap, (now + service, waiting))
+            break
+
+        following = next_hop(node)
+        if following < 0:
+            finish(slot, now)
+        else:
+            advance(slot, following, now)
+
+    elapsed = min(duration, now) if events else 0.0
+    window = max(elapsed - warmup, 0.0)
+    incoming_rps = window_arrivals * 1000.0 / window if window > 0 else 0.0
+    throughput = window_completions * 1000.0 / window if window > 0 else 0.0
+    resolved = window_completions + window_drops
+    error_rate = window_drops / resolved if resolved else 0.0
+
+    ordered_latency = sorted(end_to_end)
+    node_metrics: List[Dict[str, object]] = []
+    bottleneck_id: Optional[str] = None
+    bottleneck_type = ""
+    peak_utilization = -1.0
+    for node in order:
+        node_id = compiled.ids[node]
+        node_type = compiled.raw_types[node]
+        queue_area[node] += len(queues[node]) * (elapsed - queue_last[node])
+        utilization = busy_time[node] / (servers[node] * elapsed) if kind[node] == 2 and elapsed > 0 else 0.0
+        utilization = min(utilization, 1.0)
+        node_sojourn = sorted(sojourns[node])
+        mean_latency = sum(node_sojourn) / len(node_sojourn) if node_sojourn else 0.0
+        overloaded = utilization >= 0.99 or timed_out[node] > 0 or rejected[node] > 0
+        if not is_user[node] and utilization > peak_utilization:
+            peak_utilization = utilization
+            bottleneck_id = node_id
+            bottleneck_type = node_type
+        node_metrics.append(
+            {
+                "component_id": node_id,
+                "component_type": node_type,
+                "incoming_rps": round(arrivals[node] * 1000.0 / elapsed, 3) if elapsed > 0 else 0.0,
+                "effective_rps": round(served[node] * 1000.0 / elapsed, 3) if elapsed > 0 else 0.0,
+                "utilization": round(utilization, 3),
+                "servers": servers[node],
+                "latency": round(mean_latency, 3),
+                "latency_p50": round(_percentile(node_sojourn, 50), 3),
+                "latency_p95": round(_percentile(node_sojourn, 95), 3),
+                "latency_p99": round(_percentile(node_sojourn, 99), 3),
+                "queue_length_avg": round(queue_area[node] / elapsed, 3) if elapsed > 0 else 0.0,
+                "queue_length_max": queue_peak[node],
+                "queue_length": len(queues[node]),
+                "timed_out": timed_out[node],
+                "rejected": rejected[node],
+                "status": "overloaded" if overloaded else "healthy",
+            }
+        )
+
+    mean_total = sum(ordered_latency) / len(ordered_latency) if ordered_latency else 0.0
+    performance = {
+        "incoming_rps": int(round(incoming_rps)),
+        "throughput": int(round(throughput)),
+        "total_latency": round(mean_total, 3),
+        "total_error_rate": round(error_rate, 3),
+        "error_rate": round(error_rate, 3),
+        "latency_p50": round(_percentile(ordered_latency, 50), 3),
+        "latency_p95": round(_percentile(ordered_latency, 95), 3),
+        "latency_p99": round(_percentile(ordered_latency, 99), 3),
+        "requests_generated": generated,
+        "requests_completed": completed,
+        "requests_timed_out": dropped_timeout,
+        "requests_rejected": dropped_rejected,
+        "events_processed": events,
+        "simulated_ms": round(elapsed, 3),
+        "bottleneck_node_id": bottleneck_id,
+        "bottleneck_component": bottleneck_type,
+        "bottleneck_components": [bottleneck_type] if bottleneck_id else [],
+        "bottleneck_component_ids": [bottleneck_id] if bottleneck_id else [],
+    }
+    return performance, node_metrics
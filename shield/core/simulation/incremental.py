@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+import heapq
+from typing import Dict, List, Optional, Set, Tuple
+
+from ..graph.compiled import CompiledGraph, compile_graph
+
+Graph = Dict[str, object]
+
+FLOW_KEYS = {"capacity", "weight", "algorithm"}
+
+
+class IncrementalSimulation:
+    # Keeps the steady-state results of ``simulate`` per node. A config change
+    # marks the node dirty; dirty nodes are re-evaluated in topological order
+    # and only children whose inflow actually changed are visited. Level
+    # latencies and the bottleneck are kept in lazy max-heaps so an update
+    # never rescans untouched nodes.
+
+    def __init__(
+        self,
+        graph: Graph,
+        traffic_profile: Optional[Dict[str, float]] = None,
+        compiled: Optional[CompiledGraph] = None,
+    ) -> None:
+        self.graph = graph
+        self.compiled = compiled or compile_graph(graph)
+        compiled = self.compiled
+        self.order = compiled.order
+        count = compiled.node_count
+        self.position = [0] * count
+        for position, node in enumerate(self.order):
+            self.position[node] = position
+        self.entry = compiled.entry_node(self.order) if self.order else -1
+        self.is_sink = [
+            compiled.outdegree[node] == 0 and not compiled.is_user[node] for node in range(count)
+        ]
+        self.root_rps = self._root_rps(traffic_profile)
+
+        self.incoming = [0.0] * count
+        self.effective = [0.0] * count
+        self.utilization = [0.0] * count
+        self.overflow = [0.0] * count
+        self.latency = [0.0] * count
+        self.version = [0] * count
+        self.throughput = 0.0
+        self.overloaded: Set[int] = set()
+
+        self._level_heaps: Dict[int, List[Tuple[float, int, int]]] = {}
+        self._level_max: Dict[int, float] = {}
+        self._level_sizes: Dict[int, int] = {}
+        for node in self.order:
+            if not compiled.is_user[node]:
+                level = compiled.levels[node]
+                self._level_sizes[level] = self._level_sizes.get(level, 0) + 1
+        self._total_latency = 0.0
+        self._saturated_levels = 0
+        self._bottleneck_heap: List[Tuple[float, int, int, int]] = []
+        self._dirty: List[int] = []
+        self._queued: Set[int] = set()
+
+        for node in self.order:
+            self._mark(node)
+        self.recompute()
+
+    def _root_rps(self, traffic_profile: Optional[Dict[str, float]]) -> float:
+        if traffic_profile is None:
+            traffic_profile = {"number_of_users": 0.0, "requests_per_user": 0.0}
+            for node in self.order:
+                if self.compiled.nodes[node].get("type") == "User":
+                    config = self.compiled.nodes[node].get("config", {}) or {}
+                    traffic_profile = config
+                    break
+        return float(traffic_profile.get("number_of_users", 0)) * float(traffic_profile.get("requests_per_user", 0))
+
+    def _mark(self, node: int) -> None:
+        if node not in self._queued:
+            self._queued.add(node)
+            heapq.heappush(self._dirty, self.position[node])
+
+    def set_traffic_profile(self, traffic_profile: Optional[Dict[str, float]]) -> None:
+        root_rps = self._root_rps(traffic_profile)
+        if root_rps != self.root_rps and self.entry >= 0:
+            self.root_rps = root_rps
+            self._mark(self.entry)
+
+    def update_node(self, node_id: str, config: Dict[str, object]) -> None:
+        compiled = self.compiled
+        node = compiled.index.get(node_id)
+        if node is None:
+            raise KeyError(node_id)
+        node_payload = compiled.nodes[node]
+        merged = dict(node_payload.get("config", {}) or {})
+        merged.update(config)
+        # Every numeric field is converted before anything is applied, so bad
+        # input raises with the session unchanged.
+        capacity = float(merged.get("capacity", 0)) if "capacity" in config else None
+        base_latency = float(merged.get("base_latency", 0)) if "base_latency" in config else None
+        if "weight" in config:
+            float(merged.get("weight", 1))
+        node_payload["config"] = merged
+
+        if capacity is not None:
+            compiled.capacity[node] = capacity
+        if base_latency is not None:
+            compiled.base_latency[node] = base_latency
+        if "algorithm" in config and compiled.load_balancers[node]:
+            compiled.algorithms[node] = str(merged.get("algorithm", "round_robin")).lower()
+            self._resplit(node)
+        if FLOW_KEYS & set(config):
+            for parent in compiled.parents(node):
+                if compiled.algorithms[parent] != "round_robin":
+                    self._resplit(parent)
+        self._mark(node)
+
+    def _resplit(self, node: int) -> None:
+        compiled = self.compiled
+        start, end = compiled.adj_offsets[node], compiled.adj_offsets[node + 1]
+        fractions = compiled.split_fractions(node)
+        if compiled.edge_fractions[start:end] != fractions:
+            compiled.edge_fractions[start:end] = fractions
+            for child in compiled.children(node):
+                self._mark(child)
+
+    def recompute(self) -> List[int]:
+        compiled = self.compiled
+        order = self.order
+        parent_offsets = compiled.parent_offsets
+        parent_sources = compiled.parent_sources
+        parent_slots = compiled.parent_slots
+        fractions = compiled.edge_fractions
+        capacities = compiled.capacity
+        base_latencies = compiled.base_latency
+        is_user = compiled.is_user
+        levels = compiled.levels
+        changed: List[int] = []
+
+        while self._dirty:
+            node = order[heapq.heappop(self._dirty)]
+            self._queued.discard(node)
+
+            incoming = self.root_rps if node == self.entry else 0.0
+            for index in range(parent_offsets[node], parent_offsets[node + 1]):
+                incoming += self.effective[parent_sources[index]] * fractions[parent_slots[index]]
+
+            capacity = capacities[node]
+            if is_user[node]:
+                effective, utilization, overflow, latency = incoming, 0.0, 0.0, 0.0
+            else:
+                utilization = incoming / capacity if capacity > 0 else (float("inf") if incoming > 0 else 0.0)
+                effective = min(incoming, capacity) if capacity > 0 else 0.0
+                overflow = max(0.0, incoming - capacity)
+                base_latency = base_latencies[node]
+                latency = base_latency if utilization <= 1 else base_latency * (utilization**2)
+            latency = round(latency, 3)
+
+            previous_effective = self.effective[node]
+            if (
+                incoming == self.incoming[node]
+                and effective == previous_effective
+                and latency == self.latency[node]
+                and utilization == self.utilization[node]
+                and self.version[node]
+            ):
+                continue
+
+            self.incoming[node] = incoming
+            self.effective[node] = effective
+            self.utilization[node] = utilization
+            self.overflow[node] = overflow
+            self.latency[node] = latency
+            self.version[node] += 1
+            changed.append(node)
+
+            if self.is_sink[node]:
+                self.throughput += effective - previous_effective
+            if utilization > 1:
+                self.overloaded.add(node)
+            else:
+                self.overloaded.discard(node)
+
+            if not is_user[node]:
+                version = self.version[node]
+                level = levels[node]
+                ranked_latency = latency if latency == latency else 0.0
+                heapq.heappush(self._level_heaps.setdefault(level, []), (-ranked_latency, node, version))
+                self._refresh_level(level)
+                heapq.heappush(self._bottleneck_heap, (-utilization, self.position[node], node, version))
+
+            if effective != previous_effective or self.version[node] == 1:
+                for child in compiled.children(node):
+                    self._mark(child)
+
+        return changed
+
+    def _refresh_level(self, level: int) -> None:
+        heap = self._level_heaps[level]
+        while heap and heap[0][2] != self.version[heap[0][1]]:
+            heapq.heappop(heap)
+        if len(heap) > 64 and len(heap) > 4 * self._level_sizes[level]:
+            heap[:] = [entry for entry in heap if entry[2] == self.version[entry[1]]]
+            heapq.heapify(heap)
+        current = max(-heap[0][0], 0.0) if heap else 0.0
+        previous = self._level_max.get(level, 0.0)
+        if previous == float("inf"):
+            self._saturated_levels -= 1
+        else:
+            self._total_latency -= previous
+        if current == float("inf"):
+            self._saturated_levels += 1
+        else:
+            self._total_latency += current
+        self._level_max[level] = current
+
+    def bottlenecks(self) -> List[int]:
+        heap = self._bottleneck_heap
+        version = self.version
+        while heap and heap[0][3] != version[heap[0][2]]:
+            heapq.heappop(heap)
+        if len(heap) > 64 and len(heap) > 4 * self.compiled.node_count:
+            heap[:] = [entry for entry in heap if entry[3] == version[entry[2]]]
+            heapq.heapify(heap)
+        if not heap:
+            return []
+        peak = heap[0][0]
+        ties = []
+        while heap and heap[0][0] == peak:
+            entry = heapq.heappop(heap)
+            if entry[3] == version[entry[2]]:
+                ties.append(entry)
+        for entry in ties:
+            heapq.heappush(heap, entry)
+        return [entry[2] for entry in ties]
+
+    def metric(self, node: int) -> Dict[str, object]:
+        utilization = self.utilization[node]
+        return {
+            "component_id": self.compiled.ids[node],
+            "component_type": self.compiled.raw_types[node],
+            "incoming_rps": round(self.incoming[node], 3),
+            "effective_rps": round(self.effective[node], 3),
+            "utilization": round(utilization, 3) if utilization != float("inf") else None,
+            "overflow": round(self.overflow[node], 3),
+            "latency": self.latency[node],
+            "latency_contribution": self.latency[node],
+            "status": "overloaded" if utilization > 1 else "healthy",
+        }
+
+    def node_metrics(self, nodes: Optional[List[int]] = None) -> List[Dict[str, object]]:
+        if nodes is None:
+            nodes = self.order
+        else:
+            nodes = sorted(nodes, key=self.position.__getitem__)
+        return [self.metric(node) for node in nodes]
+
+    def performance(self) -> Dict[str, object]:
+        root_rps = self.root_rps
+        throughput = self.throughput
+        total_error_rate = (root_rps - throughput) / root_rps if root_rps > 0 else 0.0
+        bottlenecks = self.bottlenecks()
+        ids = [self.compiled.ids[node] for node in bottlenecks]
+        components = [self.compiled.raw_types[node] for node in bottlenecks]
+        return {
+            "incoming_rps": int(root_rps),
+            "throughput": int(throughput),
+            "total_latency": float("inf") if self._saturated_levels else round(self._total_latency, 3),
+            "total_error_rate": round(total_error_rate, 3),
+            "error_rate": round(total_error_rate, 3),
+            "bottleneck_node_id": ids[0] if ids else None,
+            "bottleneck_component": components[0] if components else "",
+            "bottleneck_components": components,
+            "bottleneck_component_ids": ids,
+        }
@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import math
+from concurrent.futures import Executor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..graph.compiled import CompiledGraph
+
+LATENCY_DISTRIBUTIONS = {"deterministic", "exponential", "lognormal", "gamma", "normal"}
+DEFAULT_DISTRIBUTION = {"distribution": "lognormal", "sigma": 0.5}
+
+HISTOGRAM_BINS = 4096
+DISPLAY_BINS = 50
+MAX_DISPLAY_BINS = 1000
+HISTOGRAM_FLOOR = 1e-3
+CHUNK_CELLS = 4_000_000
+MAX_CHUNK_TRIALS = 50_000
+INLINE_TRIALS = 20_000
+
+
+def _parse_spec(spec: object) -> Tuple[str, float]:
+    if isinstance(spec, str):
+        spec = {"distribution": spec}
+    name = str(spec.get("distribution", "lognormal")).lower()
+    if name not in LATENCY_DISTRIBUTIONS:
+        raise ValueError(f"Unknown latency distribution: {name}")
+    if name == "lognormal":
+        parameter = float(spec.get("sigma", 0.5))
+    elif name == "gamma":
+        parameter = float(spec.get("shape", 2.0))
+    elif name == "normal":
+        parameter = float(spec.get("cv", 0.2))
+    else:
+        parameter = 0.0
+    if not math.isfinite(parameter) or parameter < 0 or (name == "gamma" and parameter == 0):
+        raise ValueError(f"Invalid parameter for the {name} latency distribution: {parameter}")
+    return name, parameter
+
+
+def _distribution_for(
+    node_type: str, raw_type: str, config: Dict[str, object], overrides: Dict[str, object]
+) -> Tuple[str, float]:
+    spec = config.get("latency_distribution") or overrides.get(node_type) or overrides.get(raw_type)
+    return _parse_spec(spec or overrides.get("default") or DEFAULT_DISTRIBUTION)
+
+
+def check_environment(compiled: CompiledGraph, environment_config: Optional[Dict[str, object]] = None) -> Optional[str]:
+    # The first problem with the settings latency_distribution reads, so
+    # callers can reject bad input before running anything.
+    env = environment_config or {}
+    try:
+        seed = int(env.get("seed", 0))
+        bins = int(env.get("histogram_bins", DISPLAY_BINS))
+    except (TypeError, ValueError):
+        return "seed and histogram_bins must be integers."
+    if seed < 0:
+        return "seed must be a non-negative integer."
+    if not 1 <= bins <= MAX_DISPLAY_BINS:
+        return f"histogram_bins must be between 1 and {MAX_DISPLAY_BINS}."
+
+    overrides = env.get("latency_distributions") or {}
+    if not isinstance(overrides, dict):
+        return "latency_distributions must be an object mapping node types to distributions."
+    specs = list(overrides.values())
+    for node in compiled.nodes:
+        config = node.get("config", {}) or {}
+        if isinstance(config, dict) and config.get("latency_distribution"):
+            specs.append(config["latency_distribution"])
+    for spec in specs:
+        try:
+            _parse_spec(spec)
+        except (AttributeError, TypeError, ValueError):
+            options = ", ".join(sorted(LATENCY_DISTRIBUTIONS))
+            return f"Invalid latency distribution: {spec!r}. Use one of: {options}."
+    return None
+
+
+def _sample(
+    rng: np.random.Generator, name: str, parameter: float, means: np.ndarray, rows: int
+) -> np.ndarray:
+    shape = (rows, len(means))
+    if name == "deterministic":
+        return np.broadcast_to(means, shape)
+    fixed = ~np.isfinite(means) | (means <= 0)
+    positive = np.where(fixed, 1.0, means)
+    if name == "exponential":
+        values = rng.exponential(positive, size=shape)
+    elif name == "lognormal":
+        values = rng.lognormal(np.log(positive) - parameter**2 / 2.0, parameter, size=shape)
+    elif name == "gamma":
+        values = rng.gamma(parameter, positive / parameter, size=shape)
+    else:
+        values = np.maximum(rng.normal(positive, parameter * positive, size=shape), 0.0)
+    # Zero-latency and saturated (infinite) nodes stay deterministic.
+    if fixed.any():
+        values[:, fixed] = np.where(np.isfinite(means[fixed]), 0.0, np.inf)
+    return values
+
+
+def _run_chunk(task: Tuple) -> Tuple[np.ndarray, float, float, float, int, int]:
+    seed, rows, means, groups, levels, edges = task
+    rng = np.random.default_rng(seed)
+    samples = np.empty((rows, len(means)))
+    for name, parameter, columns in groups:
+        samples[:, columns] = _sample(rng, name, parameter, means[columns], rows)
+
+    totals = np.zeros(rows)
+    for columns in levels:
+        totals += np.fmax(samples[:, columns].max(axis=1), 0.0)
+
+    finite = totals[np.isfinite(totals)]
+    counts = np.histogram(np.clip(totals, edges[0], edges[-1]), bins=edges)[0]
+    return (
+        counts,
+        float(finite.sum()),
+        float(finite.min()) if len(finite) else math.inf,
+        float(finite.max()) if len(finite) else 0.0,
+        int((totals == np.inf).sum()),
+        len(finite),
+    )
+
+
+def _percentile(edges: np.ndarray, cumulative: np.ndarray, q: float) -> Optional[float]:
+    total = cumulative[-1]
+    if total == 0:
+        return None
+    target = q / 100.0 * total
+    position = int(np.searchsorted(cumulative, target, side="left"))
+    position = min(position, len(cumulative) - 1)
+    below = cumulative[position - 1] if position else 0
+    inside = cumulative[position] - below
+    fraction = (target - below) / inside if inside else 0.0
+    low, high = edges[position], edges[position + 1]
+    return float(low * (high / low) ** fraction)
+
+
+def latency_distribution(
+    compiled: CompiledGraph,
+    order: Sequence[int],
+    node_latencies: Sequence[float],
+    environment_config: Optional[Dict[str, object]] = None,
+    executor: Optional[Executor] = None,
+) -> Dict[str, object]:
+    env = environment_config or {}
+    trials = max(1, int(env.get("trials", 10_000)))
+    seed = int(env.get("seed", 0))
+    overrides = env.get("latency_distributions") or {}
+
+    timed = [position for position, node in enumerate(order) if not compiled.is_user[node]]
+    column_of = {position: column for column, position in enumerate(timed)}
+    means = np.array([float(node_latencies[position]) for position in timed], dtype=np.float64)
+    means[np.isnan(means)] = 0.0
+
+    grouped: Dict[Tuple[str, float], List[int]] = {}
+    for position in timed:
+        node = order[position]
+        config = compiled.nodes[node].get("config", {}) or {}
+        key = _distribution_for(compiled.types[node], compiled.raw_types[node], config, overrides)
+        grouped.setdefault(key, []).append(column_of[position])
+    groups = [(name, parameter, np.array(columns)) for (name, parameter), columns in grouped.items()]
+
+    level_columns: Dict[int, List[int]] = {}
+    for position in timed:
+        level_columns.setdefault(compiled.levels[order[position]], []).append(column_of[position])
+    levels = [np.array(columns) for _, columns in sorted(level_columns.items())]
+
+    finite_means = means[np.isfinite(means)]
+    ceiling = max(float(finite_means.sum()) if len(finite_means) else 0.0, 1.0) * 1000.0
+    edges = np.geomspace(HISTOGRAM_FLOOR, ceiling, HISTOGRAM_BINS + 1)
+
+    # Chunk boundaries and seeds depend only on the inputs, so the merged
+    # result is identical for any worker count.
+    chunk_rows = max(1, min(MAX_CHUNK_TRIALS, CHUNK_CELLS // max(len(means), 1)))
+    chunk_sizes = [chunk_rows] * (trials // chunk_rows)
+    if trials % chunk_rows:
+        chunk_sizes.append(trials % chunk_rows)
+    seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+    tasks = [(child, rows, means, groups, levels, edges) for child, rows in zip(seeds, chunk_sizes)]
+
+    if executor is None or trials <= INLINE_TRIALS or len(tasks) == 1:
+        results = [_run_chunk(task) for task in tasks]
+    else:
+        results = list(executor.map(_run_chunk, tasks))
+
+    counts = np.zeros(HISTOGRAM_BINS, dtype=np.int64)
+    total = 0.0
+    low = math.inf
+    high = 0.0
+    saturated = 0
+    finite_trials = 0
+    for chunk_counts, chunk_sum, chunk_min, chunk_max, chunk_saturated, chunk_finite in results:
+        counts += chunk_counts
+        total += chunk_sum
+        low = min(low, chunk_min)
+        high = max(high, chunk_max)
+        saturated += chunk_saturated
+        finite_trials += chunk_finite
+
+    cumulative = np.cumsum(counts)
+    summary = {
+        "trials": trials,
+        "saturated_trials": saturated,
+        "mean": round(total / finite_trials, 3) if finite_trials else None,
+        "min": round(low, 3) if finite_trials else None,
+        "max": round(high, 3) if finite_trials else None,
+    }
+    for q in (50, 90, 95, 99, 99.9):
+        value = _percentile(edges, cumulative, q)
+        label = f"p{q:g}".replace(".", "")
+        summary[label] = round(value, 3) if value is not None else None
+
+    summary["histogram"] = _display_histogram(edges, counts, int(env.get("histogram_bins", DISPLAY_BINS)))
+    return summary
+
+
+def _display_histogram(edges: np.ndarray, counts: np.ndarray, bins: int) -> Dict[str, List[float]]:
+    populated = np.flatnonzero(counts)
+    if not len(populated):
+        return {"edges": [], "counts": []}
+    first, last = int(populated[0]), int(populated[-1]) + 1
+    step = max(1, math.ceil((last - first) / max(bins, 1)))
+    starts = np.arange(first, last, step)
+    merged = np.add.reduceat(counts[first:last], starts - first)
+    bounds = np.append(edges[starts], edges[last])
+    return {
+        "edges": [round(float(edge), 4) for edge in bounds],
+        "counts": merged.tolist(),
+    }
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import math
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from ..graph.compiled import CompiledGraph
+from .batch import BatchModel, BatchResult
+
+SEARCH_WIDTH = 32
+MAX_RAISE_ROUNDS = 64
+SLO_TOLERANCE = 1e-9
+
+
+class CapacityOptimizer:
+    # Finds small per-node capacities that keep ``simulate`` within an SLO at a
+    # target load. Overloaded bottlenecks are raised first to get a feasible
+    # starting point, then each node is shrunk in topological order with a
+    # k-ary search whose candidates are evaluated as one batch.
+
+    def __init__(
+        self,
+        compiled: CompiledGraph,
+        target_rps: float,
+        max_latency: Optional[float] = None,
+        max_error_rate: float = 0.0,
+        unit: str = "capacity",
+        capacity_step: float = 1.0,
+        order: Optional[List[int]] = None,
+    ) -> None:
+        if unit not in {"capacity", "replicas"}:
+            raise ValueError(f"Unknown unit: {unit}")
+        if not capacity_step > 0:
+            raise ValueError("capacity_step must be positive.")
+        self.model = BatchModel(compiled, order)
+        self.target_rps = float(target_rps)
+        self.max_latency = math.inf if max_latency is None else float(max_latency)
+        self.max_error_rate = float(max_error_rate)
+        self.unit = unit
+        self.current = self.model.capacity.copy()
+        if unit == "replicas":
+            # A replica is one copy of the node as currently configured.
+            self.step = np.where(self.current > 0, self.current, capacity_step)
+        else:
+            self.step = np.full(self.model.size, float(capacity_step))
+        self.tunable = np.flatnonzero(~self.model.is_user)
+        self.evaluations = 0
+
+    def _evaluate(self, capacity: np.ndarray) -> BatchResult:
+        capacity = np.atleast_2d(capacity)
+        self.evaluations += capacity.shape[0]
+        return self.model.evaluate(np.full(capacity.shape[0], self.target_rps), capacity)
+
+    def _meets_slo(self, result: BatchResult) -> np.ndarray:
+        return (result.total_latency <= self.max_latency + SLO_TOLERANCE) & (
+            result.error_rate <= self.max_error_rate + SLO_TOLERANCE
+        )
+
+    def _round_up(self, capacity: np.ndarray, nodes: object = slice(None)) -> np.ndarray:
+        step = self.step[nodes]
+        return np.ceil(capacity / step - SLO_TOLERANCE) * step
+
+    def _feasible_start(self) -> np.ndarray:
+        capacity = self._round_up(np.maximum(self.current, 0.0))
+        for _ in range(MAX_RAISE_ROUNDS):
+            result = self._evaluate(capacity)
+            utilization = result.utilization[0]
+            overloaded = np.flatnonzero((utilization > 1) & ~self.model.is_user)
+            if not len(overloaded):
+                break
+            incoming = result.incoming_rps[0]
+            raised = np.maximum(incoming[overloaded], capacity[overloaded])
+            capacity[overloaded] = self._round_up(raised, overloaded)
+            # Load balancers that split by capacity shift load onto the nodes
+            # that were just raised, so raise those a little further.
+            still_low = capacity[overloaded] < incoming[overloaded]
+            capacity[overloaded[still_low]] += self.step[overloaded[still_low]]
+        return capacity
+
+    def _shrink(self, capacity: np.ndarray, node: int) -> None:
+        step = self.step[node]
+        low, high = -1, int(round(capacity[node] / step))
+        while high - low > 1:
+            width = min(SEARCH_WIDTH, high - low - 1)
+            candidates = np.unique(np.linspace(low + 1, high - 1, width).round()).astype(int)
+            rows = np.repeat(capacity[np.newaxis, :], len(candidates), axis=0)
+            rows[:, node] = candidates * step
+            feasible = self._meets_slo(self._evaluate(rows))
+            if feasible.any():
+                first = int(np.argmax(feasible))
+                high = int(candidates[first])
+                low = int(candidates[first - 1]) if first else low
+            else:
+                low = int(candidates[-1])
+        capacity[node] = high * step
+
+    def solve(self) -> Dict[str, object]:
+        capacity = self._feasible_start()
+        result = self._evaluate(capacity)
+        feasible = bool(self._meets_slo(result)[0])
+        if feasible:
+            for node in self.tunable:
+                self._shrink(capacity, int(node))
+            result = self._evaluate(capacity)
+
+        model = self.model
+        nodes = []
+        for position in self.tunable.tolist():
+            step = self.step[position]
+            nodes.append(
+                {
+                    "component_id": model.node_ids[position],
+                    "component_type": model.component_types[position],
+                    "current_capacity": round(float(self.current[position]), 3),
+                    "capacity": round(float(capacity[position]), 3),
+                    "replicas": int(round(capacity[position] / step)) if self.unit == "replicas" else None,
+                }
+            )
+        return {
+            "feasible": feasible,
+            "capacities": nodes,
+            "performance": result.performance(0, model.component_types),
+            "evaluations": self.evaluations,
+        }
+
+
+def optimize_capacity(
+    compiled: CompiledGraph,
+    target_rps: float,
+    max_latency: Optional[float] = None,
+    max_error_rate: float = 0.0,
+    unit: str = "capacity",
+    capacity_step: float = 1.0,
+    order: Optional[List[int]] = None,
+) -> Dict[str, object]:
+    optimizer = CapacityOptimizer(compiled, target_rps, max_latency, max_error_rate, unit, capacity_step, order)
+    return optimizer.solve()
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from ..graph.compiled import CompiledGraph
+from .batch import BatchModel
+
+CHUNK_CELLS = 500_000
+
+
+def capacity_sensitivity(
+    compiled: CompiledGraph,
+    root_rps: float,
+    increase: float = 0.2,
+    order: Optional[List[int]] = None,
+    node_ids: Optional[Sequence[str]] = None,
+) -> List[Dict[str, object]]:
+    # Row 0 of every batch is the unchanged graph; row ``i`` raises the
+    # capacity of one node by ``increase``. Rows are chunked so the batch stays
+    # within CHUNK_CELLS matrix cells on large graphs.
+    model = BatchModel(compiled, order)
+    if node_ids is None:
+        candidates = np.flatnonzero(~model.is_user)
+    else:
+        position = {node_id: column for column, node_id in enumerate(model.node_ids)}
+        candidates = np.array(
+            [position[node_id] for node_id in node_ids if node_id in position and not model.is_user[position[node_id]]],
+            dtype=np.int64,
+        )
+    if not len(candidates):
+        return []
+
+    chunk = max(1, CHUNK_CELLS // max(model.size, 1) - 1)
+    baseline = model.evaluate([root_rps])
+    base_throughput = float(baseline.throughput[0])
+    base_latency = float(baseline.total_latency[0])
+    base_error_rate = float(baseline.error_rate[0])
+
+    report: List[Dict[str, object]] = []
+    for start in range(0, len(candidates), chunk):
+        columns = candidates[start : start + chunk]
+        capacity = np.repeat(model.capacity[np.newaxis, :], len(columns), axis=0)
+        capacity[np.arange(len(columns)), columns] *= 1.0 + increase
+        result = model.evaluate(np.full(len(columns), float(root_rps)), capacity)
+        for row, column in enumerate(columns.tolist()):
+            latency = float(result.total_latency[row])
+            report.append(
+                {
+                    "component_id": model.node_ids[column],
+                    "component_type": model.component_types[column],
+                    "capacity": round(float(model.capacity[column]), 3),
+                    "new_capacity": round(float(capacity[row, column]), 3),
+                    "throughput_gain": round(float(result.throughput[row]) - base_throughput, 3),
+                    "latency_change": round(latency - base_latency, 3) if np.isfinite(latency - base_latency) else None,
+                    "error_rate_change": round(float(result.error_rate[row]) - base_error_rate, 3),
+                }
+            )
+
+    report.sort(key=lambda entry: (-entry["throughput_gain"], entry["latency_change"] or 0.0))
+    return report
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import math
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from ..graph.compiled import CompiledGraph
+from .batch import BatchModel
+
+TRAFFIC_CURVES = {"constant", "ramp", "diurnal", "spike"}
+TICK_CHUNK = 1024
+
+Tick = Tuple[float, float]
+
+
+def is_timeseries_profile(traffic_profile: object) -> bool:
+    return isinstance(traffic_profile, dict) and ("series" in traffic_profile or "curve" in traffic_profile)
+
+
+def _series_rps(point: object) -> float:
+    if isinstance(point, dict):
+        if "rps" in point:
+            return float(point["rps"])
+        return float(point.get("number_of_users", 0)) * float(point.get("requests_per_user", 0))
+    return float(point)
+
+
+def traffic_ticks(traffic_profile: Dict[str, object], max_ticks: Optional[int] = None) -> Tuple[int, Iterator[Tick]]:
+    # Parameters are checked eagerly so callers can reject a bad profile before
+    # they start streaming. A series is already in memory, so every point is
+    # converted up front; curve ticks are produced lazily. A series longer
+    # than ``max_ticks`` is left unconverted for the caller to reject.
+    step = float(traffic_profile.get("step_s", 1))
+    if not step > 0:
+        raise ValueError("step_s must be positive.")
+
+    if "series" in traffic_profile:
+        series = traffic_profile.get("series")
+        if not isinstance(series, list):
+            raise ValueError("series must be a list.")
+        points: List[Tick] = []
+        if max_ticks is None or len(series) <= max_ticks:
+            for position, point in enumerate(series):
+                try:
+                    t = float(point["t"]) if isinstance(point, dict) and "t" in point else position * step
+                    rps = _series_rps(point)
+                except (AttributeError, KeyError, TypeError, ValueError) as exc:
+                    raise ValueError(f"series point {position} is not numeric.") from exc
+                points.append((t, max(rps, 0.0)))
+        return len(series), iter(points)
+
+    curve = str(traffic_profile.get("curve", "constant")).lower()
+    if curve not in TRAFFIC_CURVES:
+        raise ValueError(f"Unknown traffic curve: {curve}")
+    period = float(traffic_profile.get("period_s", 86400))
+    duration = float(traffic_profile.get("duration_s", period if curve == "diurnal" else 3600))
+    base = float(traffic_profile.get("base_rps", 0))
+    peak = float(traffic_profile.get("peak_rps", base))
+    peak_at = float(traffic_profile.get("peak_at_s", period / 2))
+    spike_at = float(traffic_profile.get("spike_at_s", duration / 2))
+    spike_duration = float(traffic_profile.get("spike_duration_s", 60))
+    if not period > 0 or duration < 0:
+        raise ValueError("duration_s and period_s must be positive.")
+    count = int(duration // step) + 1
+
+    def curve_rps(t: float) -> float:
+        if curve == "ramp":
+            return base + (peak - base) * (t / duration if duration else 1.0)
+        if curve == "diurnal":
+            return base + (peak - base) * (1.0 + math.cos(2.0 * math.pi * (t - peak_at) / period)) / 2.0
+        if curve == "spike":
+            return peak if spike_at <= t < spike_at + spike_duration else base
+        return base
+
+    def curve_ticks() -> Iterator[Tick]:
+        for position in range(count):
+            t = position * step
+            yield t, max(curve_rps(t), 0.0)
+
+    return count, curve_ticks()
+
+
+def _bottlenecks(ranked: List[float], component_types: List[str], node_ids: List[str]) -> Tuple[List[str], List[str]]:
+    peak = max(ranked)
+    positions = [position for position, value in enumerate(ranked) if value == peak]
+    return [node_ids[position] for position in positions], [component_types[position] for position in positions]
+
+
+def simulate_timeseries(
+    compiled: CompiledGraph,
+    ticks: Iterator[Tick],
+    order: Optional[List[int]] = None,
+    include_node_metrics: bool = True,
+) -> Iterator[Dict[str, object]]:
+    # Ticks are pulled from ``ticks`` in fixed-size chunks and evaluated with
+    # the batch model, so memory stays bounded however long the run is.
+    model = BatchModel(compiled, order)
+    node_ids = model.node_ids
+    component_types = model.component_types
+    is_user = model.is_user.tolist()
+    timed = not all(is_user)
+
+    while True:
+        chunk = list(islice(ticks, TICK_CHUNK))
+        if not chunk:
+            return
+        result = model.evaluate([rps for _, rps in chunk])
+        ranked_rows = np.where(model.is_user, -np.inf, result.utilization).tolist()
+        if include_node_metrics:
+            incoming_rows = result.incoming_rps.tolist()
+            effective_rows = result.effective_rps.tolist()
+            utilization_rows = result.utilization.tolist()
+            overflow_rows = result.overflow.tolist()
+            latency_rows = result.latency.tolist()
+
+        for row, (t, _) in enumerate(chunk):
+            performance = result.performance(row, component_types)
+            if timed:
+                ids, components = _bottlenecks(ranked_rows[row], component_types, node_ids)
+            else:
+                ids, components = [], []
+            performance["bottleneck_components"] = components
+            performance["bottleneck_component_ids"] = ids
+            record: Dict[str, object] = {"t": t, "performance": performance}
+            if include_node_metrics:
+                record["node_metrics"] = [
+                    _node_metric(
+                        node_ids[position],
+                        component_types[position],
+                        incoming_rows[row][position],
+                        effective_rows[row][position],
+                        utilization_rows[row][position],
+                        overflow_rows[row][position],
+                        latency_rows[row][position],
+                    )
+                    for position in range(len(node_ids))
+                ]
+            yield record
+
+
+def _node_metric(
+    node_id: str,
+    node_type: str,
+    incoming: float,
+    effective: float,
+    utilization: float,
+    overflow: float,
+    latency: float,
+) -> Dict[str, object]:
+    rounded_latency = round(latency, 3)
+    return {
+        "component_id": node_id,
+        "component_type": node_type,
+        "incoming_rps": round(incoming, 3),
+        "effective_rps": round(effective, 3),
+        "utilization": round(utilization, 3) if utilization != math.inf else None,
+        "overflow": round(overflow, 3),
+        "latency": rounded_latency,
+        "latency_contribution": rounded_latency,
+        "status": "overloaded" if utilization > 1 else "healthy",
+    }
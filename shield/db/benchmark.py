@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from sqlalchemy import event
+
+if __package__ is None or __package__ == "":
+    sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app import create_app
+from config import Config
+from db.session import engine
+
+
+class RoundTripCounter:
+    # Counts what reaches the database server: BEGIN, every statement,
+    # COMMIT or ROLLBACK, and the liveness ping when pool_pre_ping is on.
+
+    def __init__(self) -> None:
+        self.counts: Dict[str, int] = {"begin": 0, "statements": 0, "commit": 0, "rollback": 0, "ping": 0}
+        event.listen(engine, "begin", lambda conn: self._add("begin"))
+        event.listen(engine, "before_cursor_execute", lambda *args: self._add("statements"))
+        event.listen(engine, "commit", lambda conn: self._add("commit"))
+        event.listen(engine, "rollback", lambda conn: self._add("rollback"))
+        if Config.DB_POOL_PRE_PING:
+            event.listen(engine.pool, "checkout", lambda *args: self._add("ping"))
+
+    def _add(self, key: str) -> None:
+        self.counts[key] += 1
+
+    def reset(self) -> None:
+        for key in self.counts:
+            self.counts[key] = 0
+
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+
+def _graph(size: int) -> Dict[str, object]:
+    nodes = [{"id": "user", "type": "User"}] + [{"id": f"api-{i}", "type": "API Server"} for i in range(size)]
+    edges = [{"id": f"e{i}", "source": "user", "target": f"api-{i}"} for i in range(size)]
+    return {"nodes": nodes, "edges": edges}
+
+
+def run(size: int) -> List[Tuple[str, int, int, Dict[str, int]]]:
+    app = create_app()
+    client = app.test_client()
+    counter = RoundTripCounter()
+    rows: List[Tuple[str, int, int, Dict[str, int]]] = []
+
+    def call(label: str, method: str, url: str, repeat: int = 1, **kwargs):
+        counter.reset()
+        for _ in range(repeat):
+            response = client.open(url, method=method, **kwargs)
+        rows.append((label, response.status_code, counter.total(), dict(counter.counts)))
+        return response.get_json()
+
+    graph = _graph(size)
+    created = call("create", "POST", "/api/workspaces", json={"user_id": "bench", "name": "bench", "graph_json": graph})
+    workspace_id = created["id"]
+    base = f"/api/workspaces/{workspace_id}"
+    call("get", "GET", base)
+    call("rename", "PATCH", base, json={"name": "bench (renamed)"})
+    patch = [{"op": "replace", "path": "/nodes/1/type", "value": "Worker"}]
+    call("patch graph", "PATCH", base, json={"graph_patch": patch, "version": 0})
+    graph["nodes"].append({"id": "db", "type": "Database"})
+    call("save graph", "PATCH", base, json={"graph_json": graph})
+    call("20 autosaves", "PATCH", base, repeat=20, json={"graph_json": graph})
+    call("get version", "GET", f"{base}/versions/1")
+    call("diff", "GET", f"{base}/diff?from=0&to=2")
+    call("list", "GET", "/api/workspaces?user_id=bench&limit=20")
+    copy = call("duplicate", "POST", f"{base}/duplicate")
+    call("delete", "DELETE", base)
+    call("delete copy", "DELETE", f"/api/workspaces/{copy['id']}")
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Count database round trips per workspace API call.")
+    parser.add_argument("--nodes", type=int, default=50, help="API servers in the benchmark graph")
+    args = parser.parse_args()
+
+    print(f"{'call':<14}{'status':>7}{'trips':>7}  breakdown")
+    for label, status, total, counts in run(args.nodes):
+        breakdown = ", ".join(f"{key}={value}" for key, value in counts.items() if value)
+        print(f"{label:<14}{status:>7}{total:>7}  {breakdown}")
+
+
+if __name__ == "__main__":
+    main()
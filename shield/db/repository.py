@@ -1,38 +1,252 @@
 from __future__ import annotations
 
-from typing import Iterable
+from typing import Dict, Iterator, List, Optional, Tuple
 
-from db.models import Workspace
-from db.session import session_scope
+from sqlalchemy import and_, delete, func, literal, select, tuple_, update
+from sqlalchemy.dialects.postgresql import JSONB, insert
+from sqlalchemy.engine import Row
+
+from db.models import Workspace, WorkspaceEvent, WorkspaceSimulation, WorkspaceSnapshot
+from db.session import SessionLocal, session_scope
 
 
 class WorkspaceRepository:
     def create(self, workspace: Workspace) -> Workspace:
         with session_scope() as session:
+            # Server defaults come back through INSERT ... RETURNING.
             session.add(workspace)
             session.flush()
-            session.refresh(workspace)
             return workspace
 
+    def insert_many(self, rows: List[Dict[str, object]]) -> int:
+        # One multi-row INSERT; rows whose id already exists are skipped.
+        # Returns the number of rows inserted.
+        with session_scope() as session:
+            inserted = session.execute(insert(Workspace).on_conflict_do_nothing().returning(Workspace.id), rows)
+            return len(inserted.all())
+
     def get(self, workspace_id) -> Workspace | None:
         with session_scope() as session:
             return session.get(Workspace, workspace_id)
 
-    def list_by_user(self, user_id: str) -> Iterable[Workspace]:
+    def list_page(self, user_id: str, limit: int, after: Optional[Tuple[object, object]] = None) -> List[Row]:
+        # Newest first, keyed on (updated_at, id) so each page is one index
+        # range scan on ix_workspaces_user_updated_id. Graph blobs are left out.
+        latest_version = (
+            select(func.coalesce(func.max(WorkspaceEvent.version), 0))
+            .where(WorkspaceEvent.workspace_id == Workspace.id)
+            .scalar_subquery()
+        )
+        query = (
+            select(
+                Workspace.id,
+                Workspace.user_id,
+                Workspace.name,
+                Workspace.type,
+                Workspace.preset_id,
+                Workspace.created_at,
+                Workspace.updated_at,
+                latest_version.label("version"),
+            )
+            .where(Workspace.user_id == user_id)
+            .order_by(Workspace.updated_at.desc(), Workspace.id.desc())
+            .limit(limit)
+        )
+        if after is not None:
+            query = query.where(tuple_(Workspace.updated_at, Workspace.id) < after)
         with session_scope() as session:
-            return list(session.query(Workspace).filter(Workspace.user_id == user_id).all())
+            return list(session.execute(query))
 
-    def update(self, workspace: Workspace) -> Workspace:
+    def touch(self, workspace_id, **values) -> Workspace | None:
+        # Bumps updated_at and sets ``values`` in one UPDATE ... RETURNING.
         with session_scope() as session:
-            merged = session.merge(workspace)
-            session.flush()
-            session.refresh(merged)
-            return merged
+            return session.execute(
+                update(Workspace)
+                .where(Workspace.id == workspace_id)
+                .values(updated_at=func.now(), **values)
+                .returning(Workspace)
+            ).scalar_one_or_none()
 
     def delete(self, workspace_id) -> bool:
+        # Events and snapshots go with the row through ON DELETE CASCADE.
+        with session_scope() as session:
+            deleted = session.execute(delete(Workspace).where(Workspace.id == workspace_id).returning(Workspace.id))
+            return deleted.first() is not None
+
+
+class WorkspaceHistoryRepository:
+    # A workspace graph is ``Workspace.graph_json`` (version 0) followed by one
+    # event per saved version. Snapshots store the full graph at some versions
+    # so a read starts from the nearest one instead of replaying every event.
+
+    def load(
+        self, workspace_id, version: Optional[int] = None
+    ) -> Optional[Tuple[Workspace, int, Dict[str, object], List[list]]]:
+        # Returns the workspace, its latest version, and the graph to start
+        # from plus the patches that bring it to ``version``. Reads of version
+        # 0 and of a version that has a snapshot skip the later statements.
+        latest_version = (
+            select(func.coalesce(func.max(WorkspaceEvent.version), 0))
+            .where(WorkspaceEvent.workspace_id == Workspace.id)
+            .scalar_subquery()
+        )
+        with session_scope() as session:
+            row = session.execute(select(Workspace, latest_version).where(Workspace.id == workspace_id)).first()
+            if row is None:
+                return None
+            workspace, latest = row
+            target = latest if version is None else version
+            if target < 0 or target > latest:
+                return None
+
+            base_version, graph = 0, workspace.graph_json
+            if target > 0:
+                snapshot = session.execute(
+                    select(WorkspaceSnapshot.version, WorkspaceSnapshot.graph_json)
+                    .where(WorkspaceSnapshot.workspace_id == workspace_id, WorkspaceSnapshot.version <= target)
+                    .order_by(WorkspaceSnapshot.version.desc())
+                    .limit(1)
+                ).first()
+                if snapshot is not None:
+                    base_version, graph = snapshot
+            patches: List[list] = []
+            if target > base_version:
+                patches = list(
+                    session.execute(
+                        select(WorkspaceEvent.patch)
+                        .where(
+                            WorkspaceEvent.workspace_id == workspace_id,
+                            WorkspaceEvent.version > base_version,
+                            WorkspaceEvent.version <= target,
+                        )
+                        .order_by(WorkspaceEvent.version)
+                    ).scalars()
+                )
+            return workspace, latest, graph or {}, patches
+
+    def append(
+        self, workspace_id, version: int, patch: list, snapshot: Optional[Dict[str, object]] = None
+    ) -> bool:
+        # Returns False when another writer already took ``version``. The
+        # conflict is skipped rather than raised, so the surrounding
+        # transaction stays usable for a retry.
         with session_scope() as session:
-            workspace = session.get(Workspace, workspace_id)
-            if not workspace:
+            inserted = session.execute(
+                insert(WorkspaceEvent)
+                .values(workspace_id=workspace_id, version=version, patch=patch)
+                .on_conflict_do_nothing()
+                .returning(WorkspaceEvent.version)
+            ).first()
+            if inserted is None:
                 return False
-            session.delete(workspace)
+            if snapshot is not None:
+                session.execute(
+                    insert(WorkspaceSnapshot)
+                    .values(workspace_id=workspace_id, version=version, graph_json=snapshot)
+                    .on_conflict_do_nothing()
+                )
             return True
+
+    def export_batches(
+        self, user_id: Optional[str] = None, batch_size: int = 500
+    ) -> Iterator[List[Tuple[Row, int, Dict[str, object], List[list]]]]:
+        # Workspaces are read from a server-side cursor ``batch_size`` rows at
+        # a time. Each batch then fetches the latest snapshot and the events
+        # after it for its own workspaces, so memory is bounded by the batch
+        # rather than the table. The session is not the request's unit of work
+        # because the stream outlives the request handler.
+        query = select(
+            Workspace.id,
+            Workspace.user_id,
+            Workspace.name,
+            Workspace.type,
+            Workspace.preset_id,
+            Workspace.graph_json,
+            Workspace.metadata_json,
+            Workspace.created_at,
+            Workspace.updated_at,
+        ).order_by(Workspace.id)
+        if user_id is not None:
+            query = query.where(Workspace.user_id == user_id)
+        with SessionLocal() as session:
+            rows = session.execute(query.execution_options(yield_per=batch_size))
+            for batch in rows.partitions():
+                ids = [row.id for row in batch]
+                latest_snapshot = (
+                    select(WorkspaceSnapshot.workspace_id, func.max(WorkspaceSnapshot.version).label("version"))
+                    .where(WorkspaceSnapshot.workspace_id.in_(ids))
+                    .group_by(WorkspaceSnapshot.workspace_id)
+                    .subquery()
+                )
+                latest_snapshots = select(
+                    WorkspaceSnapshot.workspace_id, WorkspaceSnapshot.version, WorkspaceSnapshot.graph_json
+                ).join(
+                    latest_snapshot,
+                    and_(
+                        WorkspaceSnapshot.workspace_id == latest_snapshot.c.workspace_id,
+                        WorkspaceSnapshot.version == latest_snapshot.c.version,
+                    ),
+                )
+                snapshots = {
+                    workspace_id: (version, graph)
+                    for workspace_id, version, graph in session.execute(latest_snapshots)
+                }
+                events: Dict[object, List[Tuple[int, list]]] = {}
+                for workspace_id, version, patch in session.execute(
+                    select(WorkspaceEvent.workspace_id, WorkspaceEvent.version, WorkspaceEvent.patch)
+                    .outerjoin(latest_snapshot, WorkspaceEvent.workspace_id == latest_snapshot.c.workspace_id)
+                    .where(
+                        WorkspaceEvent.workspace_id.in_(ids),
+                        WorkspaceEvent.version > func.coalesce(latest_snapshot.c.version, 0),
+                    )
+                    .order_by(WorkspaceEvent.workspace_id, WorkspaceEvent.version)
+                ):
+                    events.setdefault(workspace_id, []).append((version, patch))
+
+                exported = []
+                for row in batch:
+                    version, graph = snapshots.get(row.id, (0, row.graph_json))
+                    pending = events.get(row.id, [])
+                    if pending:
+                        version = pending[-1][0]
+                    exported.append((row, version, graph or {}, [patch for _, patch in pending]))
+                yield exported
+
+
+class WorkspaceSimulationRepository:
+    # The last simulation run for each workspace, stored with the hash of the
+    # graph it was run on.
+
+    def get(self, workspace_id) -> WorkspaceSimulation | None:
+        with session_scope() as session:
+            return session.get(WorkspaceSimulation, workspace_id)
+
+    def save(self, workspace_id, graph_hash: str, inputs: Dict[str, object], result: Dict[str, object]) -> bool:
+        # One upsert that selects from workspaces, so an unknown workspace id
+        # inserts nothing instead of violating the foreign key.
+        source = select(
+            Workspace.id, literal(graph_hash), literal(inputs, JSONB), literal(result, JSONB), func.now()
+        ).where(Workspace.id == workspace_id)
+        statement = insert(WorkspaceSimulation).from_select(
+            ["workspace_id", "graph_hash", "inputs", "result", "created_at"], source
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[WorkspaceSimulation.workspace_id],
+            set_={
+                "graph_hash": statement.excluded.graph_hash,
+                "inputs": statement.excluded.inputs,
+                "result": statement.excluded.result,
+                "created_at": statement.excluded.created_at,
+            },
+        ).returning(WorkspaceSimulation.workspace_id)
+        with session_scope() as session:
+            return session.execute(statement).first() is not None
+
+    def invalidate(self, workspace_id, graph_hash: str) -> None:
+        # Drops the stored result unless it was run on ``graph_hash``.
+        with session_scope() as session:
+            session.execute(
+                delete(WorkspaceSimulation).where(
+                    WorkspaceSimulation.workspace_id == workspace_id, WorkspaceSimulation.graph_hash != graph_hash
+                )
+            )
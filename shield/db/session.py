@@ -1,24 +1,103 @@
 from __future__ import annotations
 
 from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
 
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 
 from config import Config
 
-engine = create_engine(Config.DATABASE_URL, pool_pre_ping=True)
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+
+def _engine_options(url: str) -> Dict[str, object]:
+    options: Dict[str, object] = {"pool_pre_ping": Config.DB_POOL_PRE_PING}
+    if not url.startswith("sqlite"):
+        # LIFO checkout keeps a few hot connections busy and lets the rest
+        # idle out; pool_recycle replaces connections before servers or
+        # proxies drop them, so a pre-ping per checkout is not needed.
+        options.update(
+            pool_size=Config.DB_POOL_SIZE,
+            max_overflow=Config.DB_MAX_OVERFLOW,
+            pool_timeout=Config.DB_POOL_TIMEOUT,
+            pool_recycle=Config.DB_POOL_RECYCLE,
+            pool_use_lifo=True,
+        )
+    return options
+
+
+engine = create_engine(Config.DATABASE_URL, **_engine_options(Config.DATABASE_URL))
+SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, expire_on_commit=False)
+
+# Holds the session of the current unit of work, created on first use.
+_unit_of_work: ContextVar[Optional[List[Session]]] = ContextVar("unit_of_work", default=None)
 
 
 def init_db() -> None:
     from db.models import Base
 
     Base.metadata.create_all(bind=engine)
+    # create_all skips tables that already exist, so indexes added later are
+    # created here.
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+def begin_unit_of_work() -> None:
+    _unit_of_work.set([])
+
+
+def commit_unit_of_work() -> None:
+    sessions = _unit_of_work.get()
+    if sessions:
+        sessions[0].commit()
+
+
+def end_unit_of_work() -> None:
+    sessions = _unit_of_work.get()
+    _unit_of_work.set(None)
+    if sessions:
+        sessions[0].close()
+
+
+@contextmanager
+def unit_of_work():
+    # A unit of work of its own, committed on exit even inside a request, for
+    # writes that must not depend on the outcome of the surrounding request.
+    token = _unit_of_work.set([])
+    try:
+        yield
+        commit_unit_of_work()
+    finally:
+        end_unit_of_work()
+        _unit_of_work.reset(token)
+
+
+def init_app(app) -> None:
+    # Every request shares one session and transaction. Successful responses
+    # commit it before they are sent; closing it at the end of the request
+    # rolls back whatever an error response left behind.
+    app.before_request(begin_unit_of_work)
+
+    @app.after_request
+    def _commit_unit_of_work(response):
+        if response.status_code < 400:
+            commit_unit_of_work()
+        return response
+
+    app.teardown_request(lambda error: end_unit_of_work())
 
 
 @contextmanager
 def session_scope():
+    sessions = _unit_of_work.get()
+    if sessions is not None:
+        if not sessions:
+            sessions.append(SessionLocal())
+        yield sessions[0]
+        return
+
     session = SessionLocal()
     try:
         yield session
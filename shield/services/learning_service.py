@@ -1,43 +1,52 @@
 from __future__ import annotations
 
-from pathlib import Path
 from typing import Dict, Tuple
 
-from core.learning.faq_engine import FAQEngine
-from core.learning.registry import DesignRegistry
+from core.learning.faq_engine import faq_engine
+
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
 
 
 class LearningService:
     def __init__(self) -> None:
-        presets_dir = Path(__file__).resolve().parents[1] / "presets"
-        self._faq_engine = FAQEngine(DesignRegistry(presets_dir))
+        self._faq_engine = faq_engine
 
     def get_faqs(self, design_id: str, query: Dict[str, str | None]) -> Tuple[Dict[str, object], int]:
-        stage = query.get("stage")
-        topic = query.get("topic")
-        difficulty = query.get("difficulty")
-        search = query.get("search")
+        try:
+            stage_number = int(query["stage"]) if query.get("stage") else None
+            limit = int(query["limit"]) if query.get("limit") else None
+            offset = int(query["offset"]) if query.get("offset") else 0
+        except ValueError:
+            return {"error": "stage, limit and offset must be integers."}, 400
+        if (limit is not None and limit < 0) or offset < 0:
+            return {"error": "limit and offset must not be negative."}, 400
+        if limit is not None:
+            limit = min(limit, MAX_SEARCH_LIMIT)
 
         try:
-            stage_number = int(stage) if stage else None
-            if stage_number is not None:
-                faqs = self._faq_engine.get_faqs_by_stage(design_id, stage_number)
-            else:
-                faqs = self._faq_engine.get_all_faqs(design_id)
-
-            if search:
-                faqs = self._faq_engine.search_questions(design_id, search)
-                if stage_number is not None:
-                    faqs = [faq for faq in faqs if faq.get("stage") in (None, stage_number)]
-
-            if topic:
-                topic_key = topic.lower()
-                faqs = [faq for faq in faqs if topic_key in {t.lower() for t in faq.get("topics", [])}]
-            if difficulty:
-                faqs = [faq for faq in faqs if faq.get("difficulty") == difficulty]
-
-            return {"faqs": faqs}, 200
+            faqs, total = self._faq_engine.query(
+                design_id,
+                stage=stage_number,
+                topic=query.get("topic"),
+                difficulty=query.get("difficulty"),
+                component=query.get("component"),
+                search=query.get("search") or None,
+                limit=limit,
+                offset=offset,
+            )
+            return {"faqs": faqs, "total": total, "limit": limit, "offset": offset}, 200
         except FileNotFoundError:
             return {"error": "Preset not found."}, 404
         except Exception:
             return {"error": "FAQs could not be loaded."}, 500
+
+    def search_faqs(self, query: str | None, limit: int, design_id: str | None = None) -> Tuple[Dict[str, object], int]:
+        if not query or not query.strip():
+            return {"error": "A search query is required."}, 400
+        limit = max(1, min(limit, MAX_SEARCH_LIMIT))
+        try:
+            hits = self._faq_engine.search(query, limit, design_id or None)
+        except Exception:
+            return {"error": "FAQs could not be searched."}, 500
+        return {"query": query, "hits": hits}, 200
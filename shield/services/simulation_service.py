@@ -1,12 +1,82 @@
 from __future__ import annotations
 
-from typing import Dict, List
+import copy
+import json
+import multiprocessing
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
+from config import Config
 from core.architecture_review import review_architecture
+from core.graph.batch import validate_stream
+from core.graph.canonical import graph_fingerprint
+from core.graph.delta import GraphSession, PatchError, StaleVersionError
+from core.graph.compiled import CompiledGraph, compile_graph
+from core.graph.online import OnlineValidator
 from core.graph.validator import validate_graph as validate_structural_graph
 from core.graph_validator import validate_graph
 from core.recommendation_engine import generate_recommendations
+from core.simulation.batch import simulate_sweep
+from core.simulation.discrete_event import check_environment as discrete_event_error
+from core.simulation.incremental import IncrementalSimulation
+from core.simulation.monte_carlo import check_environment as monte_carlo_error
+from core.simulation.optimizer import optimize_capacity
+from core.simulation.sensitivity import capacity_sensitivity
+from core.simulation.timeseries import is_timeseries_profile, simulate_timeseries, traffic_ticks
 from core.simulation_engine import simulate
+from services.result_cache import ResultCache
+
+MAX_SWEEP_POINTS = 10000
+MAX_MONTE_CARLO_TRIALS = 1_000_000
+MAX_INCREMENTAL_SESSIONS = 256
+MAX_VALIDATION_SESSIONS = 256
+MAX_GRAPH_SESSIONS = 256
+MAX_TIMESERIES_TICKS = 1_000_000
+MAX_SENSITIVITY_NODES = 1000
+MAX_SENSITIVITY_INCREASE = 10.0
+DEFAULT_SENSITIVITY_INCREASE = 0.2
+
+_incremental_sessions: "OrderedDict[str, Tuple[IncrementalSimulation, List[str]]]" = OrderedDict()
+_incremental_lock = threading.Lock()
+_validation_sessions: "OrderedDict[str, OnlineValidator]" = OrderedDict()
+_validation_lock = threading.Lock()
+_graph_sessions: "OrderedDict[str, GraphSession]" = OrderedDict()
+_graph_session_lock = threading.Lock()
+_result_cache = ResultCache(max_bytes=Config.SIMULATION_CACHE_MAX_BYTES)
+_validation_pool: Optional[ProcessPoolExecutor] = None
+_validation_pool_lock = threading.Lock()
+_monte_carlo_pool: Optional[ProcessPoolExecutor] = None
+_monte_carlo_pool_lock = threading.Lock()
+
+
+def _get_validation_pool() -> Optional[ProcessPoolExecutor]:
+    global _validation_pool
+    if Config.VALIDATION_WORKERS <= 1:
+        return None
+    with _validation_pool_lock:
+        if _validation_pool is None:
+            # Workers are spawned rather than forked because the pool is
+            # created lazily from a threaded server process.
+            _validation_pool = ProcessPoolExecutor(
+                max_workers=Config.VALIDATION_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _validation_pool
+
+
+def _get_monte_carlo_pool() -> Optional[ProcessPoolExecutor]:
+    global _monte_carlo_pool
+    if Config.MONTE_CARLO_WORKERS <= 1:
+        return None
+    with _monte_carlo_pool_lock:
+        if _monte_carlo_pool is None:
+            _monte_carlo_pool = ProcessPoolExecutor(
+                max_workers=Config.MONTE_CARLO_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _monte_carlo_pool
 
 
 class SimulationService:
@@ -14,13 +84,152 @@ class SimulationService:
         graph = payload.get("graph", {}) if isinstance(payload, dict) else {}
         return validate_structural_graph(graph)
 
-    def run_simulation(self, payload: Dict[str, object]) -> Dict[str, object]:
+    def validate_online(self, payload: Dict[str, object]) -> Tuple[Dict[str, object], int]:
+        if not isinstance(payload, dict) or not payload.get("session_id"):
+            return {"error": "session_id is required."}, 400
+        session_id = str(payload["session_id"])
+
+        if "graph" in payload:
+            graph = payload.get("graph") or {}
+            compiled = compile_graph(graph)
+            result = validate_structural_graph(graph, compiled=compiled)
+            try:
+                session = OnlineValidator(graph, compiled=compiled)
+            except ValueError:
+                with _validation_lock:
+                    _validation_sessions.pop(session_id, None)
+                return dict(result, session_id=session_id), 200
+            with _validation_lock:
+                _validation_sessions[session_id] = session
+                _validation_sessions.move_to_end(session_id)
+                while len(_validation_sessions) > MAX_VALIDATION_SESSIONS:
+                    _validation_sessions.popitem(last=False)
+                return dict(session.result(), session_id=session_id, rejected=[]), 200
+
+        with _validation_lock:
+            session = _validation_sessions.get(session_id)
+            if session is None:
+                return {"error": "Validation session not found."}, 404
+            _validation_sessions.move_to_end(session_id)
+            rejected = []
+            for index, operation in enumerate(payload.get("operations") or []):
+                try:
+                    self._apply_operation(session, operation)
+                except KeyError as exc:
+                    rejected.append({"index": index, "error": f"Unknown id: {exc.args[0]}"})
+                except (AttributeError, TypeError, ValueError) as exc:
+                    rejected.append({"index": index, "error": str(exc)})
+            return dict(session.result(), session_id=session_id, rejected=rejected), 200
+
+    def open_graph_session(self, payload: Dict[str, object]) -> Tuple[Dict[str, object], int]:
+        if not isinstance(payload, dict) or not isinstance(payload.get("graph"), dict):
+            return {"error": "graph is required."}, 400
+        session_id = str(payload.get("session_id") or uuid.uuid4().hex)
+        document = {
+            key: payload[key] for key in ("graph", "traffic_profile", "environment_config", "mode") if key in payload
+        }
+        session = GraphSession(document)
+        with _graph_session_lock:
+            _graph_sessions[session_id] = session
+            _graph_sessions.move_to_end(session_id)
+            while len(_graph_sessions) > MAX_GRAPH_SESSIONS:
+                _graph_sessions.popitem(last=False)
+        with session.lock:
+            return self._graph_session_response(session_id, session, bool(payload.get("simulate"))), 201
+
+    def patch_graph_session(self, session_id: str, payload: Dict[str, object]) -> Tuple[Dict[str, object], int]:
+        if not isinstance(payload, dict) or not isinstance(payload.get("patch"), list):
+            return {"error": "patch must be a list of operations."}, 400
+        with _graph_session_lock:
+            session = _graph_sessions.get(session_id)
+            if session is None:
+                return {"error": "Graph session not found."}, 404
+            _graph_sessions.move_to_end(session_id)
+        with session.lock:
+            try:
+                session.apply(payload.get("version"), payload["patch"])
+            except StaleVersionError as exc:
+                return {"error": str(exc), "version": exc.current}, 409
+            except PatchError as exc:
+                return {"error": str(exc), "version": session.version}, 422
+            return self._graph_session_response(session_id, session, bool(payload.get("simulate"))), 200
+
+    def get_graph_session(self, session_id: str) -> Tuple[Dict[str, object], int]:
+        with _graph_session_lock:
+            session = _graph_sessions.get(session_id)
+        if session is None:
+            return {"error": "Graph session not found."}, 404
+        with session.lock:
+            document = copy.deepcopy(session.document)
+            return {"session_id": session_id, "version": session.version, "document": document}, 200
+
+    def _graph_session_response(self, session_id: str, session: GraphSession, run: bool) -> Dict[str, object]:
+        document = session.document
+        response = {
+            "session_id": session_id,
+            "version": session.version,
+            "validation": validate_structural_graph(document.get("graph") or {}),
+        }
+        if run:
+            response["simulation"], _ = self.run_simulation(document)
+        return response
+
+    def validate_batch(self, graphs: Iterable[object]) -> Iterator[str]:
+        started = time.perf_counter()
+        pool = _get_validation_pool()
+        window = 2 * Config.VALIDATION_WORKERS
+        items = 0
+        valid = 0
+        for result in validate_stream(graphs, pool, window=window):
+            items += 1
+            valid += bool(result.get("valid"))
+            result["type"] = "result"
+            yield json.dumps(result, separators=(",", ":")) + "\n"
+        end = {
+            "type": "end",
+            "items": items,
+            "valid": valid,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000.0, 3),
+        }
+        yield json.dumps(end, separators=(",", ":")) + "\n"
+
+    @staticmethod
+    def _apply_operation(session: OnlineValidator, operation: Dict[str, object]) -> None:
+        kind = str(operation.get("op", "")).replace("-", "_")
+        if kind == "add_node":
+            session.add_node(operation.get("id"), operation.get("type"))
+        elif kind == "remove_node":
+            session.remove_node(operation.get("id"))
+        elif kind == "add_edge":
+            session.add_edge(operation.get("source"), operation.get("target"), operation.get("id"))
+        elif kind == "remove_edge":
+            session.remove_edge(operation.get("id"), operation.get("source"), operation.get("target"))
+        else:
+            raise ValueError(f"Unknown operation: {operation.get('op')}")
+
+    def run_simulation(self, payload: Dict[str, object]) -> Tuple[Dict[str, object], int]:
         graph = payload.get("graph", {}) if isinstance(payload, dict) else {}
         traffic_profile = payload.get("traffic_profile")
         environment_config = payload.get("environment_config")
         mode = payload.get("mode", "sandbox")
+        if is_timeseries_profile(traffic_profile):
+            return {"error": "Time-series traffic profiles are simulated by POST /simulate/timeseries."}, 400
+        error = self._environment_error(mode, environment_config)
+        if error:
+            return {"error": error}, 400
+
+        cache_key = graph_fingerprint(graph, traffic_profile, environment_config, mode)
+        cached = _result_cache.get(cache_key)
+        if cached is not None:
+            return cached, 200
 
-        structural_errors, ordered_nodes = validate_graph(graph)
+        compiled = compile_graph(graph)
+        if mode in ("discrete_event", "monte_carlo"):
+            check = discrete_event_error if mode == "discrete_event" else monte_carlo_error
+            error = check(compiled, environment_config)
+            if error:
+                return {"error": error}, 400
+        structural_errors, ordered_nodes = validate_graph(graph, compiled=compiled)
         response = {
             "structural_errors": structural_errors,
             "architectural_warnings": [],
@@ -30,7 +239,8 @@ class SimulationService:
         }
 
         if structural_errors:
-            return response
+            _result_cache.put(cache_key, response)
+            return response, 200
 
         warnings = review_architecture(ordered_nodes)
         performance, node_metrics = simulate(
@@ -39,9 +249,16 @@ class SimulationService:
             environment_config=environment_config,
             mode=mode,
             ordered_nodes=ordered_nodes,
+            compiled=compiled,
+            executor=_get_monte_carlo_pool() if mode == "monte_carlo" else None,
         )
+        # Sensitivity is opt-in: it adds one batched evaluation per node.
+        sensitivity = None
+        if mode != "discrete_event" and environment_config and environment_config.get("sensitivity"):
+            increase = float(environment_config.get("sensitivity_increase", DEFAULT_SENSITIVITY_INCREASE))
+            sensitivity = self._sensitivity(compiled, ordered_nodes, traffic_profile, node_metrics, increase)
         recommendations = generate_recommendations(
-            performance=performance, node_metrics=node_metrics, warnings=warnings
+            performance=performance, node_metrics=node_metrics, warnings=warnings, sensitivity=sensitivity
         )
 
         response.update(
@@ -49,7 +266,265 @@ class SimulationService:
                 "architectural_warnings": warnings,
                 "performance": performance,
                 "node_metrics": node_metrics,
+                "sensitivity": sensitivity or [],
                 "recommendations": recommendations,
             }
         )
-        return response
+        _result_cache.put(cache_key, response)
+        return response, 200
+
+    @staticmethod
+    def _environment_error(mode: object, environment_config: object) -> Optional[str]:
+        if environment_config is None:
+            return None
+        if not isinstance(environment_config, dict):
+            return "environment_config must be an object."
+        try:
+            increase = float(environment_config.get("sensitivity_increase", DEFAULT_SENSITIVITY_INCREASE))
+        except (TypeError, ValueError):
+            return "sensitivity_increase must be numeric."
+        if not 0 < increase <= MAX_SENSITIVITY_INCREASE:
+            return f"sensitivity_increase must be positive and at most {MAX_SENSITIVITY_INCREASE:g}."
+        if mode == "monte_carlo":
+            try:
+                trials = int(environment_config.get("trials", 10_000))
+            except (TypeError, ValueError):
+                return "trials must be an integer."
+            if trials > MAX_MONTE_CARLO_TRIALS:
+                return f"Monte Carlo runs are limited to {MAX_MONTE_CARLO_TRIALS} trials."
+        return None
+
+    @staticmethod
+    def _sensitivity(
+        compiled: CompiledGraph,
+        ordered_nodes: List[Dict[str, object]],
+        traffic_profile: Optional[Dict[str, object]],
+        node_metrics: List[Dict[str, object]],
+        increase: float,
+    ) -> List[Dict[str, object]]:
+        if traffic_profile is None:
+            users = [node for node in ordered_nodes if node.get("type") == "User"]
+            traffic_profile = (users[0].get("config", {}) or {}) if users else {}
+        root_rps = float(traffic_profile.get("number_of_users", 0)) * float(traffic_profile.get("requests_per_user", 0))
+        # Large graphs only get their first MAX_SENSITIVITY_NODES overloaded
+        # nodes perturbed.
+        node_ids = None
+        if compiled.node_count > MAX_SENSITIVITY_NODES:
+            overloaded = [metric["component_id"] for metric in node_metrics if metric.get("status") == "overloaded"]
+            node_ids = overloaded[:MAX_SENSITIVITY_NODES]
+        order = [compiled.index[node.get("id")] for node in ordered_nodes]
+        return capacity_sensitivity(compiled, root_rps, increase, order=order, node_ids=node_ids)
+
+    def cache_stats(self) -> Dict[str, int]:
+        return _result_cache.stats()
+
+    def run_sweep(self, payload: Dict[str, object]) -> Tuple[Dict[str, object], int]:
+        graph = payload.get("graph", {}) if isinstance(payload, dict) else {}
+        try:
+            root_rps = self._sweep_loads(payload)
+        except (AttributeError, TypeError, ValueError):
+            return {"error": "Sweep loads must be numeric."}, 400
+        if not root_rps:
+            return {"error": "Provide traffic_profiles or rps values to sweep."}, 400
+        if len(root_rps) > MAX_SWEEP_POINTS:
+            return {"error": f"Sweeps are limited to {MAX_SWEEP_POINTS} load points."}, 400
+
+        compiled = compile_graph(graph)
+        structural_errors, _ = validate_graph(graph, compiled=compiled)
+        response = {
+            "structural_errors": structural_errors,
+            "node_ids": [],
+            "load_points": [],
+            "utilization": [],
+            "latency": [],
+        }
+        if structural_errors:
+            return response, 200
+
+        response.update(simulate_sweep(compiled, root_rps))
+        return response, 200
+
+    @staticmethod
+    def _sweep_loads(payload: Dict[str, object]) -> List[float]:
+        if not isinstance(payload, dict):
+            return []
+        profiles = payload.get("traffic_profiles") or []
+        if profiles:
+            return [
+                float(profile.get("number_of_users", 0)) * float(profile.get("requests_per_user", 0))
+                for profile in profiles
+            ]
+        return [float(value) for value in payload.get("rps") or []]
+
+    def run_optimize(self, payload: Dict[str, object]) -> Tuple[Dict[str, object], int]:
+        if not isinstance(payload, dict):
+            return {"error": "Request body must be an object."}, 400
+        graph = payload.get("graph", {})
+        traffic_profile = payload.get("traffic_profile") or {}
+        try:
+            if "target_rps" in payload:
+                target_rps = float(payload["target_rps"])
+            else:
+                target_rps = float(traffic_profile.get("number_of_users", 0)) * float(
+                    traffic_profile.get("requests_per_user", 0)
+                )
+            max_latency = payload.get("max_latency")
+            max_latency = float(max_latency) if max_latency is not None else None
+            max_error_rate = float(payload.get("max_error_rate", 0))
+            capacity_step = float(payload.get("capacity_step", 1))
+        except (AttributeError, TypeError, ValueError):
+            return {"error": "target_rps, max_latency, max_error_rate and capacity_step must be numeric."}, 400
+        if target_rps <= 0:
+            return {"error": "Provide a positive target_rps or traffic_profile."}, 400
+
+        compiled = compile_graph(graph)
+        structural_errors, ordered_nodes = validate_graph(graph, compiled=compiled)
+        response: Dict[str, object] = {"structural_errors": structural_errors, "target_rps": target_rps}
+        if structural_errors:
+            return response, 200
+
+        order = [compiled.index[node.get("id")] for node in ordered_nodes]
+        try:
+            result = optimize_capacity(
+                compiled,
+                target_rps,
+                max_latency=max_latency,
+                max_error_rate=max_error_rate,
+                unit=str(payload.get("unit", "capacity")),
+                capacity_step=capacity_step,
+                order=order,
+            )
+        except ValueError as exc:
+            return {"error": str(exc)}, 400
+        response.update(result)
+        return response, 200
+
+    def stream_timeseries(self, payload: Dict[str, object], stream_format: str = "ndjson") -> Tuple[object, int]:
+        graph = payload.get("graph", {}) if isinstance(payload, dict) else {}
+        traffic_profile = payload.get("traffic_profile") if isinstance(payload, dict) else None
+        if not is_timeseries_profile(traffic_profile):
+            return {"error": "traffic_profile must define a series or a curve."}, 400
+        try:
+            tick_count, ticks = traffic_ticks(traffic_profile, MAX_TIMESERIES_TICKS)
+        except (AttributeError, KeyError, TypeError, ValueError) as exc:
+            return {"error": f"Invalid traffic profile: {exc}"}, 400
+        if tick_count > MAX_TIMESERIES_TICKS:
+            return {"error": f"Time series are limited to {MAX_TIMESERIES_TICKS} ticks."}, 400
+        include_node_metrics = payload.get("include_node_metrics", True)
+        if not isinstance(include_node_metrics, bool):
+            return {"error": "include_node_metrics must be true or false."}, 400
+
+        compiled = compile_graph(graph)
+        structural_errors, ordered_nodes = validate_graph(graph, compiled=compiled)
+        lines = self._timeseries_lines(
+            compiled, ordered_nodes, structural_errors, tick_count, ticks, include_node_metrics, stream_format
+        )
+        return lines, 200
+
+    @staticmethod
+    def _timeseries_lines(
+        compiled: CompiledGraph,
+        ordered_nodes: List[Dict[str, object]],
+        structural_errors: List[str],
+        tick_count: int,
+        ticks: Iterator[Tuple[float, float]],
+        include_node_metrics: bool,
+        stream_format: str,
+    ) -> Iterator[str]:
+        def encode(event: str, record: Dict[str, object]) -> str:
+            if stream_format == "sse":
+                return f"event: {event}\ndata: {json.dumps(record, separators=(',', ':'))}\n\n"
+            record["type"] = event
+            return json.dumps(record, separators=(",", ":")) + "\n"
+
+        start = {"structural_errors": structural_errors, "ticks": tick_count}
+        if structural_errors:
+            yield encode("start", start)
+            return
+        start["architectural_warnings"] = review_architecture(ordered_nodes)
+        yield encode("start", start)
+
+        order = [compiled.index[node.get("id")] for node in ordered_nodes]
+        emitted = 0
+        error_ticks = 0
+        peak_latency = 0.0
+        peak_error_rate = 0.0
+        for record in simulate_timeseries(compiled, ticks, order, include_node_metrics):
+            performance = record["performance"]
+            emitted += 1
+            if performance["total_error_rate"] > 0:
+                error_ticks += 1
+            peak_latency = max(peak_latency, performance["total_latency"])
+            peak_error_rate = max(peak_error_rate, performance["total_error_rate"])
+            yield encode("tick", record)
+
+        yield encode(
+            "end",
+            {
+                "ticks": emitted,
+                "error_ticks": error_ticks,
+                "peak_total_latency": peak_latency,
+                "peak_error_rate": peak_error_rate,
+            },
+        )
+
+    def run_incremental(self, payload: Dict[str, object]) -> Tuple[Dict[str, object], int]:
+        if not isinstance(payload, dict) or not payload.get("session_id"):
+            return {"error": "session_id is required."}, 400
+        session_id = str(payload["session_id"])
+
+        if "graph" in payload:
+            graph = payload.get("graph") or {}
+            compiled = compile_graph(graph)
+            structural_errors, ordered_nodes = validate_graph(graph, compiled=compiled)
+            if structural_errors:
+                with _incremental_lock:
+                    _incremental_sessions.pop(session_id, None)
+                return {"session_id": session_id, "structural_errors": structural_errors}, 200
+            warnings = review_architecture(ordered_nodes)
+            session = IncrementalSimulation(graph, payload.get("traffic_profile"), compiled=compiled)
+            with _incremental_lock:
+                _incremental_sessions[session_id] = (session, warnings)
+                _incremental_sessions.move_to_end(session_id)
+                while len(_incremental_sessions) > MAX_INCREMENTAL_SESSIONS:
+                    _incremental_sessions.popitem(last=False)
+                return self._incremental_response(session_id, session, warnings, session.order), 200
+
+        with _incremental_lock:
+            entry = _incremental_sessions.get(session_id)
+            if entry is None:
+                return {"error": "Simulation session not found."}, 404
+            _incremental_sessions.move_to_end(session_id)
+            session, warnings = entry
+            try:
+                for change in payload.get("changes") or []:
+                    session.update_node(str(change.get("node_id")), dict(change.get("config") or {}))
+                if "traffic_profile" in payload:
+                    session.set_traffic_profile(payload.get("traffic_profile"))
+            except KeyError as exc:
+                return {"error": f"Unknown node id: {exc.args[0]}"}, 400
+            except (AttributeError, TypeError, ValueError):
+                return {"error": "Changes must be objects with node_id and config."}, 400
+            changed = session.recompute()
+            return self._incremental_response(session_id, session, warnings, changed), 200
+
+    @staticmethod
+    def _incremental_response(
+        session_id: str, session: IncrementalSimulation, warnings: List[str], changed: List[int]
+    ) -> Dict[str, object]:
+        performance = session.performance()
+        node_metrics = session.node_metrics(changed)
+        recommendations = generate_recommendations(
+            performance=performance,
+            node_metrics=session.node_metrics(list(session.overloaded)),
+            warnings=warnings,
+        )
+        return {
+            "session_id": session_id,
+            "structural_errors": [],
+            "architectural_warnings": warnings,
+            "performance": performance,
+            "node_metrics": node_metrics,
+            "changed_node_ids": [metric["component_id"] for metric in node_metrics],
+            "recommendations": recommendations,
+        }
@@ -1,15 +1,50 @@
 from __future__ import annotations
 
+import atexit
+import base64
+import copy
+import json
+import logging
 import uuid
-from typing import Dict, Iterable, Tuple
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
+from config import Config
+from core.graph.canonical import stable_graph_hash
+from core.graph.delta import StaleVersionError, apply_patch, diff_documents
 from db.models import Workspace, WorkspaceType
-from db.repository import WorkspaceRepository
+from db.repository import WorkspaceHistoryRepository, WorkspaceRepository, WorkspaceSimulationRepository
+from db.session import unit_of_work
+from services.write_behind import WriteBehindBuffer
+
+logger = logging.getLogger(__name__)
+
+MAX_APPEND_ATTEMPTS = 3
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+EXPORT_BATCH_SIZE = 500
+IMPORT_BATCH_SIZE = 500
+MAX_IMPORT_ERRORS = 100
+
+
+def _write_autosave(workspace_id: str, detail: Dict[str, object]) -> None:
+    with unit_of_work():
+        WorkspaceService()._write_update(workspace_id, graph_json=detail["graph_json"])
+
+
+# Graph-only saves wait here and reach the database as one coalesced write
+# per workspace. AUTOSAVE_FLUSH_INTERVAL=0 writes every save synchronously.
+_autosave: Optional[WriteBehindBuffer] = None
+if Config.AUTOSAVE_FLUSH_INTERVAL > 0:
+    _autosave = WriteBehindBuffer(_write_autosave, Config.AUTOSAVE_FLUSH_INTERVAL, Config.AUTOSAVE_MAX_PENDING)
+    atexit.register(_autosave.close)
 
 
 class WorkspaceService:
     def __init__(self) -> None:
         self._repo = WorkspaceRepository()
+        self._history = WorkspaceHistoryRepository()
+        self._simulations = WorkspaceSimulationRepository()
 
     def create_workspace(
         self,
@@ -33,49 +68,309 @@ class WorkspaceService:
     def get_workspace(self, workspace_id: str) -> Workspace | None:
         return self._repo.get(uuid.UUID(workspace_id))
 
-    def list_workspaces(self, user_id: str) -> Iterable[Workspace]:
-        return self._repo.list_by_user(user_id)
+    def list_workspaces(
+        self, user_id: str, limit: int = DEFAULT_PAGE_SIZE, cursor: str | None = None
+    ) -> Tuple[List[Dict[str, object]], str | None]:
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        after = self._decode_cursor(cursor) if cursor else None
+        rows = self._repo.list_page(user_id, limit + 1, after)
+        page = rows[:limit]
+        next_cursor = self._encode_cursor(page[-1]) if len(rows) > limit else None
+        return [self.serialize_summary(row) for row in page], next_cursor
+
+    @staticmethod
+    def _encode_cursor(row) -> str:
+        raw = json.dumps([row.updated_at.isoformat(), str(row.id)]).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            updated_at, workspace_id = json.loads(raw)
+            return datetime.fromisoformat(updated_at), uuid.UUID(workspace_id)
+        except (TypeError, ValueError) as exc:
+            raise ValueError("Invalid cursor.") from exc
+
+    def _load(
+        self, workspace_id: str, version: int | None = None
+    ) -> Tuple[Workspace, int, int, Dict[str, object]] | None:
+        loaded = self._history.load(uuid.UUID(workspace_id), version)
+        if loaded is None:
+            return None
+        workspace, latest, graph, patches = loaded
+        graph = copy.deepcopy(graph)
+        for patch in patches:
+            apply_patch(graph, patch)
+        return workspace, latest, latest if version is None else version, graph
+
+    def load_graph(self, workspace_id: str, version: int | None = None) -> Tuple[int, Dict[str, object]] | None:
+        self._flush_pending(workspace_id)
+        loaded = self._load(workspace_id, version)
+        return None if loaded is None else loaded[2:]
+
+    @staticmethod
+    def _flush_pending(workspace_id: str) -> None:
+        if _autosave is not None:
+            _autosave.flush(str(uuid.UUID(workspace_id)))
+
+    @staticmethod
+    def autosave_stats() -> Dict[str, object]:
+        if _autosave is None:
+            return {"enabled": False}
+        return dict(_autosave.stats(), enabled=True, flush_interval_s=_autosave.interval)
+
+    def get_workspace_detail(self, workspace_id: str, include_simulation: bool = False) -> Dict[str, object] | None:
+        detail = _autosave.get(str(uuid.UUID(workspace_id))) if _autosave is not None else None
+        if detail is None:
+            loaded = self._load(workspace_id)
+            if loaded is None:
+                return None
+            workspace, latest, _, graph = loaded
+            detail = self.serialize(workspace, graph, latest)
+        if include_simulation:
+            detail = dict(detail, simulation=self._stored_simulation(workspace_id, detail["graph_json"]))
+        return detail
 
-    def update_graph(self, workspace_id: str, graph_json: Dict[str, object]) -> Workspace | None:
-        workspace = self.get_workspace(workspace_id)
-        if not workspace:
+    def _stored_simulation(self, workspace_id: str, graph: Dict[str, object]) -> Dict[str, object] | None:
+        # A stored result is only returned while the graph still hashes to the
+        # graph it was run on.
+        stored = self._simulations.get(uuid.UUID(workspace_id))
+        if stored is None or stored.graph_hash != stable_graph_hash(graph):
             return None
-        workspace.graph_json = graph_json
-        return self._repo.update(workspace)
+        return dict(
+            stored.inputs,
+            graph_hash=stored.graph_hash,
+            result=stored.result,
+            simulated_at=stored.created_at.isoformat() if stored.created_at else None,
+        )
+
+    def record_simulation(
+        self, workspace_id: object, payload: Dict[str, object], result: Dict[str, object]
+    ) -> bool:
+        # Best effort, in a transaction of its own: a failed write is logged
+        # and never fails the simulation that produced the result. Results
+        # with structural errors are not worth keeping.
+        if result.get("structural_errors"):
+            return False
+        try:
+            workspace_uuid = uuid.UUID(str(workspace_id))
+        except ValueError:
+            return False
+        inputs = {key: payload.get(key) for key in ("traffic_profile", "environment_config", "mode")}
+        try:
+            with unit_of_work():
+                return self._simulations.save(workspace_uuid, stable_graph_hash(payload.get("graph")), inputs, result)
+        except Exception:
+            logger.exception("Could not store the simulation for workspace %s.", workspace_uuid)
+            return False
 
-    def rename_workspace(self, workspace_id: str, new_name: str) -> Workspace | None:
-        workspace = self.get_workspace(workspace_id)
-        if not workspace:
+    def update_workspace(
+        self,
+        workspace_id: str,
+        name: str | None = None,
+        graph_json: Dict[str, object] | None = None,
+        graph_patch: List[Dict[str, object]] | None = None,
+        version: object = None,
+    ) -> Dict[str, object] | None:
+        # A save that only carries ``graph_json`` is buffered and answered
+        # with ``pending: true`` and the last stored ``version``. Every other
+        # update first writes out the workspace's buffered graph.
+        if _autosave is not None and graph_json is not None and name is None and graph_patch is None:
+            detail = self.get_workspace_detail(workspace_id)
+            if detail is None:
+                return None
+            detail = dict(
+                detail, graph_json=graph_json, pending=True, updated_at=datetime.now(timezone.utc).isoformat()
+            )
+            _autosave.put(str(uuid.UUID(workspace_id)), detail)
+            return detail
+        self._flush_pending(workspace_id)
+        return self._write_update(workspace_id, name, graph_json, graph_patch, version)
+
+    def _write_update(
+        self,
+        workspace_id: str,
+        name: str | None = None,
+        graph_json: Dict[str, object] | None = None,
+        graph_patch: List[Dict[str, object]] | None = None,
+        version: object = None,
+    ) -> Dict[str, object] | None:
+        # Graph edits are stored as patches against the latest version: a
+        # ``graph_patch`` must name that version, while a full ``graph_json``
+        # is diffed against it and diffed again if another save takes the
+        # version first. The name and updated_at then change in one
+        # UPDATE ... RETURNING, and the response is built without reloading.
+        for attempt in range(MAX_APPEND_ATTEMPTS):
+            loaded = self._load(workspace_id)
+            if loaded is None:
+                return None
+            workspace, latest, _, graph = loaded
+            patch: List[Dict[str, object]] = []
+            if graph_patch is not None:
+                if version != latest:
+                    raise StaleVersionError(version, latest)
+                apply_patch(graph, graph_patch)
+                patch = graph_patch
+            elif graph_json is not None:
+                patch = diff_documents(graph, graph_json)
+                graph = graph_json
+            if not patch:
+                break
+            if self._append(workspace_id, latest + 1, patch, graph):
+                self._simulations.invalidate(uuid.UUID(workspace_id), stable_graph_hash(graph))
+                break
+            if graph_patch is not None or attempt == MAX_APPEND_ATTEMPTS - 1:
+                raise StaleVersionError(version if graph_patch is not None else latest, latest + 1)
+
+        if patch:
+            latest += 1
+        if patch or name is not None:
+            values = {"name": name} if name is not None else {}
+            workspace = self._repo.touch(uuid.UUID(workspace_id), **values)
+            if workspace is None:
+                return None
+        return self.serialize(workspace, graph, latest)
+
+    def diff_versions(self, workspace_id: str, from_version: int, to_version: int) -> List[Dict[str, object]] | None:
+        before = self.load_graph(workspace_id, from_version)
+        after = self.load_graph(workspace_id, to_version)
+        if before is None or after is None:
             return None
-        workspace.name = new_name
-        return self._repo.update(workspace)
+        return diff_documents(before[1], after[1])
+
+    def _append(
+        self, workspace_id: str, version: int, patch: List[Dict[str, object]], graph: Dict[str, object]
+    ) -> bool:
+        snapshot = graph if version % Config.WORKSPACE_SNAPSHOT_INTERVAL == 0 else None
+        return self._history.append(uuid.UUID(workspace_id), version, patch, snapshot)
 
     def duplicate_workspace(self, workspace_id: str, new_name: str | None = None) -> Workspace | None:
-        workspace = self.get_workspace(workspace_id)
-        if not workspace:
+        self._flush_pending(workspace_id)
+        loaded = self._load(workspace_id)
+        if loaded is None:
             return None
+        workspace, _, _, graph = loaded
         clone = Workspace(
             user_id=workspace.user_id,
             type=workspace.type,
             name=new_name or f"{workspace.name} (copy)",
             preset_id=workspace.preset_id,
-            graph_json=workspace.graph_json,
+            graph_json=graph,
             metadata_json=workspace.metadata_json,
         )
         return self._repo.create(clone)
 
+    def export_workspaces(self, user_id: str | None = None) -> Iterator[str]:
+        # One NDJSON line per workspace with its current graph and version.
+        if _autosave is not None:
+            _autosave.flush()
+        return self._export_lines(user_id)
+
+    def _export_lines(self, user_id: str | None) -> Iterator[str]:
+        for batch in self._history.export_batches(user_id, EXPORT_BATCH_SIZE):
+            lines = []
+            for row, version, graph, patches in batch:
+                for patch in patches:
+                    apply_patch(graph, patch)
+                lines.append(json.dumps(self.serialize(row, graph, version), separators=(",", ":")) + "\n")
+            yield "".join(lines)
+
+    def import_workspaces(self, lines: Iterable[bytes], user_id: str | None = None) -> Dict[str, object]:
+        # Reads exported NDJSON lazily and inserts it IMPORT_BATCH_SIZE rows at
+        # a time, each batch in its own committed transaction. Ids are kept,
+        # and lines whose id already exists are skipped. Imported graphs start
+        # a new history at version 0.
+        imported = skipped = error_count = 0
+        errors: List[Dict[str, object]] = []
+        batch: List[Dict[str, object]] = []
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                batch.append(self._import_row(json.loads(line), user_id))
+            except (TypeError, ValueError) as exc:
+                error_count += 1
+                if len(errors) < MAX_IMPORT_ERRORS:
+                    errors.append({"line": number, "error": str(exc)})
+                continue
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                inserted = self._insert_batch(batch)
+                imported += inserted
+                skipped += len(batch) - inserted
+                batch = []
+        if batch:
+            inserted = self._insert_batch(batch)
+            imported += inserted
+            skipped += len(batch) - inserted
+        return {"imported": imported, "skipped": skipped, "error_count": error_count, "errors": errors}
+
+    def _insert_batch(self, batch: List[Dict[str, object]]) -> int:
+        with unit_of_work():
+            return self._repo.insert_many(batch)
+
+    @staticmethod
+    def _import_row(record: object, user_id: str | None) -> Dict[str, object]:
+        if not isinstance(record, dict):
+            raise ValueError("Each line must be a workspace object.")
+        name = record.get("name")
+        if not isinstance(name, str) or not name or len(name) > 255:
+            raise ValueError("Workspace name must be a non-empty string of at most 255 characters.")
+        graph_json = record.get("graph_json") or {}
+        metadata_json = record.get("metadata_json") or {}
+        if not isinstance(graph_json, dict) or not isinstance(metadata_json, dict):
+            raise ValueError("graph_json and metadata_json must be objects.")
+        owner = user_id or record.get("user_id") or "local"
+        preset_id = record.get("preset_id")
+        if not isinstance(owner, str) or len(owner) > 128 or not isinstance(preset_id, (str, type(None))):
+            raise ValueError("user_id and preset_id must be strings of at most 128 characters.")
+        if preset_id is not None and len(preset_id) > 128:
+            raise ValueError("user_id and preset_id must be strings of at most 128 characters.")
+        now = datetime.now(timezone.utc)
+        created_at = record.get("created_at")
+        updated_at = record.get("updated_at")
+        return {
+            "id": uuid.UUID(str(record["id"])) if record.get("id") else uuid.uuid4(),
+            "user_id": owner,
+            "name": name,
+            "type": WorkspaceType(record.get("type") or "PRACTICE"),
+            "preset_id": preset_id,
+            "graph_json": graph_json,
+            "metadata_json": metadata_json,
+            "created_at": datetime.fromisoformat(created_at) if created_at else now,
+            "updated_at": datetime.fromisoformat(updated_at) if updated_at else now,
+        }
+
     def delete_workspace(self, workspace_id: str) -> bool:
+        if _autosave is not None:
+            _autosave.discard(str(uuid.UUID(workspace_id)))
         return self._repo.delete(uuid.UUID(workspace_id))
 
     @staticmethod
-    def serialize(workspace: Workspace) -> Dict[str, object]:
+    def serialize_summary(row) -> Dict[str, object]:
+        return {
+            "id": str(row.id),
+            "user_id": row.user_id,
+            "name": row.name,
+            "type": row.type.value,
+            "preset_id": row.preset_id,
+            "version": row.version,
+            "created_at": row.created_at.isoformat() if row.created_at else None,
+            "updated_at": row.updated_at.isoformat() if row.updated_at else None,
+        }
+
+    @staticmethod
+    def serialize(
+        workspace: Workspace, graph_json: Dict[str, object] | None = None, version: int = 0
+    ) -> Dict[str, object]:
         return {
             "id": str(workspace.id),
             "user_id": workspace.user_id,
             "name": workspace.name,
             "type": workspace.type.value,
             "preset_id": workspace.preset_id,
-            "graph_json": workspace.graph_json,
+            "graph_json": workspace.graph_json if graph_json is None else graph_json,
+            "version": version,
             "metadata_json": workspace.metadata_json,
             "created_at": workspace.created_at.isoformat() if workspace.created_at else None,
             "updated_at": workspace.updated_at.isoformat() if workspace.updated_at else None,
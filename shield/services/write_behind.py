@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    # Keeps only the latest value per key and hands it to ``write`` from a
+    # background thread, every ``interval`` seconds or as soon as
+    # ``max_pending`` keys are waiting. Writes are serialized, so a
+    # synchronous ``flush`` returns only once the key is on disk, including
+    # a write the background thread had already started.
+
+    def __init__(self, write: Callable[[Hashable, object], None], interval: float, max_pending: int = 1000) -> None:
+        self.write = write
+        self.interval = interval
+        self.max_pending = max_pending
+        self._pending: Dict[Hashable, object] = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+        self.puts = 0
+        self.writes = 0
+        self.failures = 0
+
+    def put(self, key: Hashable, value: object) -> None:
+        with self._lock:
+            if self._stopped:
+                raise RuntimeError("The write-behind buffer is closed.")
+            self._pending[key] = value
+            self.puts += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                self._thread.start()
+            full = len(self._pending) >= self.max_pending
+        if full:
+            self._wake.set()
+
+    def get(self, key: Hashable) -> Optional[object]:
+        with self._lock:
+            return self._pending.get(key)
+
+    def discard(self, key: Hashable) -> None:
+        with self._write_lock, self._lock:
+            self._pending.pop(key, None)
+
+    def flush(self, key: Optional[Hashable] = None) -> int:
+        # Writes one key, or everything pending when ``key`` is None, and
+        # returns the number of writes. Values stay readable through ``get``
+        # until their write has returned, and are removed only if no newer
+        # value arrived meanwhile. A failed value stays pending; the other
+        # keys are still written and the first error is raised at the end.
+        with self._write_lock:
+            with self._lock:
+                if key is None:
+                    batch = dict(self._pending)
+                else:
+                    batch = {key: self._pending[key]} if key in self._pending else {}
+            written = 0
+            error: Optional[Exception] = None
+            for item_key, value in batch.items():
+                try:
+                    self.write(item_key, value)
+                except Exception as exc:
+                    self.failures += 1
+                    error = error or exc
+                    continue
+                with self._lock:
+                    if self._pending.get(item_key) is value:
+                        del self._pending[item_key]
+                written += 1
+            self.writes += written
+            if error is not None:
+                raise error
+            return written
+
+    def close(self) -> None:
+        with self._lock:
+            self._stopped = True
+            thread = self._thread
+        self._wake.set()
+        if thread is not None:
+            thread.join()
+        self.flush()
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            with self._lock:
+                stopped = self._stopped
+            if stopped:
+                return
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Write-behind flush failed; pending values are kept for the next attempt.")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "puts": self.puts,
+                "writes": self.writes,
+                "coalesced": self.puts - self.writes - len(self._pending),
+                "failures": self.failures,
+            }
@@ -55,6 +55,7 @@ const state = {
   validationTimer: null,
   lastValidation: null,
   validationActive: false,
+  graphSession: null,
   history: {
     past: [],
     future: [],
@@ -391,17 +392,68 @@ function selectStage(stageValue) {
   saveState();
 }
 
-async function validateGraph() {
-  const payload = buildGraphPayload();
-  try {
-    const response = await fetch("/api/validate", {
-      method: "POST",
+function diffList(path, before, after, patch) {
+  const same = (left, right) => JSON.stringify(left) === JSON.stringify(right);
+  let start = 0;
+  while (start < before.length && start < after.length && same(before[start], after[start])) {
+    start += 1;
+  }
+  let beforeEnd = before.length;
+  let afterEnd = after.length;
+  while (beforeEnd > start && afterEnd > start && same(before[beforeEnd - 1], after[afterEnd - 1])) {
+    beforeEnd -= 1;
+    afterEnd -= 1;
+  }
+  const shared = Math.min(beforeEnd, afterEnd) - start;
+  for (let index = start; index < start + shared; index += 1) {
+    patch.push({ op: "replace", path: `${path}/${index}`, value: after[index] });
+  }
+  for (let index = start + shared; index < afterEnd; index += 1) {
+    patch.push({ op: "add", path: `${path}/${index}`, value: after[index] });
+  }
+  for (let index = beforeEnd - 1; index >= start + shared; index -= 1) {
+    patch.push({ op: "remove", path: `${path}/${index}` });
+  }
+}
+
+async function syncGraphSession(simulate = false) {
+  // Sends only the changed nodes and edges to the server-side graph session,
+  // and falls back to uploading the whole graph when the session is stale.
+  const payload = JSON.parse(JSON.stringify(buildGraphPayload()));
+  const session = state.graphSession;
+  if (session) {
+    const patch = [];
+    diffList("/graph/nodes", session.payload.graph.nodes, payload.graph.nodes, patch);
+    diffList("/graph/edges", session.payload.graph.edges, payload.graph.edges, patch);
+    const response = await fetch(`/api/graph-sessions/${session.id}`, {
+      method: "PATCH",
       headers: { "Content-Type": "application/json" },
-      body: JSON.stringify(payload),
+      body: JSON.stringify({ version: session.version, patch, simulate }),
     });
-    const data = await response.json();
-    state.lastValidation = data;
-    updateValidationUI(data);
+    if (response.ok) {
+      const data = await response.json();
+      state.graphSession = { id: session.id, version: data.version, payload };
+      return data;
+    }
+  }
+  const response = await fetch("/api/graph-sessions", {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ ...payload, simulate }),
+  });
+  if (!response.ok) {
+    throw new Error(`Graph session failed with status ${response.status}`);
+  }
+  const data = await response.json();
+  state.graphSession = { id: data.session_id, version: data.version, payload };
+  return data;
+}
+
+async function validateGraph() {
+  try {
+    const data = await syncGraphSession();
+    state.lastValidation = data.validation;
+    updateValidationUI(data.validation);
   } catch (error) {
     console.warn("Validation failed", error);
   }
@@ -1561,18 +1613,13 @@ simulateBtn.addEventListener("click", async () => {
   if (!state.validationActive) {
     state.validationActive = true;
   }
-  await validateGraph();
-  if (state.lastValidation && state.lastValidation.valid === false) {
+  const data = await syncGraphSession(true);
+  state.lastValidation = data.validation;
+  updateValidationUI(data.validation);
+  if (data.validation.valid === false) {
     return;
   }
-  const payload = buildGraphPayload();
-  const response = await fetch("/simulate", {
-    method: "POST",
-    headers: { "Content-Type": "application/json" },
-    body: JSON.stringify(payload),
-  });
-  const data = await response.json();
-  handleSimulationResult(data);
+  handleSimulationResult(data.simulation);
 });
 
 resetBtn.addEventListener("click", resetCanvas);
@@ -1,5 +1,28 @@
+import json
+import os
+import uuid
+from pathlib import Path
+
+import pytest
+
+from shield.core.graph.batch import validate_stream
+from shield.core.graph.canonical import graph_fingerprint, stable_graph_hash
+from shield.core.graph.delta import GraphSession, PatchError, StaleVersionError, apply_patch, diff_documents
+from shield.core.graph.rules import RuleRegistry, edge_rule_registry
+from shield.core.graph.compiled import compile_graph
 from shield.core.graph_validator import validate_graph
+from shield.core.learning.bundle import build_bundle
+from shield.core.learning.faq_engine import FAQEngine
+from shield.core.learning.loader import PresetLoadError
+from shield.core.learning.registry import DesignRegistry
+from shield.core.simulation.discrete_event import check_environment as check_discrete_event
+from shield.core.simulation.incremental import IncrementalSimulation
+from shield.core.simulation.monte_carlo import check_environment as check_monte_carlo
 from shield.core.simulation_engine import simulate
+from shield.services.result_cache import ResultCache
+from shield.services.write_behind import WriteBehindBuffer
+
+PRESETS_DIR = Path(__file__).resolve().parents[1] / "shield" / "presets"
 
 
 def test_validate_graph_linear():
@@ -188,3 +211,1001 @@ def test_simulate_weighted_round_robin():
     assert performance["throughput"] == 100
     assert performance["total_latency"] == 60
     assert performance["error_rate"] == 0
+
+
+def test_compiled_graph_shared_across_stages():
+    graph = {
+        "nodes": [
+            {"id": "user", "type": "User", "config": {"number_of_users": 100, "requests_per_user": 1}},
+            {"id": "lb", "type": "load_balancer", "config": {"capacity": 300, "base_latency": 10}},
+            {"id": "server-1", "type": "Server", "config": {"capacity": 50, "base_latency": 20}},
+            {"id": "server-2", "type": "Server", "config": {"capacity": 50, "base_latency": 20}},
+            {"id": "db", "type": "Database", "config": {"capacity": 80, "base_latency": 40}},
+        ],
+        "edges": [
+            {"source": "user", "target": "lb"},
+            {"source": "lb", "target": "server-1"},
+            {"source": "lb", "target": "server-2"},
+            {"source": "server-1", "target": "db"},
+            {"source": "server-2", "target": "db"},
+            {"source": "db", "target": "missing"},
+        ],
+    }
+
+    compiled = compile_graph(graph)
+    assert compiled.ids == ["user", "lb", "server-1", "server-2", "db"]
+    assert compiled.types[1] == "LoadBalancer"
+    assert compiled.children(compiled.index["lb"]) == [2, 3]
+    assert compiled.parents(compiled.index["db"]) == [2, 3]
+    assert compiled.levels == [0, 1, 2, 2, 3]
+    assert compiled.invalid_edges == [5]
+
+    errors, _ = validate_graph(graph, compiled=compiled)
+    assert errors == ["Edges must reference valid node ids."]
+
+    graph["edges"].pop()
+    compiled = compile_graph(graph)
+    errors, ordered = validate_graph(graph, compiled=compiled)
+    assert errors == []
+    assert simulate(graph, ordered_nodes=ordered, compiled=compiled) == simulate(graph)
+
+
+def test_simulate_sweep_matches_scalar_engine():
+    pytest.importorskip("numpy")
+    from shield.core.simulation.batch import simulate_sweep
+
+    graph = {
+        "nodes": [
+            {"id": "user", "type": "User", "config": {"number_of_users": 1, "requests_per_user": 1}},
+            {"id": "lb", "type": "LoadBalancer", "config": {"capacity": 300, "base_latency": 10, "algorithm": "least_capacity"}},
+            {"id": "server-1", "type": "Server", "config": {"capacity": 150, "base_latency": 20}},
+            {"id": "server-2", "type": "Server", "config": {"capacity": 50, "base_latency": 20}},
+            {"id": "db", "type": "Database", "config": {"capacity": 120, "base_latency": 40}},
+        ],
+        "edges": [
+            {"source": "user", "target": "lb"},
+            {"source": "lb", "target": "server-1"},
+            {"source": "lb", "target": "server-2"},
+            {"source": "server-1", "target": "db"},
+            {"source": "server-2", "target": "db"},
+        ],
+    }
+    loads = [0, 40, 120, 400]
+
+    def assert_matches():
+        result = simulate_sweep(compile_graph(graph), loads)
+        assert result["node_ids"] == ["user", "lb", "server-1", "server-2", "db"]
+        for row, load in enumerate(loads):
+            performance, metrics = simulate(graph, traffic_profile={"number_of_users": load, "requests_per_user": 1})
+            point = result["load_points"][row]
+            for key in ("incoming_rps", "throughput", "total_latency", "error_rate", "bottleneck_node_id"):
+                assert point[key] == performance[key]
+            assert result["utilization"][row] == [metric["utilization"] for metric in metrics]
+
+    assert_matches()
+    # Half steps of the third decimal, where np.round and round disagree.
+    graph["nodes"][1]["config"]["base_latency"] = 10.0005
+    graph["nodes"][4]["config"]["base_latency"] = 10.0045
+    assert_matches()
+
+
+def test_simulate_discrete_event_mode():
+    graph = {
+        "nodes": [
+            {"id": "user", "type": "User", "config": {"number_of_users": 20, "requests_per_user": 1}},
+            {"id": "server", "type": "Server", "config": {"capacity": 50, "base_latency": 20}},
+            {"id": "db", "type": "Database", "config": {"capacity": 30, "base_latency": 40}},
+        ],
+        "edges": [
+            {"source": "user", "target": "server"},
+            {"source": "server", "target": "db"},
+        ],
+    }
+    environment = {
+        "duration_s": 20,
+        "arrival_process": "deterministic",
+        "service_distribution": "deterministic",
+        "seed": 7,
+    }
+
+    performance, metrics = simulate(graph, environment_config=environment, mode="discrete_event")
+    assert performance["incoming_rps"] == 20
+    assert performance["throughput"] == 20
+    assert performance["latency_p50"] == performance["latency_p99"] == 60
+    assert performance["error_rate"] == 0
+    assert [metric["queue_length_max"] for metric in metrics] == [0, 0, 0]
+    assert simulate(graph, environment_config=environment, mode="discrete_event") == (performance, metrics)
+
+    compiled = compile_graph(graph)
+    assert check_discrete_event(compiled, environment) is None
+    assert "arrival_process" in check_discrete_event(compiled, dict(environment, arrival_process="bursty"))
+    assert "numeric" in check_discrete_event(compiled, dict(environment, duration_s="soon"))
+    assert "seed" in check_discrete_event(compiled, dict(environment, seed=[1]))
+    assert "limited" in check_discrete_event(compiled, dict(environment, max_events=10**9))
+    assert "duration_s" in check_discrete_event(compiled, dict(environment, duration_s=1e9))
+    graph["nodes"][1]["config"]["service_distribution"] = "pareto"
+    assert "service_distribution" in check_discrete_event(compile_graph(graph), environment)
+
+
+def test_simulate_monte_carlo_mode():
+    pytest.importorskip("numpy")
+    graph = {
+        "nodes": [
+            {"id": "user", "type": "User", "config": {"number_of_users": 10, "requests_per_user": 2}},
+            {"id": "server", "type": "Server", "config": {"capacity": 50, "base_latency": 20}},
+            {"id": "db", "type": "Database", "config": {"capacity": 30, "base_latency": 40}},
+        ],
+        "edges": [
+            {"source": "user", "target": "server"},
+            {"source": "server", "target": "db"},
+        ],
+    }
+
+    fixed = {"trials": 500, "latency_distributions": {"default": "deterministic"}}
+    performance, _ = simulate(graph, environment_config=fixed, mode="monte_carlo")
+    assert performance["total_latency"] == 60
+    assert performance["latency_distribution"]["mean"] == 60
+    assert performance["latency_p50"] == pytest.approx(60, rel=0.01)
+
+    sampled = {"trials": 5000, "seed": 11, "latency_distributions": {"Database": {"distribution": "exponential"}}}
+    first, _ = simulate(graph, environment_config=sampled, mode="monte_carlo")
+    second, _ = simulate(graph, environment_config=sampled, mode="monte_carlo")
+    assert first["latency_distribution"] == second["latency_distribution"]
+    assert first["latency_p99"] > first["latency_p50"]
+
+    # A shared executor splits large runs into chunks with the same result.
+    from concurrent.futures import ThreadPoolExecutor
+
+    large = dict(sampled, trials=120_000)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        pooled, _ = simulate(graph, environment_config=large, mode="monte_carlo", executor=executor)
+    inline, _ = simulate(graph, environment_config=large, mode="monte_carlo")
+    assert pooled["latency_distribution"] == inline["latency_distribution"]
+
+    compiled = compile_graph(graph)
+    assert check_monte_carlo(compiled, sampled) is None
+    assert "Invalid latency distribution" in check_monte_carlo(compiled, {"latency_distributions": {"Server": "weibull"}})
+    assert "must be an object" in check_monte_carlo(compiled, {"latency_distributions": [1]})
+    assert "non-negative" in check_monte_carlo(compiled, {"seed": -1})
+    assert "integers" in check_monte_carlo(compiled, {"seed": "x"})
+    assert "integers" in check_monte_carlo(compiled, {"histogram_bins": "a"})
+    graph["nodes"][1]["config"]["latency_distribution"] = {"distribution": "gamma", "shape": 0}
+    assert "Invalid latency distribution" in check_monte_carlo(compile_graph(graph), None)
+
+
+def test_incremental_simulation_updates_downstream_only():
+    graph = {
+        "nodes": [
+            {"id": "user", "type": "User", "config": {"number_of_users": 100, "requests_per_user": 1}},
+            {"id": "lb", "type": "LoadBalancer", "config": {"capacity": 300, "base_latency": 10, "algorithm": "least_capacity"}},
+            {"id": "server-1", "type": "Server", "config": {"capacity": 50, "base_latency": 20}},
+            {"id": "server-2", "type": "Server", "config": {"capacity": 50, "base_latency": 20}},
+            {"id": "db-1", "type": "Database", "config": {"capacity": 80, "base_latency": 40}},
+            {"id": "db-2", "type": "Database", "config": {"capacity": 80, "base_latency": 40}},
+        ],
+        "edges": [
+            {"source": "user", "target": "lb"},
+            {"source": "lb", "target": "server-1"},
+            {"source": "lb", "target": "server-2"},
+            {"source": "server-1", "target": "db-1"},
+            {"source": "server-2", "target": "db-2"},
+        ],
+    }
+
+    session = IncrementalSimulation(graph)
+    assert session.performance() == simulate(graph)[0]
+
+    session.update_node("db-2", {"base_latency": 55})
+    changed = session.recompute()
+    assert [session.compiled.ids[node] for node in changed] == ["db-2"]
+    assert session.performance()["total_latency"] == simulate(graph)[0]["total_latency"]
+
+    session.update_node("server-1", {"capacity": 150})
+    changed = session.recompute()
+    assert {session.compiled.ids[node] for node in changed} == {"server-1", "server-2", "db-1", "db-2"}
+    performance, metrics = simulate(graph)
+    assert session.performance() == performance
+    assert session.node_metrics() == metrics
+
+    config = dict(session.compiled.nodes[session.compiled.index["db-1"]]["config"])
+    with pytest.raises(ValueError):
+        session.update_node("db-1", {"base_latency": 5, "capacity": "abc"})
+    assert session.compiled.nodes[session.compiled.index["db-1"]]["config"] == config
+    assert session.recompute() == []
+
+
+def test_graph_fingerprint_ignores_order_and_layout():
+    graph = {
+        "nodes": [
+            {"id": "user", "type": "User", "config": {"number_of_users": 10, "requests_per_user": 2}},
+            {"id": "lb", "type": "LoadBalancer", "config": {"capacity": 50, "base_latency": 10}},
+            {"id": "server", "type": "Server", "config": {"capacity": 50, "base_latency": 20}},
+            {"id": "db", "type": "Database", "config": {"capacity": 30, "base_latency": 40}},
+        ],
+        "edges": [
+            {"source": "user", "target": "lb"},
+            {"source": "lb", "target": "server"},
+            {"source": "lb", "target": "db"},
+            {"source": "server", "target": "db"},
+        ],
+    }
+    shuffled = {
+        "nodes": [graph["nodes"][0]] + [dict(node, x=120, y=40) for node in reversed(graph["nodes"][1:])],
+        "edges": list(reversed(graph["edges"])),
+    }
+    changed = {
+        "nodes": graph["nodes"][:3] + [{"id": "db", "type": "Database", "config": {"capacity": 31, "base_latency": 40}}],
+        "edges": graph["edges"],
+    }
+
+    fingerprint = graph_fingerprint(graph, None, None, "sandbox")
+    assert graph_fingerprint(shuffled, None, None, "sandbox") == fingerprint
+    assert graph_fingerprint(changed, None, None, "sandbox") != fingerprint
+    assert graph_fingerprint(graph, None, None, "production") != fingerprint
+
+
+def test_simulate_timeseries_streams_ticks():
+    pytest.importorskip("numpy")
+    from shield.core.simulation.timeseries import simulate_timeseries, traffic_ticks
+
+    graph = {
+        "nodes": [
+            {"id": "user", "type": "User", "config": {"number_of_users": 10, "requests_per_user": 2}},
+            {"id": "lb", "type": "LoadBalancer", "config": {"capacity": 100, "base_latency": 10}},
+            {"id": "server", "type": "Server", "config": {"capacity": 50, "base_latency": 20}},
+            {"id": "db", "type": "Database", "config": {"capacity": 30, "base_latency": 40}},
+        ],
+        "edges": [
+            {"source": "user", "target": "lb"},
+            {"source": "lb", "target": "server"},
+            {"source": "server", "target": "db"},
+        ],
+    }
+    profile = {"curve": "spike", "base_rps": 20, "peak_rps": 80, "duration_s": 4, "spike_at_s": 2, "spike_duration_s": 1}
+    tick_count, ticks = traffic_ticks(profile)
+    records = list(simulate_timeseries(compile_graph(graph), ticks))
+
+    assert tick_count == len(records) == 5
+    assert [record["t"] for record in records] == [0.0, 1.0, 2.0, 3.0, 4.0]
+    for record in records:
+        rps = record["performance"]["incoming_rps"]
+        performance, metrics = simulate(graph, traffic_profile={"number_of_users": rps, "requests_per_user": 1})
+        assert record["performance"] == performance
+        assert record["node_metrics"] == metrics
+    assert [record["performance"]["incoming_rps"] for record in records] == [20, 20, 80, 20, 20]
+
+    # A bad series point is rejected before anything is streamed.
+    assert [tick for _, tick in traffic_ticks({"series": [10, {"rps": 20}]})[1]] == [10.0, 20.0]
+    with pytest.raises(ValueError, match="point 2"):
+        traffic_ticks({"series": [10, 20, "oops"]})
+
+
+def test_optimize_capacity_meets_slo_with_minimum_capacity():
+    pytest.importorskip("numpy")
+    from shield.core.simulation.optimizer import optimize_capacity
+
+    graph = {
+        "nodes": [
+            {"id": "user", "type": "User", "config": {"number_of_users": 10, "requests_per_user": 2}},
+            {"id": "lb", "type": "LoadBalancer", "config": {"capacity": 100, "base_latency": 10}},
+            {"id": "server-1", "type": "Server", "config": {"capacity": 50, "base_latency": 20}},
+            {"id": "server-2", "type": "Server", "config": {"capacity": 50, "base_latency": 20}},
+            {"id": "db", "type": "Database", "config": {"capacity": 30, "base_latency": 40}},
+        ],
+        "edges": [
+            {"source": "user", "target": "lb"},
+            {"source": "lb", "target": "server-1"},
+            {"source": "lb", "target": "server-2"},
+            {"source": "server-1", "target": "db"},
+            {"source": "server-2", "target": "db"},
+        ],
+    }
+    result = optimize_capacity(compile_graph(graph), 400, max_latency=100, max_error_rate=0)
+
+    assert result["feasible"]
+    capacities = {node["component_id"]: node["capacity"] for node in result["capacities"]}
+    assert capacities == {"lb": 400, "server-1": 200, "server-2": 200, "db": 400}
+
+    for node in graph["nodes"]:
+        if node["id"] in capacities:
+            node["config"]["capacity"] = capacities[node["id"]]
+    performance, _ = simulate(graph, traffic_profile={"number_of_users": 400, "requests_per_user": 1})
+    assert performance["total_error_rate"] == 0
+    assert performance["total_latency"] <= 100
+
+    infeasible = optimize_capacity(compile_graph(graph), 400, max_latency=50)
+    assert not infeasible["feasible"]
+
+
+def test_capacity_sensitivity_quantifies_recommendations():
+    pytest.importorskip("numpy")
+    from shield.core.recommendation_engine import generate_recommendations
+    from shield.core.simulation.sensitivity import capacity_sensitivity
+
+    graph = {
+        "nodes": [
+            {"id": "user", "type": "User", "config": {"number_of_users": 100, "requests_per_user": 1}},
+            {"id": "server", "type": "Server", "config": {"capacity": 200, "base_latency": 20}},
+            {"id": "db", "type": "Database", "config": {"capacity": 50, "base_latency": 40}},
+        ],
+        "edges": [
+            {"source": "user", "target": "server"},
+            {"source": "server", "target": "db"},
+        ],
+    }
+    report = capacity_sensitivity(compile_graph(graph), 100, 0.2)
+
+    assert [entry["component_id"] for entry in report] == ["db", "server"]
+    assert report[0]["new_capacity"] == 60
+    assert report[0]["throughput_gain"] == 10
+    assert report[0]["latency_change"] == round(40 * (100 / 60) ** 2 - 40 * (100 / 50) ** 2, 3)
+    assert report[1]["throughput_gain"] == 0
+
+    performance, metrics = simulate(graph)
+    recommendations = generate_recommendations(performance, metrics, [], sensitivity=report)
+    assert "Scale Database db capacity by 20%: +10 RPS throughput, -48.889 ms latency." in recommendations
+
+
+def test_structural_validator_handles_long_chains_and_reports_ids():
+    from shield.core.graph.validator import validate_and_order, validate_graph as validate_structure
+
+    chain = 5000
+    nodes = [{"id": "user", "type": "User"}, {"id": "lb", "type": "LoadBalancer"}]
+    nodes += [{"id": f"server-{i}", "type": "Server"} for i in range(chain)]
+    nodes.append({"id": "db", "type": "Database"})
+    edges = [{"source": "user", "target": "lb"}, {"source": "lb", "target": "server-0"}]
+    edges += [{"source": f"server-{i}", "target": f"server-{i + 1}"} for i in range(chain - 1)]
+    edges.append({"source": f"server-{chain - 1}", "target": "db"})
+    assert validate_structure({"nodes": nodes, "edges": edges})["valid"]
+
+    # The order found while validating is returned, not written into the
+    # caller's compiled graph.
+    compiled = compile_graph({"nodes": nodes, "edges": edges})
+    _, order = validate_and_order({"nodes": nodes, "edges": edges}, compiled=compiled)
+    assert "order" not in vars(compiled) and order == compiled.order
+
+    edges.append({"id": "back", "source": "db", "target": "server-0"})
+    edges += [{"source": "user", "target": "db"} for _ in range(3)]
+    result = validate_structure({"nodes": nodes, "edges": edges}, max_errors=3)
+
+    assert result["errors"] == [
+        "Database cannot send traffic to compute layers.",
+        "Graph must be a DAG.",
+        "Graph must contain at least one terminal storage node.",
+        "Illegal layer ordering detected.",
+        "Storage nodes must be terminal unless sending to async processing.",
+        "User cannot directly access storage or cache layers.",
+    ]
+    assert len(result["details"]) == 3 and result["truncated"]
+    assert result["details"][0] == {
+        "message": "User cannot directly access storage or cache layers.",
+        "node_ids": ["user", "db"],
+        "edge_ids": ["user->db"],
+    }
+
+
+def test_online_validator_tracks_edits():
+    from shield.core.graph.online import OnlineValidator
+    from shield.core.graph.validator import validate_graph as validate_structure
+
+    graph = {
+        "nodes": [
+            {"id": "user", "type": "User"},
+            {"id": "lb", "type": "LoadBalancer"},
+            {"id": "server", "type": "Server"},
+            {"id": "db", "type": "Database"},
+        ],
+        "edges": [
+            {"source": "user", "target": "lb"},
+            {"source": "lb", "target": "server"},
+            {"source": "server", "target": "db"},
+        ],
+    }
+    session = OnlineValidator(graph)
+    assert session.result()["valid"]
+
+    session.add_node("worker", "Worker")
+    session.add_edge("worker", "lb")
+    assert session.result()["errors"] == [
+        "All nodes must be reachable from a User node.",
+        "Illegal layer ordering detected.",
+    ]
+    with pytest.raises(ValueError):
+        session.add_edge("server", "worker")
+
+    session.remove_edge(source="worker", target="lb")
+    session.add_edge("server", "worker")
+    session.add_edge("worker", "db")
+    session.remove_edge(source="server", target="db")
+    order = session.order()
+    assert order.index("server") < order.index("worker") < order.index("db")
+
+    materialized = {
+        "nodes": [{"id": node_id, "type": session.types[node_id]} for node_id in order],
+        "edges": [{"source": source, "target": target} for source, target in session.edges.values()],
+    }
+    assert session.result()["errors"] == validate_structure(materialized)["errors"] == []
+
+    session.remove_node("lb")
+    assert session.result()["errors"] == ["All nodes must be reachable from a User node."]
+    assert session.result()["details"][0]["node_ids"] == ["server", "worker", "db"]
+
+    # An empty graph reports only that, as validate_graph does.
+    empty = {"nodes": [], "edges": []}
+    assert dict(OnlineValidator(empty).result(), version=None) == dict(validate_structure(empty), version=None)
+
+
+def test_validate_stream_keeps_input_order():
+    from concurrent.futures import ThreadPoolExecutor
+
+    valid = {
+        "nodes": [
+            {"id": "user", "type": "User"},
+            {"id": "lb", "type": "LoadBalancer"},
+            {"id": "server", "type": "Server"},
+            {"id": "db", "type": "Database"},
+        ],
+        "edges": [
+            {"source": "user", "target": "lb"},
+            {"source": "lb", "target": "server"},
+            {"source": "server", "target": "db"},
+        ],
+    }
+    cyclic = {
+        "nodes": [{"id": "a", "type": "Server"}, {"id": "b", "type": "Server"}],
+        "edges": [{"source": "a", "target": "b"}, {"source": "b", "target": "a"}],
+    }
+    malformed = {"nodes": [1, 2], "edges": [1]}
+    graphs = [valid, cyclic, None, malformed] * 7
+
+    inline = list(validate_stream(iter(graphs)))
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        pooled = list(validate_stream(iter(graphs), executor, chunk_size=2, window=3))
+
+    assert [result["index"] for result in pooled] == list(range(len(graphs)))
+    assert [result["valid"] for result in pooled] == [result["valid"] for result in inline] == [True, False, False, False] * 7
+    assert pooled[0]["order"] == ["user", "lb", "server", "db"]
+    assert "Graph must be a DAG." in pooled[1]["errors"]
+    assert "error" in pooled[2]
+    assert pooled[3]["error"].startswith("Invalid graph") and pooled[4]["valid"]
+    assert all(result["elapsed_ms"] >= 0 for result in pooled)
+
+
+def test_registered_edge_rules_compile_into_lookup_table():
+    np = pytest.importorskip("numpy")
+
+    from shield.core.graph.validator import validate_graph as validate_structure
+
+    graph = {
+        "nodes": [
+            {"id": "user", "type": "User"},
+            {"id": "lb", "type": "load_balancer"},
+            {"id": "server", "type": "Server"},
+            {"id": "queue", "type": "Queue"},
+            {"id": "db", "type": "Database"},
+        ],
+        "edges": [
+            {"source": "user", "target": "lb"},
+            {"source": "lb", "target": "server"},
+            {"source": "server", "target": "queue"},
+            {"source": "queue", "target": "db"},
+        ],
+    }
+    registry = RuleRegistry(edge_rule_registry.rules)
+    assert validate_structure(graph, rules=registry.table())["valid"]
+
+    rule = registry.register("Queues must not write to databases.", source_types=["Queue"], target_types=["Database"])
+    table = registry.table()
+    result = validate_structure(graph, rules=table)
+    assert result["errors"] == ["Queues must not write to databases."]
+    assert result["details"][0]["edge_ids"] == ["queue->db"]
+
+    sources = np.array([table.code("User"), table.code("Queue"), table.code("Server")])
+    targets = np.array([table.code("Database"), table.code("Database"), table.code("Unknown")])
+    assert [table.decode(int(mask)) for mask in table.edge_masks(sources, targets)] == [
+        ("User cannot directly access storage or cache layers.", "Illegal layer ordering detected."),
+        ("Queues must not write to databases.",),
+        (),
+    ]
+
+    registry.unregister(rule)
+    assert validate_structure(graph, rules=registry.table())["valid"]
+    assert edge_rule_registry.table().messages[-1] != rule.message
+
+
+def test_graph_session_applies_versioned_patches_atomically():
+    document = {
+        "graph": {
+            "nodes": [{"id": "user", "type": "User"}, {"id": "db", "type": "Database", "config": {"capacity": 10}}],
+            "edges": [{"source": "user", "target": "db"}],
+        }
+    }
+    session = GraphSession(document)
+    session.apply(
+        0,
+        [
+            {"op": "replace", "path": "/graph/nodes/1/config/capacity", "value": 40},
+            {"op": "add", "path": "/graph/nodes/1", "value": {"id": "server", "type": "Server"}},
+            {"op": "add", "path": "/graph/edges/-", "value": {"source": "server", "target": "db"}},
+            {"op": "test", "path": "/graph/nodes/0/id", "value": "user"},
+        ],
+    )
+    assert session.version == 1
+    assert [node["id"] for node in document["graph"]["nodes"]] == ["user", "server", "db"]
+    assert document["graph"]["nodes"][2]["config"] == {"capacity": 40}
+
+    before = json.loads(json.dumps(document))
+    with pytest.raises(PatchError):
+        session.apply(
+            1,
+            [
+                {"op": "remove", "path": "/graph/edges/0"},
+                {"op": "move", "from": "/graph/nodes/1", "path": "/graph/nodes/0"},
+                {"op": "replace", "path": "/graph/nodes/5/type", "value": "Cache"},
+            ],
+        )
+    assert document == before
+    assert session.version == 1
+
+    # Malformed operations are PatchErrors and roll back earlier operations.
+    for malformed in ({"op": ["x"], "path": "/x"}, {"op": "add", "path": 3, "value": 1}, {"op": "copy", "path": "/x"}):
+        with pytest.raises(PatchError):
+            session.apply(1, [{"op": "remove", "path": "/graph/edges/0"}, malformed])
+        assert document == before
+
+    with pytest.raises(StaleVersionError) as stale:
+        session.apply(0, [])
+    assert stale.value.current == 1
+
+
+def test_diff_documents_round_trips_graph_versions():
+    before = {
+        "nodes": [
+            {"id": "user", "type": "User", "config": {"number_of_users": 10}},
+            {"id": "server", "type": "Server", "config": {"capacity": 50}},
+            {"id": "db", "type": "Database", "config": {"capacity": 30, "replicated": True}},
+        ],
+        "edges": [{"source": "user", "target": "server"}, {"source": "server", "target": "db"}],
+    }
+    after = json.loads(json.dumps(before))
+    after["nodes"].insert(1, {"id": "lb", "type": "LoadBalancer"})
+    after["nodes"][3]["config"]["capacity"] = 80
+    after["nodes"][3]["config"]["replicated"] = 1
+    after["edges"][0] = {"source": "user", "target": "lb"}
+    after["edges"].insert(1, {"source": "lb", "target": "server"})
+    after["meta/notes"] = "v2"
+
+    patch = diff_documents(before, after)
+    assert {"op": "add", "path": "/nodes/1", "value": {"id": "lb", "type": "LoadBalancer"}} in patch
+    assert {"op": "replace", "path": "/nodes/3/config/capacity", "value": 80} in patch
+    assert {"op": "replace", "path": "/nodes/3/config/replicated", "value": 1} in patch
+    assert {"op": "add", "path": "/meta~1notes", "value": "v2"} in patch
+
+    restored = json.loads(json.dumps(before))
+    apply_patch(restored, patch)
+    assert restored == after
+    assert diff_documents(after, after) == []
+
+
+def test_write_behind_buffer_coalesces_and_flushes_on_close():
+    written = []
+    buffer = WriteBehindBuffer(lambda key, value: written.append((key, value)), interval=60.0)
+    for step in range(100):
+        buffer.put("a", {"step": step})
+    buffer.put("b", {"step": 0})
+
+    assert buffer.get("a") == {"step": 99}
+    assert buffer.flush("a") == 1
+    assert written == [("a", {"step": 99})]
+    assert buffer.flush("a") == 0
+
+    buffer.put("c", {"step": 0})
+    buffer.discard("c")
+    buffer.close()
+    assert written == [("a", {"step": 99}), ("b", {"step": 0})]
+    assert buffer.stats()["writes"] == 2
+    with pytest.raises(RuntimeError):
+        buffer.put("a", {})
+
+    attempts = []
+
+    def flaky(key, value):
+        attempts.append(key)
+        if len(attempts) == 1:
+            raise OSError("database unavailable")
+
+    buffer = WriteBehindBuffer(flaky, interval=60.0)
+    buffer.put("a", 1)
+    buffer.put("b", 2)
+    with pytest.raises(OSError):
+        buffer.flush()
+    assert buffer.stats()["pending"] == 1
+    assert buffer.flush() == 1
+    buffer.close()
+
+    # A value stays readable while its write is in flight, and a newer value
+    # put during the write stays pending afterwards.
+    seen = []
+
+    def slow(key, value):
+        seen.append(buffer.get(key))
+        if value == 1:
+            buffer.put(key, 2)
+
+    buffer = WriteBehindBuffer(slow, interval=60.0)
+    buffer.put("a", 1)
+    assert buffer.flush("a") == 1
+    assert seen == [1] and buffer.get("a") == 2
+    assert buffer.flush("a") == 1 and buffer.get("a") is None
+    buffer.close()
+
+
+def test_stable_graph_hash_is_persistable_and_content_keyed():
+    graph = {
+        "nodes": [
+            {"id": "user", "type": "User", "position": {"x": 0, "y": 0}},
+            {"id": "api", "type": "API Server", "config": {"capacity": 100, "base_latency": 20}},
+            {"id": "db", "type": "Database", "config": {"capacity": 50}},
+        ],
+        "edges": [{"id": "e1", "source": "user", "target": "api"}, {"id": "e2", "source": "api", "target": "db"}],
+    }
+    moved = json.loads(json.dumps(graph))
+    moved["nodes"] = [moved["nodes"][0], moved["nodes"][2], moved["nodes"][1]]
+    moved["nodes"][0]["position"] = {"x": 40, "y": 80}
+    moved["nodes"][2]["config"] = {"base_latency": 20, "capacity": 100}
+    moved["edges"].reverse()
+
+    digest = stable_graph_hash(graph)
+    assert len(digest) == 64
+    assert stable_graph_hash(moved) == digest
+
+    changed = json.loads(json.dumps(graph))
+    changed["nodes"][2]["config"]["capacity"] = 60
+    assert stable_graph_hash(changed) != digest
+    assert stable_graph_hash(graph, {"rps": 10}) != digest
+
+
+@pytest.fixture
+def presets_dir(tmp_path):
+    # A private copy of two presets that a test can edit.
+    presets = tmp_path / "presets"
+    presets.mkdir()
+    for name in ("url_shortener", "rate_limiter"):
+        (presets / f"{name}.json").write_text((PRESETS_DIR / f"{name}.json").read_text())
+    return presets
+
+
+def test_design_registry_reloads_changed_presets_only(presets_dir):
+    registry = DesignRegistry(presets_dir, check_interval=3600.0)
+
+    shortener = registry.get_design("url_shortener")
+    limiter = registry.get_design("rate_limiter")
+    assert [design.id for design in registry.list_designs()] == ["rate_limiter", "url_shortener"]
+
+    data = json.loads((presets_dir / "url_shortener.json").read_text())
+    data["name"] = "Renamed Shortener"
+    (presets_dir / "url_shortener.json").write_text(json.dumps(data))
+    assert registry.get_design("url_shortener") is shortener
+
+    registry.reload()
+    assert registry.get_design("url_shortener").name == "Renamed Shortener"
+    assert registry.get_design("rate_limiter") is limiter
+
+    (presets_dir / "rate_limiter.json").write_text("{")
+    registry.reload()
+    with pytest.raises(PresetLoadError):
+        registry.get_design("rate_limiter")
+    assert registry.get_design("url_shortener").name == "Renamed Shortener"
+    with pytest.raises(FileNotFoundError):
+        registry.get_design("news_feed")
+
+
+def test_design_registry_lists_from_manifest_and_parses_lazily(presets_dir, tmp_path):
+    cache = tmp_path / "manifest.json"
+
+    registry = DesignRegistry(presets_dir, manifest_cache=cache)
+    listed = registry.list_manifest()
+    assert [entry["id"] for entry in listed] == ["rate_limiter", "url_shortener"]
+    assert set(listed[0]) == {"id", "name", "difficulty", "description"}
+    assert registry._snapshot.designs == {}
+    assert registry.get_design("rate_limiter").name == listed[0]["name"]
+    assert list(registry._snapshot.designs) == ["rate_limiter"]
+
+    # A cold registry takes unchanged entries from the cache file.
+    cached = json.loads(cache.read_text())
+    cached["url_shortener"]["name"] = "From Cache"
+    cache.write_text(json.dumps(cached))
+    cold = DesignRegistry(presets_dir, manifest_cache=cache)
+    assert [entry["name"] for entry in cold.list_manifest()][1] == "From Cache"
+
+
+def test_design_registry_reads_fresh_presets_from_bundle(presets_dir, tmp_path):
+    bundle = tmp_path / "presets.bundle"
+    assert build_bundle(sorted(presets_dir.glob("*.json")), bundle) == 2
+
+    registry = DesignRegistry(presets_dir, check_interval=0, bundle_path=bundle)
+    expected = DesignRegistry(presets_dir).get_design("rate_limiter").to_dict()
+    assert registry.get_design("rate_limiter").to_dict() == expected
+    assert registry._snapshot.bundled == {"rate_limiter", "url_shortener"}
+
+    # A copy with a new mtime but the same bytes is still served from the
+    # bundle; an edited file falls back to JSON.
+    path = presets_dir / "rate_limiter.json"
+    os.utime(path, ns=(1, 1))
+    registry.list_manifest()
+    assert "rate_limiter" in registry._snapshot.bundled
+    data = json.loads(path.read_text())
+    data["name"] = "Edited"
+    path.write_text(json.dumps(data))
+    assert registry.get_design("rate_limiter").name == "Edited"
+    assert registry._snapshot.bundled == {"url_shortener"}
+
+
+def test_faq_search_ranks_across_designs_and_follows_reloads(presets_dir):
+    engine = FAQEngine(DesignRegistry(presets_dir, check_interval=0))
+
+    hits = engine.search("token bucket", limit=3)
+    assert hits and hits[0]["design_id"] == "rate_limiter"
+    assert [hit["score"] for hit in hits] == sorted((hit["score"] for hit in hits), reverse=True)
+    assert engine.search("the of and") == []
+    prefix = engine.search("buck")
+    assert prefix and {hit["faq"]["id"] for hit in prefix} <= {hit["faq"]["id"] for hit in engine.search("bucket", 50)}
+
+    # Editing one preset re-indexes that design only.
+    unchanged = engine._index().segments["url_shortener"]
+    path = presets_dir / "rate_limiter.json"
+    data = json.loads(path.read_text())
+    data["faqs"][0]["question"] = "Why pick a zebracorn quota?"
+    path.write_text(json.dumps(data))
+    hits = engine.search("zebracorn")
+    assert [hit["faq"]["id"] for hit in hits] == [data["faqs"][0]["id"]]
+    assert engine._index().segments["url_shortener"] is unchanged
+
+
+def test_faq_query_intersects_filters_and_pages():
+    engine = FAQEngine(DesignRegistry(PRESETS_DIR))
+    faqs = engine.get_all_faqs("url_shortener")
+
+    staged = engine.get_faqs_by_stage("url_shortener", 2)
+    assert staged == [faq for faq in faqs if faq["stage"] in (None, 2)]
+    assert len(staged) < len(faqs)
+
+    page, total = engine.query("url_shortener", component="cache", difficulty="Intermediate", limit=1, offset=1)
+    expected = [
+        faq
+        for faq in faqs
+        if "cache" in {c.lower() for c in faq["related_components"]} and faq["difficulty"] == "Intermediate"
+    ]
+    assert total == len(expected) and page == expected[1:2]
+    assert engine.query("url_shortener", topic="sharding", component="no-such-component") == ([], 0)
+
+    ranked = engine.search_questions("url_shortener", "cache")
+    filtered, _ = engine.query("url_shortener", stage=1, search="cache")
+    assert filtered == [faq for faq in ranked if faq["stage"] in (None, 1)]
+    # Searching one design indexes that design only.
+    assert engine._search_index is None and list(engine._design_indexes) == ["url_shortener"]
+
+
+def test_result_cache_returns_independent_copies():
+    cache = ResultCache(max_bytes=1024)
+    result = {"performance": {"throughput": 10}, "node_metrics": [{"id": "db"}]}
+    cache.put("key", result)
+    result["performance"]["throughput"] = 0
+
+    first = cache.get("key")
+    first["node_metrics"].append({"id": "extra"})
+    assert cache.get("key") == {"performance": {"throughput": 10}, "node_metrics": [{"id": "db"}]}
+    assert cache.stats()["hits"] == 2
+
+
+@pytest.fixture
+def app_modules(monkeypatch):
+    # Makes the app's top-level packages (config, db, services) importable.
+    # These tests need no Postgres; an in-memory URL keeps the imports from
+    # needing a Postgres driver.
+    monkeypatch.setenv("DATABASE_URL", "sqlite://")
+    monkeypatch.setenv("AUTOSAVE_FLUSH_INTERVAL", "0")
+    monkeypatch.syspath_prepend(str(PRESETS_DIR.parent))
+
+
+def test_workspace_import_validates_rows_and_caps_errors(app_modules):
+    from services.workspace_service import MAX_IMPORT_ERRORS, WorkspaceService
+
+    workspace_id = "6f1c2a9e-7d4b-4c1a-9a3e-2b5d8c0f1e47"
+    row = WorkspaceService._import_row(
+        {"id": workspace_id, "name": "Shortener", "type": "LEARN", "created_at": "2024-01-02T03:04:05+00:00"}, None
+    )
+    assert str(row["id"]) == workspace_id and row["type"].value == "LEARN" and row["user_id"] == "local"
+    assert row["created_at"].year == 2024 and row["graph_json"] == {}
+    defaults = WorkspaceService._import_row({"name": "Mine", "user_id": "someone"}, "importer")
+    assert defaults["type"].value == "PRACTICE" and defaults["user_id"] == "importer"
+
+    invalid = [
+        json.dumps({"name": "Bad type", "type": "SANDBOX"}),
+        json.dumps({"name": "Bad id", "id": "not-a-uuid"}),
+        json.dumps(["not", "an", "object"]),
+        "",
+    ]
+    lines = [line.encode() for line in invalid + invalid[:1] * MAX_IMPORT_ERRORS]
+    result = WorkspaceService().import_workspaces(lines)
+    assert result["imported"] == 0 and result["skipped"] == 0
+    assert result["error_count"] == MAX_IMPORT_ERRORS + 3
+    assert len(result["errors"]) == MAX_IMPORT_ERRORS
+    assert [error["line"] for error in result["errors"][:3]] == [1, 2, 3]
+    assert result["errors"][2]["error"] == "Each line must be a workspace object."
+    assert result["errors"][3]["line"] == 5
+
+
+def test_workspace_listing_pages_by_keyset_cursor(app_modules, monkeypatch):
+    from datetime import datetime, timedelta, timezone
+    from types import SimpleNamespace
+
+    from services.workspace_service import MAX_PAGE_SIZE, WorkspaceService
+
+    started = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    rows = [
+        SimpleNamespace(
+            id=f"00000000-0000-4000-8000-00000000000{index}",
+            user_id="local",
+            name=f"Workspace {index}",
+            type=SimpleNamespace(value="PRACTICE"),
+            preset_id=None,
+            version=0,
+            created_at=started,
+            # Two rows share a timestamp, so the id has to break the tie.
+            updated_at=started + timedelta(minutes=min(index, 3)),
+        )
+        for index in range(5)
+    ]
+    requests = []
+
+    def list_page(user_id, limit, after=None):
+        requests.append((limit, after))
+        ordered = sorted(rows, key=lambda row: (row.updated_at, row.id), reverse=True)
+        if after is not None:
+            ordered = [row for row in ordered if (row.updated_at, row.id) < (after[0], str(after[1]))]
+        return ordered[:limit]
+
+    service = WorkspaceService()
+    monkeypatch.setattr(service._repo, "list_page", list_page)
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = service.list_workspaces("local", limit=2, cursor=cursor)
+        seen.extend(summary["id"] for summary in page)
+        if cursor is None:
+            break
+    assert seen == [row.id for row in sorted(rows, key=lambda row: (row.updated_at, row.id), reverse=True)]
+    assert [limit for limit, _ in requests] == [3, 3, 3]
+    assert requests[1][1] == (rows[3].updated_at, uuid.UUID(rows[3].id))
+
+    service.list_workspaces("local", limit=0)
+    service.list_workspaces("local", limit=10_000)
+    assert [limit for limit, _ in requests[-2:]] == [2, MAX_PAGE_SIZE + 1]
+
+    for malformed in ("not a cursor", "WzEsIDJd", "NQ", "WyJ5ZXN0ZXJkYXkiLCAibm9wZSJd"):
+        with pytest.raises(ValueError, match="Invalid cursor"):
+            service.list_workspaces("local", cursor=malformed)
+
+
+def test_request_unit_of_work_commits_only_successful_responses(app_modules, monkeypatch, tmp_path):
+    from flask import Flask, abort
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.orm import sessionmaker
+
+    from db import session as db_session
+
+    # A file database gives every session its own connection, as Postgres
+    # would; an in-memory one shares a single connection per thread.
+    engine = create_engine(f"sqlite:///{tmp_path / 'uow.db'}")
+    monkeypatch.setattr(db_session, "SessionLocal", sessionmaker(bind=engine, expire_on_commit=False))
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE items (name TEXT)"))
+
+    app = Flask(__name__)
+    db_session.init_app(app)
+
+    def insert(name):
+        with db_session.session_scope() as session:
+            session.execute(text("INSERT INTO items (name) VALUES (:name)"), {"name": name})
+            return session
+
+    @app.route("/<name>/<int:status>")
+    def write(name, status):
+        # SQLite allows one writer, so the independent write goes first.
+        with db_session.unit_of_work():
+            independent = insert(f"{name}-independent")
+        first = insert(name)
+        # Every session_scope in a request shares one session.
+        assert insert(f"{name}-again") is first and first is not independent
+        if status == 0:
+            raise RuntimeError("failed mid-request")
+        if status >= 400:
+            abort(status)
+        return "", status
+
+    client = app.test_client()
+    statuses = [client.get(path).status_code for path in ("/ok/201", "/bad/400", "/error/500", "/raised/0")]
+    assert statuses == [201, 400, 500, 500]
+
+    def stored():
+        with engine.connect() as connection:
+            return {row[0] for row in connection.execute(text("SELECT name FROM items"))}
+
+    assert stored() == {"ok", "ok-again", "ok-independent", "bad-independent", "error-independent", "raised-independent"}
+
+    # Outside a request, session_scope commits per call.
+    insert("script")
+    assert "script" in stored()
+
+
+@pytest.fixture
+def simulation_service(app_modules):
+    from services.simulation_service import SimulationService
+
+    return SimulationService()
+
+
+def test_simulation_rejects_unbounded_sensitivity_increase(simulation_service):
+    graph = {
+        "nodes": [
+            {"id": "user", "type": "User", "config": {"number_of_users": 100, "requests_per_user": 1}},
+            {"id": "lb", "type": "LoadBalancer", "config": {"capacity": 300, "base_latency": 10}},
+            {"id": "server", "type": "Server", "config": {"capacity": 50, "base_latency": 20}},
+            {"id": "db", "type": "Database", "config": {"capacity": 30, "base_latency": 40}},
+        ],
+        "edges": [
+            {"source": "user", "target": "lb"},
+            {"source": "lb", "target": "server"},
+            {"source": "server", "target": "db"},
+        ],
+    }
+    for increase in (1e308, float("inf"), float("nan"), 0):
+        payload = {"graph": graph, "environment_config": {"sensitivity": True, "sensitivity_increase": increase}}
+        result, status = simulation_service.run_simulation(payload)
+        assert status == 400 and "sensitivity_increase" in result["error"]
+
+    payload = {"graph": graph, "environment_config": {"sensitivity": True, "sensitivity_increase": 10}}
+    result, status = simulation_service.run_simulation(payload)
+    assert status == 200 and result["sensitivity"]
+
+
+def test_simulation_service_rejects_timeseries_profiles_and_loose_flags(simulation_service):
+    graph = {
+        "nodes": [
+            {"id": "user", "type": "User", "config": {"number_of_users": 10, "requests_per_user": 1}},
+            {"id": "lb", "type": "LoadBalancer", "config": {"capacity": 300, "base_latency": 10}},
+            {"id": "server", "type": "Server", "config": {"capacity": 50, "base_latency": 20}},
+            {"id": "db", "type": "Database", "config": {"capacity": 30, "base_latency": 40}},
+        ],
+        "edges": [
+            {"source": "user", "target": "lb"},
+            {"source": "lb", "target": "server"},
+            {"source": "server", "target": "db"},
+        ],
+    }
+    profile = {"series": [5, 10, 15]}
+    result, status = simulation_service.run_simulation({"graph": graph, "traffic_profile": profile})
+    assert status == 400 and "/simulate/timeseries" in result["error"]
+
+    payload = {"graph": graph, "traffic_profile": profile, "include_node_metrics": "false"}
+    result, status = simulation_service.stream_timeseries(payload)
+    assert status == 400 and "include_node_metrics" in result["error"]
+    lines, status = simulation_service.stream_timeseries(dict(payload, include_node_metrics=False))
+    ticks = [json.loads(line) for line in lines if '"tick"' in line]
+    assert status == 200 and len(ticks) == 3 and all("node_metrics" not in tick for tick in ticks)
+
+
+def test_learning_service_validates_faq_paging(app_modules):
+    from services.learning_service import MAX_SEARCH_LIMIT, LearningService
+
+    service = LearningService()
+    for query in ({"limit": "-1"}, {"offset": "-5"}, {"limit": "ten"}):
+        result, status = service.get_faqs("url_shortener", query)
+        assert status == 400 and "error" in result
+
+    result, status = service.get_faqs("url_shortener", {"limit": "100000", "offset": "1"})
+    assert status == 200 and result["limit"] == MAX_SEARCH_LIMIT and result["offset"] == 1
+    assert len(result["faqs"]) == min(MAX_SEARCH_LIMIT, result["total"] - 1)
+    everything, _ = service.get_faqs("url_shortener", {})
+    assert everything["limit"] is None and len(everything["faqs"]) == everything["total"]